@@ -1,17 +1,99 @@
+import hashlib
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, NamedTuple, Optional, Set, Tuple
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from . import schemas, crud
+from . import crud_async
 from .config import settings
-from .database import get_db
+from .database import AsyncSessionLocal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
+class Principal(NamedTuple):
+    """Авторизованный пользователь запроса: только то, что нужно зависимостям и эндпоинтам"""
+    id: int
+    username: str
+    is_active: bool
+
+
+class PrincipalCache:
+    """
+    LRU-кэш проверенных токенов: sha256 токена -> (claims, Principal).
+    Запись живет не дольше ttl и не дольше exp самого токена. Кэш свой у каждого
+    воркера, поэтому invalidate_user действует только в этом процессе - в остальных
+    устаревшая запись доживает не дольше ttl.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Порядок - от давно не использованных токенов к недавним
+        self.entries: "OrderedDict[bytes, Tuple[Dict, Principal, float]]" = OrderedDict()
+        self.by_user: Dict[int, Set[bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[Tuple[Dict, Principal]]:
+        key = self._key(token)
+        entry = self.entries.get(key)
+        if entry is None or entry[2] <= time.monotonic():
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def put(self, token: str, claims: Dict, principal: Principal):
+        ttl = self.ttl
+        if "exp" in claims:
+            ttl = min(ttl, claims["exp"] - time.time())
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        key = self._key(token)
+        self._drop(key)
+        self.entries[key] = (claims, principal, time.monotonic() + ttl)
+        self.by_user.setdefault(principal.id, set()).add(key)
+        while len(self.entries) > self.max_entries:
+            self._drop(next(iter(self.entries)))
+
+    def invalidate_user(self, user_id: int):
+        """Забывает все токены пользователя (после изменения или деактивации)"""
+        for key in list(self.by_user.get(user_id, ())):
+            self._drop(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.by_user.clear()
+
+    def _drop(self, key: bytes):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self.by_user.get(entry[1].id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_user[entry[1].id]
+
+
+principal_cache = PrincipalCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+
+
+def invalidate_user(user_id: int):
+    principal_cache.invalidate_user(user_id)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Проверяет пароль с использованием чистого bcrypt
@@ -61,25 +143,58 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    return await get_principal(token)
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def decode_token(token: str) -> Dict:
+    """Проверяет JWT и возвращает его claims (без обращения к БД)"""
+    if not token:
+        raise _credentials_exception()
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    return payload
 
-    user = crud.get_user_by_username(db, username=token_data.username)
+
+async def get_principal(token: str) -> Principal:
+    """
+    Пользователь по токену (общая логика для HTTP и WebSocket).
+    ⭐ Повторные запросы с тем же токеном (опрос игры) не декодируют JWT и не ходят в БД
+    """
+    if token:
+        cached = principal_cache.get(token)
+        if cached is not None:
+            return cached[1]
+
+    claims = decode_token(token)
+    async with AsyncSessionLocal() as db:
+        user = await crud_async.get_user_by_username(db, username=claims["sub"])
     if user is None:
-        raise credentials_exception
-    return user
+        raise _credentials_exception()
+    principal = Principal(user.id, user.username, user.is_active)
+    principal_cache.put(token, claims, principal)
+    return principal
+
+
+async def get_current_admin_user(current_user=Depends(get_current_user)):
+    """Пользователь из ADMIN_USERNAMES (служебные эндпоинты)"""
+    admins = {name.strip() for name in settings.ADMIN_USERNAMES.split(",") if name.strip()}
+    if current_user.username not in admins:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
 
 
 async def get_current_active_user(current_user=Depends(get_current_user)):
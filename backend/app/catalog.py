@@ -0,0 +1,112 @@
+"""
+Справочник игры: стихии, виды покемонов и шаблоны врагов.
+
+Строится один раз при импорте и дальше не меняется: стихии и виды получают
+небольшие целые id, эффективность стихий лежит в плотной матрице (кортежи,
+атакующий x защищающийся). Мастер gunicorn импортирует модуль до запуска
+воркеров (см. gunicorn.conf.py), и те получают справочник через copy-on-write.
+"""
+import sys
+from typing import Dict, NamedTuple, Tuple
+
+# Все стихии из models.UserPokemon; id неизвестной стихии - len(ELEMENTS)
+ELEMENTS: Tuple[str, ...] = (
+    "normal", "fire", "water", "grass", "electric", "ice", "fighting", "poison", "ground",
+    "flying", "psychic", "bug", "rock", "ghost", "dark", "dragon", "steel", "fairy",
+)
+ELEMENT_IDS: Dict[str, int] = {element: i for i, element in enumerate(ELEMENTS)}
+UNKNOWN_ELEMENT = len(ELEMENTS)
+
+# Отличные от 1.0 множители урона: атакующий -> {защищающийся: множитель}
+_EFFECTIVENESS = {
+    "fire": {"grass": 2.0, "water": 0.5, "ice": 2.0, "bug": 2.0, "steel": 2.0},
+    "water": {"fire": 2.0, "grass": 0.5, "ground": 2.0, "rock": 2.0},
+    "grass": {"water": 2.0, "fire": 0.5, "ground": 2.0, "rock": 2.0, "electric": 0.5},
+    "electric": {"water": 2.0, "flying": 2.0, "grass": 0.5, "ground": 0},
+    "flying": {"grass": 2.0, "fighting": 2.0, "bug": 2.0, "electric": 0.5, "rock": 0.5},
+    "poison": {"grass": 2.0, "fairy": 2.0, "poison": 0.5, "ground": 0.5, "psychic": 0.5},
+    "psychic": {"fighting": 2.0, "poison": 2.0, "dark": 0, "ghost": 0.5},
+    "fighting": {"normal": 2.0, "rock": 2.0, "steel": 2.0, "flying": 0.5, "psychic": 0.5},
+    "rock": {"fire": 2.0, "ice": 2.0, "flying": 2.0, "bug": 2.0, "fighting": 0.5, "ground": 0.5},
+}
+
+# Плотная матрица [атакующий][защищающийся], включая строку/столбец неизвестной стихии
+TYPE_CHART: Tuple[Tuple[float, ...], ...] = tuple(
+    tuple(float(_EFFECTIVENESS.get(attacker, {}).get(defender, 1.0))
+          for defender in ELEMENTS + ("",))
+    for attacker in ELEMENTS + ("",)
+)
+
+
+def element_id(element: str) -> int:
+    return ELEMENT_IDS.get(element, UNKNOWN_ELEMENT)
+
+
+def type_multiplier(attacker: str, defender: str) -> float:
+    """Множитель урона стихии attacker по стихии defender (бой берет TYPE_CHART по element_index сущностей)"""
+    return TYPE_CHART[ELEMENT_IDS.get(attacker, UNKNOWN_ELEMENT)][ELEMENT_IDS.get(defender, UNKNOWN_ELEMENT)]
+
+
+class Species(NamedTuple):
+    """Неизменяемый шаблон покемона игрока"""
+    id: int
+    name: str
+    element: str
+    health: int
+    attack: int
+    speed: float
+
+
+class EnemyTemplate(NamedTuple):
+    """Шаблон врага: характеристики растут с номером волны"""
+    id: int
+    name: str
+    element: str
+    health: int
+    health_per_wave: int
+    attack: int
+    attack_per_wave: int
+    speed: int
+    speed_per_wave: int
+
+    def stats(self, wave: int) -> Dict:
+        return {"name": self.name, "element": self.element,
+                "health": self.health + wave * self.health_per_wave,
+                "attack": self.attack + wave * self.attack_per_wave,
+                "speed": self.speed + wave * self.speed_per_wave}
+
+
+def _species(*rows) -> Tuple[Species, ...]:
+    return tuple(Species(id, sys.intern(name), sys.intern(element), health, attack, speed)
+                 for id, name, element, health, attack, speed in rows)
+
+
+# Порядок важен: ГСЧ игры выбирает по индексу, иначе старые игры не воспроизведутся
+STARTERS = _species(
+    (1, "Charmander", "fire", 60, 12, 2.0),
+    (2, "Squirtle", "water", 70, 10, 1.8),
+    (3, "Bulbasaur", "grass", 65, 11, 1.6),
+)
+
+POKEBALL_SPECIES = _species(
+    (4, "Pikachu", "electric", 45, 18, 2.5),
+    (5, "Jigglypuff", "normal", 85, 9, 1.2),
+    (6, "Meowth", "normal", 45, 15, 2.2),
+    (7, "Psyduck", "water", 55, 12, 1.5),
+    (8, "Growlithe", "fire", 60, 14, 2.0),
+    (9, "Abra", "psychic", 40, 20, 1.8),
+    (10, "Machop", "fighting", 70, 16, 1.4),
+)
+
+ENEMY_TEMPLATES: Tuple[EnemyTemplate, ...] = tuple(
+    EnemyTemplate(id, sys.intern(name), sys.intern(element), *growth)
+    for id, name, element, *growth in (
+        (11, "Rattata", "normal", 25, 4, 8, 1, 50, 8),
+        (12, "Spearow", "flying", 20, 3, 10, 1, 60, 10),
+        (13, "Zubat", "poison", 30, 5, 12, 1, 45, 7),
+        (14, "Geodude", "rock", 40, 6, 15, 1, 30, 5),
+    )
+)
+
+SPECIES_IDS: Dict[str, int] = {entry.name: entry.id
+                               for entry in STARTERS + POKEBALL_SPECIES + ENEMY_TEMPLATES}
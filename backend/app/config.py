@@ -2,20 +2,66 @@ import os
 from typing import Optional
 from pydantic_settings import BaseSettings
 
+# Данные приложения на диске (журнал результатов, выгруженные игры) - рядом с кодом backend, а не в /tmp
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
 
 class Settings(BaseSettings):
     # Базовые настройки
     PROJECT_NAME: str = "PokeTD"
     VERSION: str = "1.0.0"
     API_V1_STR: str = "/api/v1"
+    # Число HTTP-воркеров (gunicorn.conf.py выставляет его сам)
+    WEB_CONCURRENCY: int = 1
 
     # Настройки базы данных
     DATABASE_URL: Optional[str] = None
 
+    # Redis: общее хранилище игр для нескольких воркеров (без него - память процесса)
+    REDIS_URL: Optional[str] = None
+
     # JWT настройки
     SECRET_KEY: str = "your-secret-key-change-this-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Кэш проверенных токенов в воркере (без JWT и запроса к БД на каждый запрос)
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL: float = 60.0  # Секунд; 0 - выключить кэш
+
+    # Пользователи с доступом к служебным эндпоинтам (через запятую)
+    ADMIN_USERNAMES: str = ""
+
+    # Игровой цикл (серверные тики)
+    GAME_TICK_RATE: float = 10.0  # Частота симуляции, тиков в секунду
+    GAME_MAX_CATCHUP_TICKS: int = 5  # Сколько пропущенных тиков можно догнать за раз
+    # Действие из пачки /actions, сделанное клиентом по версии старше текущей больше чем на столько,
+    # отклоняется (версия растет каждый тик и с каждым действием: 50 - около 5 секунд)
+    GAME_ACTION_MAX_LAG: int = 50
+    GAME_ENGINE: str = "python"  # "python", "numpy" (векторизованная игра), "world" (пакетный мир)
+    # или "shared" (пакетный мир в shared memory, шагается пулом процессов)
+    GAME_SHARED_WORKERS: int = 0  # Процессов в пуле для GAME_ENGINE=shared (0 - ядра / процессы с играми)
+    GAME_VERIFY_RESULTS: bool = True  # Проверять результат пересимуляцией перед начислением монет
+
+    # Хранилище активных игр
+    GAME_LOCAL_CACHE_SIZE: int = 1000  # Сколько игр держит в памяти один воркер
+    GAME_MAX_RESIDENT_BYTES: int = 64 * 1024 * 1024  # Бюджет памяти на игры воркера (по размеру снимков)
+    GAME_IDLE_TTL: float = 300.0  # Через сколько секунд без запросов игра выгружается из памяти
+    # Папка для выгруженных игр без Redis; ее делят воркеры машины (владение - flock на файлах).
+    # Пусто - снимки в памяти процесса: тогда выгрузка не освобождает память воркера
+    GAME_SPILL_DIR: Optional[str] = os.path.join(DATA_DIR, "games")
+    GAME_WRITE_BACK_INTERVAL: float = 1.0  # Как часто измененные игры записываются в Redis, секунды
+    GAME_OWNER_TTL: int = 30  # Через сколько секунд без записи владение игрой истекает
+    GAME_HANDOVER_TIMEOUT: float = 2.0  # Сколько ждать, пока другой воркер отдаст игру, секунды
+
+    # Отложенная запись результатов игр (result_writer): журнал на диске и сброс в БД пачками
+    # Пусто - без журнала (только память); на Render лучше указать постоянный диск
+    GAME_RESULTS_JOURNAL_DIR: Optional[str] = os.path.join(DATA_DIR, "game-results")
+    GAME_RESULTS_BATCH_SIZE: int = 200  # Сбрасывать сразу, когда накопилось столько результатов
+    GAME_RESULTS_FLUSH_INTERVAL: float = 0.5  # Иначе - раз в столько секунд
+
+    # Пул процессов-хостов игр: 0 - игры симулируются в самих HTTP-воркерах
+    GAME_HOSTS: int = 0
+    GAME_HOST_SOCKET_DIR: str = "/tmp/poketd-game-hosts"
 
     class Config:
         env_file = ".env"
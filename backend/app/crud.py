@@ -1,7 +1,10 @@
+from typing import Dict
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy import Integer, bindparam, desc, func, select, update
 from . import models, schemas
-from .auth import get_password_hash
+# Модулем, а не именем: auth импортирует crud_async, а тот - этот модуль
+from . import auth
 
 
 # User CRUD
@@ -27,7 +30,7 @@ def create_user(db: Session, user: schemas.UserCreate):
     if existing_email:
         return None
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = auth.get_password_hash(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -50,8 +53,60 @@ def create_user(db: Session, user: schemas.UserCreate):
 
 
 # Game Session CRUD
-def create_game_session(db: Session, session_data: schemas.GameResult, user_id: int):
-    db_session = models.GameSession(
+def game_result_statements(dialect_name: str):
+    """
+    Начисление монет и обновление лидерборда для сохраняемых игр - на стороне SQL,
+    без чтения строк в Python: параллельные сохранения одного игрока не теряют обновления.
+    Лидерборд - upsert по user_id (строка создается, если ее нет), high_score через greatest().
+    Параметры - game_result_params(); список параметров выполняется как executemany.
+    """
+    add_coins = update(models.User) \
+        .where(models.User.id == bindparam("uid")) \
+        .values(poke_coins=models.User.poke_coins + bindparam("coins"))
+
+    leaderboard = models.Leaderboard
+    if dialect_name == "postgresql":
+        insert, greatest = postgresql.insert, func.greatest
+    else:
+        # В SQLite max() с двумя аргументами - скалярная функция, как greatest()
+        insert, greatest = sqlite.insert, func.max
+    upsert = insert(leaderboard).from_select(
+        ["user_id", "username", "high_score", "total_waves", "total_pokemons", "total_enemies"],
+        select(
+            models.User.id,
+            models.User.username,
+            bindparam("score", type_=Integer),
+            bindparam("waves", type_=Integer),
+            bindparam("pokemons", type_=Integer),
+            bindparam("enemies", type_=Integer),
+        ).where(models.User.id == bindparam("uid"))
+    )
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[leaderboard.user_id],
+        set_={
+            "high_score": greatest(leaderboard.high_score, upsert.excluded.high_score),
+            "total_waves": leaderboard.total_waves + upsert.excluded.total_waves,
+            "total_pokemons": leaderboard.total_pokemons + upsert.excluded.total_pokemons,
+            "total_enemies": leaderboard.total_enemies + upsert.excluded.total_enemies,
+            "updated_at": func.now(),
+        }
+    )
+    return add_coins, upsert
+
+
+def game_result_params(session_data: schemas.GameResult, user_id: int) -> Dict:
+    return {
+        "uid": user_id,
+        "coins": session_data.poke_coins_earned,
+        "score": session_data.score,
+        "waves": session_data.waves_completed,
+        "pokemons": session_data.pokemons_caught,
+        "enemies": session_data.enemies_defeated,
+    }
+
+
+def new_game_session(session_data: schemas.GameResult, user_id: int) -> models.GameSession:
+    return models.GameSession(
         user_id=user_id,
         score=session_data.score,
         poke_coins_earned=session_data.poke_coins_earned,
@@ -61,26 +116,21 @@ def create_game_session(db: Session, session_data: schemas.GameResult, user_id:
         game_duration=session_data.game_duration,
         victory=session_data.victory
     )
-    db.add(db_session)
 
-    # Обновляем баланс пользователя
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if user:
-        user.poke_coins += session_data.poke_coins_earned
 
-    db.commit()
-    db.refresh(db_session)
-
-    # Обновляем лидерборд
-    leaderboard = db.query(models.Leaderboard).filter(models.Leaderboard.user_id == user_id).first()
-    if leaderboard:
-        if session_data.score > leaderboard.high_score:
-            leaderboard.high_score = session_data.score
-        leaderboard.total_waves += session_data.waves_completed
-        leaderboard.total_pokemons += session_data.pokemons_caught
-        leaderboard.total_enemies += session_data.enemies_defeated
+def create_game_session(db: Session, session_data: schemas.GameResult, user_id: int):
+    """Сессия, монеты и лидерборд - одной транзакцией"""
+    db_session = new_game_session(session_data, user_id)
+    db.add(db_session)
+    try:
+        db.flush()
+        connection = db.connection()
+        for statement in game_result_statements(connection.dialect.name):
+            connection.execute(statement, game_result_params(session_data, user_id))
         db.commit()
-
+    except Exception:
+        db.rollback()
+        raise
     return db_session
 
 
@@ -96,7 +146,7 @@ def get_user_game_sessions(db: Session, user_id: int, skip: int = 0, limit: int
 # Leaderboard CRUD
 def get_leaderboard(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Leaderboard) \
-        .order_by(desc(models.Leaderboard.high_score)) \
+        .order_by(desc(models.Leaderboard.high_score), desc(models.Leaderboard.user_id)) \
         .offset(skip) \
         .limit(limit) \
         .all()
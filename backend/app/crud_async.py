@@ -0,0 +1,215 @@
+"""
+Асинхронные версии функций crud.py для AsyncSession (database.get_async_db).
+Сигнатуры и результаты те же, только функции - корутины.
+"""
+from sqlalchemy import and_, desc, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from . import models, schemas
+# Модулями, а не именами: auth импортирует этот модуль сам
+from . import auth, crud
+from .leaderboard_index import leaderboard_index, leaderboard_rows
+
+
+# User CRUD
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.scalar(select(models.User).where(models.User.id == user_id))
+
+
+async def get_user_by_username(db: AsyncSession, username: str):
+    return await db.scalar(select(models.User).where(models.User.username == username))
+
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(models.User).where(models.User.email == email))
+
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    # Проверяем, существует ли пользователь
+    existing_user = await get_user_by_username(db, username=user.username)
+    if existing_user:
+        return None
+
+    existing_email = await get_user_by_email(db, email=user.email)
+    if existing_email:
+        return None
+
+    # bcrypt занимает сотни миллисекунд CPU - считаем его вне цикла событий
+    hashed_password = await run_in_threadpool(auth.get_password_hash, user.password)
+    db_user = models.User(
+        username=user.username,
+        email=user.email,
+        hashed_password=hashed_password,
+        poke_coins=100  # Начальные монеты при регистрации
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+
+    # Создаем запись в лидерборде для нового пользователя
+    leaderboard_entry = models.Leaderboard(
+        user_id=db_user.id,
+        username=db_user.username
+    )
+    db.add(leaderboard_entry)
+    await db.commit()
+    await leaderboard_index.record([(db_user.id, db_user.username, 0, 0)])
+
+    return db_user
+
+
+# Game Session CRUD
+async def create_game_session(db: AsyncSession, session_data: schemas.GameResult, user_id: int):
+    """Сессия, монеты и лидерборд - одной транзакцией"""
+    db_session = crud.new_game_session(session_data, user_id)
+    db.add(db_session)
+    try:
+        await db.flush()
+        connection = await db.connection()
+        for statement in crud.game_result_statements(connection.dialect.name):
+            await connection.execute(statement, crud.game_result_params(session_data, user_id))
+        rows = await leaderboard_rows(db, [user_id]) if leaderboard_index.enabled else []
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    await leaderboard_index.record(rows)
+    return db_session
+
+
+async def get_user_game_sessions(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 10):
+    result = await db.scalars(
+        select(models.GameSession)
+        .where(models.GameSession.user_id == user_id)
+        .order_by(desc(models.GameSession.created_at))
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.all()
+
+
+# Leaderboard CRUD
+async def get_leaderboard(db: AsyncSession, skip: int = 0, limit: int = 100):
+    # При равных рекордах - по убыванию user_id, как в индексе лидерборда в Redis
+    result = await db.scalars(
+        select(models.Leaderboard)
+        .order_by(desc(models.Leaderboard.high_score), desc(models.Leaderboard.user_id))
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.all()
+
+
+async def get_leaderboard_size(db: AsyncSession) -> int:
+    return await db.scalar(select(func.count()).select_from(models.Leaderboard))
+
+
+async def get_user_rank(db: AsyncSession, user_id: int):
+    """Место игрока по рекорду из SQL (COUNT по таблице) - когда нет индекса лидерборда"""
+    high_score = await db.scalar(
+        select(models.Leaderboard.high_score).where(models.Leaderboard.user_id == user_id)
+    )
+    if high_score is None:
+        return None
+    better = await db.scalar(
+        select(func.count()).select_from(models.Leaderboard).where(or_(
+            models.Leaderboard.high_score > high_score,
+            and_(models.Leaderboard.high_score == high_score, models.Leaderboard.user_id > user_id),
+        ))
+    )
+    return better + 1
+
+
+async def get_user_stats(db: AsyncSession, user_id: int):
+    user_stats = await db.scalar(select(models.Leaderboard).where(models.Leaderboard.user_id == user_id))
+
+    # Получаем последние игры пользователя
+    recent_games = await get_user_game_sessions(db, user_id, limit=10)
+
+    # Получаем пользователя для монет
+    user = await get_user(db, user_id)
+
+    return {
+        "leaderboard": user_stats,
+        "recent_games": recent_games,
+        "poke_coins": user.poke_coins if user else 0
+    }
+
+
+# Pokemon CRUD
+async def add_pokemon_to_user(db: AsyncSession, user_id: int, pokemon_data: schemas.PokemonCreate):
+    db_pokemon = models.UserPokemon(
+        user_id=user_id,
+        pokemon_id=pokemon_data.pokemon_id,
+        name=pokemon_data.name,
+        element=pokemon_data.element,
+        base_health=pokemon_data.base_health,
+        base_attack=pokemon_data.base_attack,
+        level=pokemon_data.level if hasattr(pokemon_data, 'level') else 1,
+        experience=pokemon_data.experience if hasattr(pokemon_data, 'experience') else 0,
+        is_favorite=False
+    )
+    db.add(db_pokemon)
+    await db.commit()
+    await db.refresh(db_pokemon)
+    return db_pokemon
+
+
+async def get_user_pokemons(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100):
+    result = await db.scalars(
+        select(models.UserPokemon)
+        .where(models.UserPokemon.user_id == user_id)
+        .order_by(desc(models.UserPokemon.level), desc(models.UserPokemon.experience))
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.all()
+
+
+async def update_pokemon_favorite(db: AsyncSession, pokemon_id: int, user_id: int, is_favorite: bool):
+    pokemon = await db.scalar(
+        select(models.UserPokemon)
+        .where(models.UserPokemon.id == pokemon_id, models.UserPokemon.user_id == user_id)
+    )
+
+    if pokemon:
+        pokemon.is_favorite = is_favorite
+        await db.commit()
+        await db.refresh(pokemon)
+
+    return pokemon
+
+
+async def update_user_coins(db: AsyncSession, user_id: int, coins_change: int):
+    user = await get_user(db, user_id)
+    if user:
+        user.poke_coins += coins_change
+        # Гарантируем, что монеты не уйдут в минус
+        if user.poke_coins < 0:
+            user.poke_coins = 0
+        await db.commit()
+        await db.refresh(user)
+    return user
+
+
+async def set_user_active(db: AsyncSession, user_id: int, is_active: bool):
+    user = await get_user(db, user_id)
+    if user:
+        user.is_active = is_active
+        await db.commit()
+        await db.refresh(user)
+        # Токены пользователя в кэше воркера хранят старый is_active
+        auth.invalidate_user(user_id)
+    return user
+
+
+async def update_user(db: AsyncSession, user_id: int, user_update: schemas.UserUpdate):
+    user = await get_user(db, user_id)
+    if user:
+        user.username = user_update.username
+        user.email = user_update.email
+        await db.commit()
+        await db.refresh(user)
+        # Кэш воркера хранит старое имя; токены со старым "sub" после этого не проходят
+        auth.invalidate_user(user_id)
+    return user
@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+from sqlalchemy import Table, create_engine, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
@@ -34,6 +36,65 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def get_async_engine_args(database_url: str):
+    """
+    URL и connect_args асинхронного движка для того же DATABASE_URL:
+    sqlite -> aiosqlite, postgresql -> asyncpg.
+    asyncpg не понимает sslmode из URL libpq, поэтому переносим его в connect_args.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite"), {}
+
+    connect_args = {}
+    sslmode = url.query.get("sslmode")
+    if sslmode is not None:
+        url = url.difference_update_query(["sslmode"])
+        if sslmode != "disable":
+            connect_args["ssl"] = sslmode
+    return url.set(drivername="postgresql+asyncpg"), connect_args
+
+
+# ⭐ Асинхронный движок для эндпоинтов: запросы не блокируют цикл событий воркера.
+# Синхронный engine остается для создания таблиц и скриптов
+async_database_url, async_connect_args = get_async_engine_args(DATABASE_URL)
+if DATABASE_URL.startswith("sqlite"):
+    async_engine = create_async_engine(async_database_url, echo=False)
+else:
+    async_engine = create_async_engine(
+        async_database_url,
+        connect_args=async_connect_args,
+        pool_size=10,
+        max_overflow=20,
+        pool_pre_ping=True,
+        echo=False
+    )
+
+# expire_on_commit=False: после commit объекты читаются без ленивых запросов (в async их нет)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False,
+                                       expire_on_commit=False)
+
+
+def ensure_unique_index(table: Table, column: str):
+    """
+    Создает UNIQUE-индекс на столбце, если в базе его нет. create_all не меняет
+    существующие таблицы, а старые базы (game.db4) создавались без unique у
+    leaderboard.user_id - без него не работает upsert лидерборда (ON CONFLICT).
+    """
+    inspector = inspect(engine)
+    unique_columns = [c["column_names"] for c in inspector.get_unique_constraints(table.name)]
+    unique_columns += [i["column_names"] for i in inspector.get_indexes(table.name) if i["unique"]]
+    if [column] in unique_columns:
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{table.name}_{column} "
+                              f"ON {table.name} ({column})"))
+        print(f"✓ Created unique index on {table.name}.{column}")
+    except Exception as e:
+        print(f"⚠️ Could not create unique index on {table.name}.{column}: {e}")
+
+
 def get_db():
     """
     Dependency для получения сессии БД.
@@ -44,3 +105,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Асинхронный вариант get_db для async-эндпоинтов.
+    Гарантирует закрытие сессии после использования.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
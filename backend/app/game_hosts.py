@@ -0,0 +1,354 @@
+"""
+Пул процессов-хостов игр (GAME_HOSTS > 0).
+
+Каждый хост - отдельный процесс со своим LocalGameService: хранилищем игр и серверным
+циклом. Игрок закрепляется за хостом консистентным хешированием user_id, HTTP-воркеры
+пересылают вызовы по Unix-сокету. Сообщения - JSON с префиксом длины (u32, big-endian):
+    запрос  {"id": ..., "method": ..., "args": {...}}
+    ответ   {"id": ..., "result": ...} или {"id": ..., "error": {"status_code": ..., "detail": ...}}
+
+Хосты запускает мастер gunicorn (см. gunicorn.conf.py) или команда
+    python -m app.game_hosts
+из папки backend. GameHostSupervisor перезапускает упавший хост на том же сокете:
+игроки этого хоста получают 503 только на время перезапуска, а их игры новый процесс
+поднимает из общего хранилища (Redis или GAME_SPILL_DIR).
+"""
+import asyncio
+import base64
+import bisect
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import struct
+import threading
+from typing import Callable, Dict, List, Optional
+from fastapi import HTTPException
+from . import schemas
+from .config import settings
+
+_LENGTH = struct.Struct(">I")
+
+# Методы LocalGameService, доступные через IPC
+HOST_METHODS = ("start_game", "end_game", "act", "act_batch", "get_state", "get_state_bytes", "get_state_delta",
+                "metrics")
+
+
+def host_socket_path(index: int) -> str:
+    return os.path.join(settings.GAME_HOST_SOCKET_DIR, f"host-{index}.sock")
+
+
+class HashRing:
+    """Консистентное хеширование: при изменении числа хостов переезжает лишь часть игроков"""
+
+    def __init__(self, nodes: List[str], replicas: int = 64):
+        self.nodes = list(nodes)
+        self.ring: List[int] = []
+        self.owners: List[str] = []
+        points = sorted((self._hash(f"{node}#{replica}"), node) for node in self.nodes
+                        for replica in range(replicas))
+        for point, node in points:
+            self.ring.append(point)
+            self.owners.append(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def node_for(self, key) -> str:
+        index = bisect.bisect(self.ring, self._hash(str(key))) % len(self.ring)
+        return self.owners[index]
+
+
+async def _read_message(reader: asyncio.StreamReader) -> Dict:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return json.loads(await reader.readexactly(length))
+
+
+def _write_message(writer: asyncio.StreamWriter, message: Dict):
+    payload = json.dumps(message).encode("utf-8")
+    writer.write(_LENGTH.pack(len(payload)) + payload)
+
+
+# --- Хост ---
+
+async def _handle_request(service, message: Dict) -> Dict:
+    method = message.get("method")
+    args = dict(message.get("args") or {})
+    try:
+        if method not in HOST_METHODS:
+            raise HTTPException(status_code=400, detail=f"Unknown method {method}")
+        if method == "act":
+            args["action"] = schemas.GameAction(**args["action"])
+        elif method == "act_batch":
+            args["batch"] = schemas.GameActionBatch(**args["batch"])
+        result = await getattr(service, method)(**args)
+        if isinstance(result, bytes):
+            # JSON не передает байты
+            result = base64.b64encode(result).decode("ascii")
+        return {"id": message.get("id"), "result": result}
+    except HTTPException as e:
+        return {"id": message.get("id"), "error": {"status_code": e.status_code, "detail": e.detail}}
+    except Exception as e:
+        print(f"❌ Game host error in {method}: {e}")
+        return {"id": message.get("id"), "error": {"status_code": 500, "detail": str(e)}}
+
+
+async def serve_game_host(path: str):
+    """Основной цикл процесса-хоста: игры этого хоста и IPC-сервер для HTTP-воркеров"""
+    from .game_service import create_local_service
+    service = create_local_service()
+    await service.start()
+
+    async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+
+        async def respond(message: Dict):
+            response = await _handle_request(service, message)
+            async with write_lock:
+                _write_message(writer, response)
+                await writer.drain()
+
+        # Запросы одного соединения выполняются параллельно (действие ждет тика)
+        tasks = set()
+        try:
+            while True:
+                message = await _read_message(reader)
+                task = asyncio.create_task(respond(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(handle_connection, path=path)
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    print(f"🎮 Game host {os.getpid()} listening on {path}")
+    async with server:
+        await stopping.wait()
+    await service.stop()
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def run_game_host(path: str):
+    asyncio.run(serve_game_host(path))
+
+
+def _host_alive(process: multiprocessing.Process) -> bool:
+    if not process.is_alive():
+        return False
+    # Мастер gunicorn сам забирает статус всех дочерних процессов (waitpid(-1)), и тогда
+    # is_alive() не узнает о смерти хоста - проверяем pid напрямую
+    try:
+        os.kill(process.pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+class GameHostSupervisor:
+    """
+    Процессы-хосты и поток в мастере, который раз в check_interval секунд проверяет их
+    и перезапускает упавший хост на том же сокете (HTTP-воркеры переподключаются сами)
+    """
+
+    def __init__(self, count: int, check_interval: float = 1.0, target: Callable[[str], None] = run_game_host):
+        self.count = count
+        self.check_interval = check_interval
+        self.target = target
+        self.processes: List[multiprocessing.Process] = []
+        self.restarts = 0
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        # spawn, чтобы не наследовать состояние мастера
+        process = multiprocessing.get_context("spawn").Process(
+            target=self.target, args=(host_socket_path(index),), name=f"game-host-{index}", daemon=True)
+        process.start()
+        return process
+
+    def start(self):
+        os.makedirs(settings.GAME_HOST_SOCKET_DIR, exist_ok=True)
+        self.processes = [self._spawn(index) for index in range(self.count)]
+        self._thread = threading.Thread(target=self._watch, name="game-host-supervisor", daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        while not self._stopping.wait(self.check_interval):
+            for index, process in enumerate(self.processes):
+                if _host_alive(process) or self._stopping.is_set():
+                    continue
+                print(f"⚠️ Game host {index} exited with code {process.exitcode}, restarting")
+                process.join(self.check_interval)
+                self.processes[index] = self._spawn(index)
+                self.restarts += 1
+
+    def join(self):
+        """Ждет остановки (для запуска без gunicorn)"""
+        while self._thread is not None and self._thread.is_alive():
+            self._thread.join(self.check_interval)
+
+    def stop(self, timeout: float = 10.0):
+        # Сначала останавливаем наблюдение, иначе остановленные хосты перезапустились бы
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join(timeout)
+
+
+# --- Клиент в HTTP-воркере ---
+
+class GameHostClient:
+    """Соединение с одним хостом; запросы мультиплексируются по id"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.next_id = 1
+        # Создается в event loop воркера (объект клиента создается при импорте)
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._reader_task: Optional[asyncio.Task] = None
+
+    async def _ensure_connected(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self.writer is not None and not self.writer.is_closing():
+                return
+            self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+            self._reader_task = asyncio.create_task(self._read_responses(self.reader))
+
+    async def _read_responses(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                message = await _read_message(reader)
+                future = self.pending.pop(message.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            # Хост упал (супервизор перезапустит его на том же сокете) - ожидающие запросы
+            # завершаются ошибкой, следующий запрос переподключится
+            pending, self.pending = self.pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(HTTPException(status_code=503, detail=f"Game host unavailable: {e}"))
+            if self.writer is not None:
+                self.writer.close()
+
+    async def call(self, method: str, **args):
+        try:
+            await self._ensure_connected()
+        except OSError as e:
+            raise HTTPException(status_code=503, detail=f"Game host unavailable: {e}")
+
+        request_id = self.next_id
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        _write_message(self.writer, {"id": request_id, "method": method, "args": args})
+        await self.writer.drain()
+
+        response = await future
+        error = response.get("error")
+        if error is not None:
+            raise HTTPException(status_code=error["status_code"], detail=error["detail"])
+        return response.get("result")
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self.writer is not None:
+            self.writer.close()
+
+
+class ShardedGameService:
+    """Тот же интерфейс, что у LocalGameService, но игры живут в процессах-хостах"""
+
+    def __init__(self, paths: List[str], tick_interval: float):
+        self.hosts = {path: GameHostClient(path) for path in paths}
+        self.ring = HashRing(paths)
+        self.tick_interval = tick_interval
+
+    @classmethod
+    def from_settings(cls) -> "ShardedGameService":
+        paths = [host_socket_path(index) for index in range(settings.GAME_HOSTS)]
+        return cls(paths, tick_interval=1.0 / settings.GAME_TICK_RATE)
+
+    def host_for(self, user_id: int) -> GameHostClient:
+        return self.hosts[self.ring.node_for(user_id)]
+
+    async def start(self):
+        # Соединения с хостами открываются при первом запросе
+        pass
+
+    async def stop(self):
+        for host in self.hosts.values():
+            await host.close()
+
+    async def start_game(self, user_id: int) -> Optional[Dict]:
+        return await self.host_for(user_id).call("start_game", user_id=user_id)
+
+    async def end_game(self, user_id: int) -> Dict:
+        return await self.host_for(user_id).call("end_game", user_id=user_id)
+
+    async def act(self, user_id: int, action: schemas.GameAction) -> Dict:
+        return await self.host_for(user_id).call("act", user_id=user_id, action=action.model_dump())
+
+    async def act_batch(self, user_id: int, batch: schemas.GameActionBatch) -> Dict:
+        return await self.host_for(user_id).call("act_batch", user_id=user_id, batch=batch.model_dump())
+
+    async def get_state(self, user_id: int) -> Dict:
+        return await self.host_for(user_id).call("get_state", user_id=user_id)
+
+    async def get_state_bytes(self, user_id: int, media_type: str) -> bytes:
+        encoded = await self.host_for(user_id).call("get_state_bytes", user_id=user_id, media_type=media_type)
+        return base64.b64decode(encoded)
+
+    async def get_state_delta(self, user_id: int, since: Optional[int]) -> Dict:
+        return await self.host_for(user_id).call("get_state_delta", user_id=user_id, since=since)
+
+    async def wait_for_tick(self):
+        await asyncio.sleep(self.tick_interval)
+
+    async def metrics(self, top: int = 10) -> Dict:
+        """Метрики каждого хоста и суммарное число игр"""
+        hosts = {}
+        for path, host in self.hosts.items():
+            try:
+                hosts[path] = await host.call("metrics", top=top)
+            except HTTPException as e:
+                hosts[path] = {"error": e.detail}
+        reports = [report for report in hosts.values() if "error" not in report]
+        return {
+            "live_games": sum(report["live_games"] for report in reports),
+            "resident_games": sum(report["resident_games"] for report in reports),
+            "approx_bytes": sum(report["approx_bytes"]["total"] for report in reports),
+            "hosts": hosts,
+        }
+
+
+if __name__ == "__main__":
+    supervisor = GameHostSupervisor(max(1, settings.GAME_HOSTS))
+    supervisor.start()
+    try:
+        supervisor.join()
+    except KeyboardInterrupt:
+        supervisor.stop()
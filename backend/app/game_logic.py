@@ -1,13 +1,256 @@
+import bisect
+import math
+import os
 import random
-from typing import List, Dict, Any
+import sys
+import time
+import weakref
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from .catalog import ENEMY_TEMPLATES, POKEBALL_SPECIES, STARTERS, TYPE_CHART, element_id, type_multiplier
+from .spatial_index import EnemyGrid
+from .state_codec import STATE_ENCODERS
+from .state_delta import StateTracker
+
+_MASK64 = (1 << 64) - 1
+
+
+def is_position(x) -> bool:
+    """Координата для play_card: конечное число (bool и строки - нет)"""
+    if not isinstance(x, (int, float)) or isinstance(x, bool):
+        return False
+    try:
+        return math.isfinite(x)
+    except OverflowError:
+        return False
+
+
+class GameRandom(random.Random):
+    """
+    Собственный детерминированный ГСЧ игры (splitmix64).
+    Все состояние - одно 64-битное число, поэтому игру легко воспроизвести и сохранить.
+    """
+
+    def __init__(self, seed: int = 0):
+        super().__init__(seed)
+
+    def seed(self, a=None, version=2):
+        self.state = (a or 0) & _MASK64
+
+    def _next(self) -> int:
+        self.state = (self.state + 0x9E3779B97F4A7C15) & _MASK64
+        z = self.state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+        return z ^ (z >> 31)
+
+    def random(self) -> float:
+        return (self._next() >> 11) * (1.0 / (1 << 53))
+
+    def getrandbits(self, k: int) -> int:
+        result = 0
+        for shift in range(0, k, 64):
+            result |= self._next() << shift
+        return result & ((1 << k) - 1)
+
+    def getstate(self):
+        return self.state
+
+    def setstate(self, state):
+        self.state = state
+
+
+class DurationHistogram:
+    """Гистограмма длительностей с фиксированными границами корзин (в мс)"""
+
+    BOUNDS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float, count: int = 1):
+        """Учитывает count измерений длительностью seconds каждое"""
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.BOUNDS_MS, ms)] += count
+        self.count += count
+        self.total += seconds * count
+        if seconds > self.max:
+            self.max = seconds
+
+    def to_dict(self) -> Dict:
+        buckets = [{"le_ms": bound, "count": n} for bound, n in zip(self.BOUNDS_MS, self.counts)]
+        buckets.append({"le_ms": None, "count": self.counts[-1]})
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "max_ms": self.max * 1000,
+            "buckets": buckets,
+        }
+
+
+class GameMetrics:
+    """
+    Учет игр процесса для планирования емкости: сколько игр живет в памяти
+    (и максимум за время работы процесса) и сколько стоит их тик.
+    """
+
+    def __init__(self):
+        # Все объекты игр процесса, включая пересимуляции и игры, еще не попавшие в хранилище
+        self.games: "weakref.WeakSet[PokemonGameLogic]" = weakref.WeakSet()
+        self.peak_games = 0
+        # Тик одной игры (update или ее доля пакетного шага мира) и тик всего серверного цикла
+        self.game_ticks = DurationHistogram()
+        self.loop_ticks = DurationHistogram()
+
+    def track(self, game: "PokemonGameLogic"):
+        self.games.add(game)
+        if len(self.games) > self.peak_games:
+            self.peak_games = len(self.games)
+
+    def observe_game_tick(self, seconds: float, games: int = 1):
+        self.game_ticks.observe(seconds, games)
+
+    def observe_loop_tick(self, seconds: float):
+        self.loop_ticks.observe(seconds)
+
+    def report(self, resident: Dict[int, "PokemonGameLogic"], top: int = 10) -> Dict:
+        """Сводка по процессу; resident - игры хранилища (их размеры считаются поштучно)"""
+        sizes: List[Tuple[int, Dict[str, int]]] = []
+        for user_id, game in list(resident.items()):
+            sizes.append((user_id, game.memory_usage()))
+        totals = [sum(usage.values()) for _, usage in sizes]
+        largest = sorted(zip(totals, sizes), key=lambda item: item[0], reverse=True)[:top]
+        return {
+            "pid": os.getpid(),
+            "live_games": len(self.games),
+            "peak_live_games": self.peak_games,
+            "resident_games": len(sizes),
+            "approx_bytes": {
+                "total": sum(totals),
+                "mean_per_game": sum(totals) / len(totals) if totals else 0,
+                "max_per_game": max(totals, default=0),
+                "largest": [{"user_id": user_id, "bytes": total, **usage}
+                            for total, (user_id, usage) in largest],
+            },
+            "game_tick": self.game_ticks.to_dict(),
+            "loop_tick": self.loop_ticks.to_dict(),
+        }
+
+
+def _entities_bytes(entities) -> int:
+    """Приблизительный размер списка сущностей (у них __slots__, строки интернированы)"""
+    return sys.getsizeof(entities) + sum(sys.getsizeof(entity) for entity in entities)
+
+
+class Card:
+    """Карта покемона в руке игрока"""
+    __slots__ = ("uid", "id", "name", "element", "element_index", "health", "attack", "speed")
+
+    def __init__(self, id: int, name: str, element: str, health: int, attack: int, speed: float = 1.5,
+                 uid: int = 0):
+        self.uid = uid  # Уникальный в пределах игры идентификатор (для дельт состояния)
+        self.id = id
+        self.name = name
+        self.element = element
+        self.element_index = element_id(element)  # Строка/столбец TYPE_CHART
+        self.health = health
+        self.attack = attack
+        self.speed = speed
+
+    def to_dict(self) -> Dict:
+        return {
+            "uid": self.uid,
+            "id": self.id,
+            "name": self.name,
+            "element": self.element,
+            "health": self.health,
+            "attack": self.attack,
+            "speed": self.speed
+        }
+
+
+class FieldPokemon(Card):
+    """Покемон, выставленный на поле"""
+    __slots__ = ("x", "y", "current_health", "max_health", "attack_cooldown", "is_moving", "target",
+                 "attack_range", "reached_enemy_base", "base_damage_timer")
+
+    def __init__(self, card: Card, x: float, y: float, attack_range: float = 120):
+        super().__init__(card.id, card.name, card.element, card.health, card.attack, card.speed, card.uid)
+        self.x = x
+        self.y = y
+        self.current_health = card.health
+        self.max_health = card.health
+        self.attack_cooldown = 0
+        self.is_moving = False
+        self.target = None
+        self.attack_range = attack_range
+        self.reached_enemy_base = False
+        self.base_damage_timer = 0
+
+    def to_dict(self) -> Dict:
+        data = super().to_dict()
+        data.update({
+            "x": self.x,
+            "y": self.y,
+            "current_health": self.current_health,
+            "max_health": self.max_health,
+            "attack_cooldown": self.attack_cooldown,
+            "is_moving": self.is_moving,
+            "target": self.target,
+            "attack_range": self.attack_range,
+            "reached_enemy_base": self.reached_enemy_base,
+            "base_damage_timer": self.base_damage_timer
+        })
+        return data
+
+
+class Enemy:
+    """Враг: сначала шаблон в очереди волны, после спавна - на поле"""
+    __slots__ = ("uid", "id", "name", "element", "element_index", "health", "attack", "speed", "x", "y",
+                 "current_health")
+
+    def __init__(self, id: int, name: str, element: str, health: int, attack: int, speed: float = 50,
+                 uid: int = 0):
+        self.uid = uid
+        self.id = id
+        self.name = name
+        self.element = element
+        self.element_index = element_id(element)
+        self.health = health
+        self.attack = attack
+        self.speed = speed
+        self.x = 0
+        self.y = 0
+        self.current_health = health
+
+    def to_dict(self) -> Dict:
+        return {
+            "uid": self.uid,
+            "id": self.id,
+            "name": self.name,
+            "element": self.element,
+            "health": self.health,
+            "attack": self.attack,
+            "speed": self.speed,
+            "x": self.x,
+            "y": self.y,
+            "current_health": self.current_health
+        }
 
 
 class PokemonGameLogic:
-    def __init__(self, user_id: int):
+    engine = "python"  # Имя движка для create_game
+
+    def __init__(self, user_id: int, seed: Optional[int] = None):
         self.user_id = user_id
         self.start_time = datetime.now()
+        # Зерно игры: по нему и журналу действий игру можно воспроизвести
+        self.seed = seed if seed is not None else random.getrandbits(63)
         self.reset_game()
+        game_metrics.track(self)
 
     def reset_game(self):
         """Сброс состояния игры к начальным значениям"""
@@ -22,11 +265,29 @@ class PokemonGameLogic:
         self.game_over = False
         self.victory = False
 
+        # Версия состояния растет при каждом изменении. Новая игра начинает с текущего
+        # времени в мс, поэтому версии старой игры клиента не совпадут с версиями новой
+        self.state_version = int(time.time() * 1000)
+        self.state_tracker = StateTracker(self.state_version)
+        self.next_uid = 1
+
+        # Детерминизм: свой ГСЧ, счетчик тиков и журналы для пересимуляции
+        self.rng = GameRandom(self.seed)
+        self.tick = 0
+        self.tick_log: List[List] = []  # [[delta_time, количество тиков подряд], ...]
+        self.action_log: List[tuple] = []  # [(тик, тип действия, параметры), ...]
+        # Версия состояния в последнем сохраненном снимке (None - снимка еще нет)
+        self.snapshot_version: Optional[int] = None
+        # Закодированные ответы /state: media type -> (версия состояния, байты)
+        self.encoded_states: Dict[str, Tuple[int, bytes]] = {}
+
         # Колода и рука
         self.deck = self.generate_initial_deck()
         self.hand = []
         self.field = []
         self.enemies = []
+        # Сетка для быстрого поиска врагов в радиусе атаки
+        self.enemy_grid = EnemyGrid()
 
         # Логика волн
         self.wave_data = self.generate_wave(self.wave)
@@ -37,61 +298,45 @@ class PokemonGameLogic:
         self.player_base_y = 450  # Нижняя граница для врагов
         self.enemy_base_y = 100  # Верхняя граница для наших покемонов
 
-    def generate_initial_deck(self) -> List[Dict]:
-        basic_pokemons = [
-            {"id": 1, "name": "Charmander", "element": "fire", "health": 60, "attack": 12, "speed": 2.0},
-            {"id": 2, "name": "Squirtle", "element": "water", "health": 70, "attack": 10, "speed": 1.8},
-            {"id": 3, "name": "Bulbasaur", "element": "grass", "health": 65, "attack": 11, "speed": 1.6},
-        ]
-        return random.sample(basic_pokemons, 2)
+    def generate_initial_deck(self) -> List[Card]:
+        return [Card(uid=self.new_uid(), **species._asdict()) for species in self.rng.sample(STARTERS, 2)]
 
-    def generate_wave(self, wave_number: int) -> List[Dict]:
+    def generate_wave(self, wave_number: int) -> List[Enemy]:
         enemies = []
         base_count = min(3 + wave_number, 10)
 
+        # Характеристики шаблонов на эту волну считаются один раз на волну
+        enemy_types = [template.stats(wave_number) for template in ENEMY_TEMPLATES]
         for i in range(base_count):
-            enemy_types = [
-                {"name": "Rattata", "element": "normal", "health": 25 + wave_number * 4, "attack": 8 + wave_number,
-                 "speed": 50 + wave_number * 8},
-                {"name": "Spearow", "element": "flying", "health": 20 + wave_number * 3, "attack": 10 + wave_number,
-                 "speed": 60 + wave_number * 10},
-                {"name": "Zubat", "element": "poison", "health": 30 + wave_number * 5, "attack": 12 + wave_number,
-                 "speed": 45 + wave_number * 7},
-                {"name": "Geodude", "element": "rock", "health": 40 + wave_number * 6, "attack": 15 + wave_number,
-                 "speed": 30 + wave_number * 5},
-            ]
-            enemy = random.choice(enemy_types)
-            enemy["id"] = i
-            enemies.append(enemy)
+            enemy = self.rng.choice(enemy_types)
+            enemies.append(Enemy(id=i, uid=self.new_uid(), **enemy))
 
         return enemies
 
     def open_pokeball(self) -> Dict:
+        self.log_action("open_pokeball")
         if self.pokeballs <= 0:
             return {"error": "No pokeballs left"}
 
         self.pokeballs -= 1
 
-        possible_pokemons = [
-            {"name": "Pikachu", "element": "electric", "health": 45, "attack": 18, "speed": 2.5},
-            {"name": "Jigglypuff", "element": "normal", "health": 85, "attack": 9, "speed": 1.2},
-            {"name": "Meowth", "element": "normal", "health": 45, "attack": 15, "speed": 2.2},
-            {"name": "Psyduck", "element": "water", "health": 55, "attack": 12, "speed": 1.5},
-            {"name": "Growlithe", "element": "fire", "health": 60, "attack": 14, "speed": 2.0},
-            {"name": "Abra", "element": "psychic", "health": 40, "attack": 20, "speed": 1.8},
-            {"name": "Machop", "element": "fighting", "health": 70, "attack": 16, "speed": 1.4},
-        ]
-
-        new_pokemon = random.choice(possible_pokemons)
-        new_pokemon["id"] = len(self.hand) + len(self.field) + 100
+        species = self.rng.choice(POKEBALL_SPECIES)
+        new_pokemon = Card(id=len(self.hand) + len(self.field) + 100, uid=self.new_uid(), name=species.name,
+                           element=species.element, health=species.health, attack=species.attack,
+                           speed=species.speed)
 
         self.hand.append(new_pokemon)
+        self.state_version += 1
 
-        return {"success": True, "pokemon": new_pokemon}
+        return {"success": True, "pokemon": new_pokemon.to_dict()}
 
     def play_card(self, card_id: int, x: int) -> Dict:  # ⭐ ИЗМЕНЕНИЕ: убран параметр y
         """Размещение покемона на базе игрока (фиксированная высота)"""
-        card_index = next((i for i, card in enumerate(self.hand) if card["id"] == card_id), None)
+        if not is_position(x):
+            # Не попадает в журнал: снимок хранит x числом, и пересимуляция разошлась бы с игрой
+            return {"error": "Invalid position"}
+        self.log_action("play_card", card_id=card_id, x=x)
+        card_index = next((i for i, card in enumerate(self.hand) if card.id == card_id), None)
 
         if card_index is None:
             return {"error": "Card not found in hand"}
@@ -105,45 +350,33 @@ class PokemonGameLogic:
 
         # Проверяем, не занята ли позиция (допускаем минимальное расстояние 80px)
         for pokemon in self.field:
-            if abs(pokemon["x"] - x) < 80 and abs(pokemon["y"] - base_y) < 50:
+            if abs(pokemon.x - x) < 80 and abs(pokemon.y - base_y) < 50:
                 return {"error": "Position already occupied by another Pokemon"}
 
         card = self.hand.pop(card_index)
-        field_pokemon = {
-            **card,
-            "x": x,
-            "y": base_y,  # ⭐ ФИКСИРОВАННАЯ Y координата
-            "current_health": card["health"],
-            "max_health": card["health"],  # ⭐ НОВОЕ: максимальное здоровье
-            "attack_cooldown": 0,
-            "is_moving": False,
-            "target": None,
-            "speed": card.get("speed", 1.5),
-            "attack_range": 120,
-            "reached_enemy_base": False,  # ⭐ НОВОЕ: достиг базы врага
-            "base_damage_timer": 0  # ⭐ НОВОЕ: таймер для урона на базе врага
-        }
-        self.field.append(field_pokemon)
+        # ⭐ ФИКСИРОВАННАЯ Y координата
+        self.field.append(FieldPokemon(card, x=x, y=base_y, attack_range=120))
+        self.state_version += 1
 
-        return {"success": True, "field": self.field}
+        return {"success": True, "field": [pokemon.to_dict() for pokemon in self.field]}
 
     def update(self, delta_time: float = 0.1) -> Dict:
         """Обновление игрового состояния. delta_time в секундах."""
         if self.game_over:
             return self.get_state()
 
+        self.state_version += 1
+        self.log_tick(delta_time)
+
         # Спавн врагов СВЕРХУ
         self.enemy_spawn_timer += delta_time
         if self.enemy_spawn_timer >= self.enemy_spawn_interval and self.wave_data:
-            enemy_data = self.wave_data.pop(0)
-            enemy = {
-                **enemy_data,
-                "x": random.randint(50, 750),
-                "y": 100,
-                "current_health": enemy_data["health"],
-                "speed": enemy_data.get("speed", 50)
-            }
+            enemy = self.wave_data.pop(0)
+            enemy.x = self.rng.randint(50, 750)
+            enemy.y = 100
+            enemy.current_health = enemy.health
             self.enemies.append(enemy)
+            self.enemy_grid.insert(enemy)
             self.enemy_spawn_timer = 0
 
             if not self.wave_data:
@@ -156,65 +389,63 @@ class PokemonGameLogic:
             target_y = self.player_base_y
 
             # Двигаемся вниз
-            dy = target_y - enemy["y"]
+            dy = target_y - enemy.y
             distance = abs(dy)
 
-            if distance < enemy["speed"] * delta_time:
-                enemy["y"] = target_y
+            if distance < enemy.speed * delta_time:
+                enemy.y = target_y
                 # Враг дошел до базы
                 self.player_health -= 20
                 self.enemies.remove(enemy)
+                self.enemy_grid.remove(enemy)
 
                 if self.player_health <= 0:
                     self.game_over = True
             else:
                 # Продолжаем движение вниз
-                enemy["y"] += enemy["speed"] * delta_time if dy > 0 else -enemy["speed"] * delta_time
+                enemy.y += enemy.speed * delta_time if dy > 0 else -enemy.speed * delta_time
+                self.enemy_grid.move(enemy)
 
         # ⭐ НОВАЯ ЛОГИКА: покемоны на вражеской базе получают урон
         pokemons_to_remove = []
 
         for pokemon in self.field:
-            pokemon["attack_cooldown"] = max(0, pokemon["attack_cooldown"] - delta_time)
+            pokemon.attack_cooldown = max(0, pokemon.attack_cooldown - delta_time)
 
             # Если покемон уже на вражеской базе
-            if pokemon.get("reached_enemy_base", False):
-                pokemon["base_damage_timer"] += delta_time
+            if pokemon.reached_enemy_base:
+                pokemon.base_damage_timer += delta_time
 
                 # Каждую секунду наносим урон равный номеру волны
-                if pokemon["base_damage_timer"] >= 1.0:
-                    pokemon["current_health"] -= self.wave
-                    pokemon["base_damage_timer"] = 0
+                if pokemon.base_damage_timer >= 1.0:
+                    pokemon.current_health -= self.wave
+                    pokemon.base_damage_timer = 0
 
                     # Если здоровье закончилось - удаляем покемона
-                    if pokemon["current_health"] <= 0:
+                    if pokemon.current_health <= 0:
                         pokemons_to_remove.append(pokemon)
                         continue
             else:
-                # Ищем ближайшего врага
-                nearest_enemy = None
-                nearest_distance = float('inf')
-
-                for enemy in self.enemies:
-                    distance = ((pokemon["x"] - enemy["x"]) ** 2 + (pokemon["y"] - enemy["y"]) ** 2) ** 0.5
-                    if distance < pokemon["attack_range"] and distance < nearest_distance:
-                        nearest_enemy = enemy
-                        nearest_distance = distance
+                # Ищем ближайшего врага (только в соседних ячейках сетки)
+                nearest_enemy, nearest_distance = self.enemy_grid.nearest(
+                    pokemon.x, pokemon.y, pokemon.attack_range
+                )
 
                 if nearest_enemy:
                     # Если враг в радиусе атаки
-                    pokemon["is_moving"] = False
-                    pokemon["target"] = nearest_enemy["id"]
+                    pokemon.is_moving = False
+                    pokemon.target = nearest_enemy.id
 
-                    if pokemon["attack_cooldown"] <= 0:
-                        damage_multiplier = self.get_type_multiplier(pokemon["element"], nearest_enemy["element"])
-                        damage = pokemon["attack"] * damage_multiplier
+                    if pokemon.attack_cooldown <= 0:
+                        damage_multiplier = TYPE_CHART[pokemon.element_index][nearest_enemy.element_index]
+                        damage = pokemon.attack * damage_multiplier
 
-                        nearest_enemy["current_health"] -= damage
-                        pokemon["attack_cooldown"] = 0.8
+                        nearest_enemy.current_health -= damage
+                        pokemon.attack_cooldown = 0.8
 
-                        if nearest_enemy["current_health"] <= 0:
+                        if nearest_enemy.current_health <= 0:
                             self.enemies.remove(nearest_enemy)
+                            self.enemy_grid.remove(nearest_enemy)
                             self.score += 15
                             self.player_exp += 2
                             self.poke_coins += 1  # ⭐ НОВОЕ: монеты за врага
@@ -226,24 +457,24 @@ class PokemonGameLogic:
                                 self.player_max_exp = int(self.player_max_exp * 1.2)
                 else:
                     # Если врагов нет, двигаемся вверх к вражеской базе
-                    pokemon["is_moving"] = True
-                    pokemon["target"] = None
+                    pokemon.is_moving = True
+                    pokemon.target = None
 
                     # Двигаемся вверх с учетом скорости покемона
                     target_y = self.enemy_base_y
-                    dy = target_y - pokemon["y"]
+                    dy = target_y - pokemon.y
                     distance = abs(dy)
 
                     if distance > 10:  # Если не достигли цели
                         # Двигаемся вверх
-                        pokemon["y"] -= pokemon["speed"] * delta_time * 30
+                        pokemon.y -= pokemon.speed * delta_time * 30
 
                         # Проверяем, достигли ли вражеской базы
-                        if pokemon["y"] <= target_y:
-                            pokemon["y"] = target_y
-                            pokemon["reached_enemy_base"] = True
-                            pokemon["is_moving"] = False
-                            pokemon["base_damage_timer"] = 0
+                        if pokemon.y <= target_y:
+                            pokemon.y = target_y
+                            pokemon.reached_enemy_base = True
+                            pokemon.is_moving = False
+                            pokemon.base_damage_timer = 0
                             # Награда за достижение вражеской базы
                             self.score += 50
                             self.poke_coins += 5  # ⭐ НОВОЕ: монеты за достижение базы
@@ -259,41 +490,68 @@ class PokemonGameLogic:
 
         return self.get_state()
 
-    def get_type_multiplier(self, attacker: str, defender: str) -> float:
-        effectiveness = {
-            "fire": {"grass": 2.0, "water": 0.5, "ice": 2.0, "bug": 2.0, "steel": 2.0},
-            "water": {"fire": 2.0, "grass": 0.5, "ground": 2.0, "rock": 2.0},
-            "grass": {"water": 2.0, "fire": 0.5, "ground": 2.0, "rock": 2.0, "electric": 0.5},
-            "electric": {"water": 2.0, "flying": 2.0, "grass": 0.5, "ground": 0},
-            "flying": {"grass": 2.0, "fighting": 2.0, "bug": 2.0, "electric": 0.5, "rock": 0.5},
-            "poison": {"grass": 2.0, "fairy": 2.0, "poison": 0.5, "ground": 0.5, "psychic": 0.5},
-            "psychic": {"fighting": 2.0, "poison": 2.0, "dark": 0, "ghost": 0.5},
-            "fighting": {"normal": 2.0, "rock": 2.0, "steel": 2.0, "flying": 0.5, "psychic": 0.5},
-            "rock": {"fire": 2.0, "ice": 2.0, "flying": 2.0, "bug": 2.0, "fighting": 0.5, "ground": 0.5},
+    def log_tick(self, delta_time: float):
+        """Записывает шаг симуляции (подряд идущие одинаковые шаги сворачиваются)"""
+        if self.tick_log and self.tick_log[-1][0] == delta_time:
+            self.tick_log[-1][1] += 1
+        else:
+            self.tick_log.append([delta_time, 1])
+        self.tick += 1
+
+    def log_action(self, action_type: str, **data):
+        self.action_log.append((self.tick, action_type, data))
+
+    @property
+    def dirty(self) -> bool:
+        """Изменилась ли игра после последнего сохраненного снимка"""
+        return self.state_version != self.snapshot_version
+
+    def mark_clean(self, version: int):
+        """Снимок игры версии version сохранен"""
+        self.snapshot_version = version
+
+    def to_snapshot(self) -> bytes:
+        """Полное состояние игры в компактном бинарном виде (см. game_snapshot)"""
+        from .game_snapshot import encode_game
+        return encode_game(self)
+
+    @staticmethod
+    def from_snapshot(data: bytes) -> "PokemonGameLogic":
+        """Восстанавливает игру из to_snapshot() (движок берется из снимка)"""
+        from .game_snapshot import decode_game
+        return decode_game(data)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Приблизительный размер сущностей игры в байтах по частям"""
+        return {
+            "hand": _entities_bytes(self.hand),
+            "field": _entities_bytes(self.field),
+            "enemies": _entities_bytes(self.enemies),
+            "wave_data": _entities_bytes(self.wave_data),
+            "encoded_states": sum(len(data) for _, data in self.encoded_states.values()),
         }
-        return effectiveness.get(attacker, {}).get(defender, 1.0)
+
+    def new_uid(self) -> int:
+        uid = self.next_uid
+        self.next_uid += 1
+        return uid
+
+    def get_type_multiplier(self, attacker: str, defender: str) -> float:
+        return type_multiplier(attacker, defender)
 
     def get_state(self) -> Dict:
-        return {
+        """Единственная точка сериализации сущностей в dict для API"""
+        state = {
+            "version": self.state_version,
             "player_health": self.player_health,
             "player_level": self.player_level,
             "player_exp": self.player_exp,
             "player_max_exp": self.player_max_exp,
             "pokeballs": self.pokeballs,
             "poke_coins": self.poke_coins,  # ⭐ НОВОЕ: монеты в состоянии
-            "hand": self.hand,
-            "field": [
-                {
-                    **pokemon,
-                    "is_moving": pokemon.get("is_moving", False),
-                    "target": pokemon.get("target"),
-                    "speed": pokemon.get("speed", 1.5),
-                    "reached_enemy_base": pokemon.get("reached_enemy_base", False),  # ⭐ НОВОЕ
-                    "max_health": pokemon.get("max_health", pokemon["health"])  # ⭐ НОВОЕ
-                }
-                for pokemon in self.field
-            ],
-            "enemies": self.enemies,
+            "hand": [card.to_dict() for card in self.hand],
+            "field": [pokemon.to_dict() for pokemon in self.field],
+            "enemies": [enemy.to_dict() for enemy in self.enemies],
             "wave": self.wave,
             "score": self.score,
             "game_over": self.game_over,
@@ -301,6 +559,39 @@ class PokemonGameLogic:
             "player_base_y": self.player_base_y,
             "enemy_base_y": self.enemy_base_y
         }
+        self.state_tracker.record(state)
+        return state
+
+    def encoded_state(self, media_type: str, state: Optional[Dict] = None) -> bytes:
+        """
+        Состояние, закодированное для ответа (см. state_codec.STATE_ENCODERS).
+        Кодируется один раз на версию: читатели той же версии получают готовые байты,
+        а любое изменение игры (рост state_version) делает кэш устаревшим.
+        state - уже собранный снимок (например, последний снимок серверного цикла).
+        """
+        version = self.state_version if state is None else state["version"]
+        cached = self.encoded_states.get(media_type)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        if state is None:
+            state = self.get_state()
+        data = STATE_ENCODERS[media_type](state)
+        self.encoded_states[media_type] = (version, data)
+        return data
+
+    def get_state_delta(self, since: Optional[int]) -> Dict:
+        """
+        Изменения после версии since: добавленные/измененные сущности по uid,
+        удаленные uid и изменившиеся скалярные поля. Полный снимок, если since неизвестна.
+        """
+        state = None
+        if self.state_tracker.version != self.state_version:
+            # Трекер должен знать текущую версию
+            state = self.get_state()
+        delta = self.state_tracker.delta(since) if since is not None else None
+        if delta is None:
+            return {**(state or self.get_state()), "delta": False}
+        return delta
 
     def get_game_result(self) -> Dict:
         game_duration = (datetime.now() - self.start_time).total_seconds()
@@ -320,4 +611,29 @@ class PokemonGameLogic:
             "pokemons_caught": len(self.hand) + len(self.field),
             "enemies_defeated": self.score // 15,
             "game_duration": game_duration
-        }
\ No newline at end of file
+        }
+
+
+# Метрики игр этого процесса (см. /api/v1/game/admin/metrics)
+game_metrics = GameMetrics()
+
+
+def create_game(user_id: int, engine: str = "python", seed: Optional[int] = None) -> PokemonGameLogic:
+    """
+    Создает игру с выбранным движком: "python" (по умолчанию), "numpy"
+    (векторизованная игра), "world" (все игры процесса в общих буферах)
+    или "shared" (буферы в shared memory, тик считает пул процессов)
+    """
+    try:
+        if engine == "numpy":
+            from .game_logic_numpy import VectorizedPokemonGameLogic
+            return VectorizedPokemonGameLogic(user_id, seed=seed)
+        if engine == "world":
+            from .game_world import default_world
+            return default_world.create_game(user_id, seed=seed)
+        if engine == "shared":
+            from .game_world_shared import get_shared_world
+            return get_shared_world().create_game(user_id, seed=seed)
+    except ImportError as e:
+        print(f"⚠️ {engine} engine unavailable ({e}), falling back to python engine")
+    return PokemonGameLogic(user_id, seed=seed)
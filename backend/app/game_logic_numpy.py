@@ -0,0 +1,355 @@
+"""
+Векторизованный движок игры на NumPy.
+Позиции, здоровье, кулдауны и скорости хранятся в массивах,
+а движение, поиск цели, урон и удаление выполняются пакетно.
+"""
+from typing import Any, Dict, List
+
+import numpy as np
+
+from .catalog import TYPE_CHART
+from .game_logic import PokemonGameLogic, FieldPokemon, Enemy, is_position
+
+# Матрица эффективности атакующий x защищающийся (последняя строка/столбец - неизвестная стихия)
+TYPE_MULTIPLIERS = np.array(TYPE_CHART)
+
+
+class _Columns:
+    """
+    Колоночное хранилище сущностей: числовые поля в массивах,
+    объекты сущностей хранят только статические данные (имя, стихия и т.п.)
+    """
+
+    def __init__(self, dtypes: Dict[str, type]):
+        self.dtypes = dtypes
+        self.arrays = {name: np.empty(0, dtype=dtype) for name, dtype in dtypes.items()}
+        self.entities: List[Any] = []
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def __setitem__(self, name: str, values: np.ndarray):
+        self.arrays[name] = values
+
+    def append(self, entity, **values):
+        for name, dtype in self.dtypes.items():
+            self.arrays[name] = np.append(self.arrays[name], np.array([values[name]], dtype=dtype))
+        self.entities.append(entity)
+
+    def keep(self, mask: np.ndarray):
+        """Оставляет только строки, где mask == True"""
+        if mask.all():
+            return
+        for name in self.arrays:
+            self.arrays[name] = self.arrays[name][mask]
+        self.entities = [entity for entity, alive in zip(self.entities, mask.tolist()) if alive]
+
+    def clear(self):
+        self.__init__(self.dtypes)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def synced(self) -> List[Any]:
+        """Записывает значения из массивов обратно в объекты сущностей"""
+        columns = [(name, self.arrays[name].tolist()) for name in self.dtypes if name != "element"]
+        for i, entity in enumerate(self.entities):
+            for name, values in columns:
+                setattr(entity, name, values[i])
+        return self.entities
+
+
+FIELD_COLUMNS = {
+    "x": np.float64, "y": np.float64, "speed": np.float64, "attack": np.int64,
+    "attack_range": np.float64, "attack_cooldown": np.float64,
+    "current_health": np.int64, "max_health": np.int64,
+    "base_damage_timer": np.float64, "reached_enemy_base": np.bool_,
+    "is_moving": np.bool_, "target": np.int64, "element": np.int64,
+}
+
+# Здоровье врага дробное: урон - attack * множитель стихии (как в PokemonGameLogic)
+ENEMY_COLUMNS = {
+    "id": np.int64, "x": np.float64, "y": np.float64, "speed": np.float64,
+    "current_health": np.float64, "element": np.int64,
+}
+
+NO_TARGET = -1
+
+
+class VectorizedPokemonGameLogic(PokemonGameLogic):
+    """
+    Тот же игровой процесс, что и PokemonGameLogic, но поле и враги в массивах NumPy.
+    Цели и удары разбираются в порядке поля, как в PokemonGameLogic: покемон после
+    того, кто добил врага, выбирает ближайшего из оставшихся (см. _resolve_attacks).
+    """
+
+    engine = "numpy"
+
+    def reset_game(self):
+        self._field = _Columns(FIELD_COLUMNS)
+        self._enemies = _Columns(ENEMY_COLUMNS)
+        super().reset_game()
+
+    # Сущности поля/врагов с актуальными значениями из массивов
+    @property
+    def field(self) -> List[FieldPokemon]:
+        pokemons = self._field.synced()
+        for pokemon in pokemons:
+            if pokemon.target == NO_TARGET:
+                pokemon.target = None
+        return pokemons
+
+    @field.setter
+    def field(self, pokemons: List[FieldPokemon]):
+        self._field.clear()
+        for pokemon in pokemons:
+            self._add_field_pokemon(pokemon)
+
+    @property
+    def enemies(self) -> List[Enemy]:
+        return self._enemies.synced()
+
+    @enemies.setter
+    def enemies(self, enemies: List[Enemy]):
+        self._enemies.clear()
+        for enemy in enemies:
+            self._add_enemy(enemy)
+
+    def _add_field_pokemon(self, pokemon: FieldPokemon):
+        self._field.append(
+            pokemon,
+            x=pokemon.x,
+            y=pokemon.y,
+            speed=pokemon.speed,
+            attack=pokemon.attack,
+            attack_range=pokemon.attack_range,
+            attack_cooldown=pokemon.attack_cooldown,
+            current_health=pokemon.current_health,
+            max_health=pokemon.max_health,
+            base_damage_timer=pokemon.base_damage_timer,
+            reached_enemy_base=pokemon.reached_enemy_base,
+            is_moving=pokemon.is_moving,
+            target=NO_TARGET if pokemon.target is None else pokemon.target,
+            element=pokemon.element_index,
+        )
+
+    def _add_enemy(self, enemy: Enemy):
+        self._enemies.append(
+            enemy,
+            id=enemy.id,
+            x=enemy.x,
+            y=enemy.y,
+            speed=enemy.speed,
+            current_health=enemy.current_health,
+            element=enemy.element_index,
+        )
+
+    def memory_usage(self) -> Dict[str, int]:
+        # Объекты сущностей плюс их числовые колонки
+        usage = super().memory_usage()
+        usage["field"] += self._field.nbytes
+        usage["enemies"] += self._enemies.nbytes
+        return usage
+
+    def play_card(self, card_id: int, x: int) -> Dict:
+        """Размещение покемона на базе игрока (фиксированная высота)"""
+        if not is_position(x):
+            return {"error": "Invalid position"}
+        self.log_action("play_card", card_id=card_id, x=x)
+        card_index = next((i for i, card in enumerate(self.hand) if card.id == card_id), None)
+
+        if card_index is None:
+            return {"error": "Card not found in hand"}
+
+        base_y = self.player_base_y - 50
+
+        if x < 50 or x > 750:
+            return {"error": "Position out of bounds"}
+
+        occupied = (np.abs(self._field["x"] - x) < 80) & (np.abs(self._field["y"] - base_y) < 50)
+        if occupied.any():
+            return {"error": "Position already occupied by another Pokemon"}
+
+        card = self.hand.pop(card_index)
+        self._add_field_pokemon(FieldPokemon(card, x=x, y=base_y, attack_range=120))
+        self.state_version += 1
+
+        return {"success": True, "field": [pokemon.to_dict() for pokemon in self.field]}
+
+    def update(self, delta_time: float = 0.1) -> Dict:
+        """Обновление игрового состояния пакетными операциями. delta_time в секундах."""
+        if self.game_over:
+            return self.get_state()
+
+        self.state_version += 1
+        self.log_tick(delta_time)
+
+        # Спавн врагов СВЕРХУ
+        self.enemy_spawn_timer += delta_time
+        if self.enemy_spawn_timer >= self.enemy_spawn_interval and self.wave_data:
+            enemy = self.wave_data.pop(0)
+            enemy.x = self.rng.randint(50, 750)
+            enemy.y = 100
+            enemy.current_health = enemy.health
+            self._add_enemy(enemy)
+            self.enemy_spawn_timer = 0
+
+            if not self.wave_data:
+                self.wave += 1
+                self.wave_data = self.generate_wave(self.wave)
+
+        self._move_enemies(delta_time)
+        self._update_field(delta_time)
+
+        # Проверка победы (после 5 волн)
+        if self.wave > 5:
+            self.game_over = True
+            self.victory = True
+
+        return self.get_state()
+
+    def _move_enemies(self, delta_time: float):
+        enemies = self._enemies
+        if not len(enemies):
+            return
+
+        step = enemies["speed"] * delta_time
+        dy = self.player_base_y - enemies["y"]
+        arrived = np.abs(dy) < step
+
+        enemies["y"] = np.where(arrived, enemies["y"], enemies["y"] + np.where(dy > 0, step, -step))
+
+        arrived_count = int(arrived.sum())
+        if arrived_count:
+            # Каждый дошедший враг наносит урон базе
+            self.player_health -= 20 * arrived_count
+            if self.player_health <= 0:
+                self.game_over = True
+            enemies.keep(~arrived)
+
+    def _update_field(self, delta_time: float):
+        field = self._field
+        if not len(field):
+            return
+
+        enemies = self._enemies
+        field["attack_cooldown"] = np.maximum(0, field["attack_cooldown"] - delta_time)
+
+        # Покемоны на вражеской базе получают урон раз в секунду
+        on_base = field["reached_enemy_base"]
+        field["base_damage_timer"] = np.where(on_base, field["base_damage_timer"] + delta_time,
+                                              field["base_damage_timer"])
+        base_hit = on_base & (field["base_damage_timer"] >= 1.0)
+        field["current_health"] = np.where(base_hit, field["current_health"] - self.wave, field["current_health"])
+        field["base_damage_timer"] = np.where(base_hit, 0.0, field["base_damage_timer"])
+        dead = base_hit & (field["current_health"] <= 0)
+
+        # Ближайший враг в радиусе атаки и удары готовых покемонов
+        active = ~on_base
+        nearest, has_target, attacked, alive = self._resolve_attacks(active)
+
+        moving = active & ~has_target
+        field["is_moving"] = np.where(active, moving, field["is_moving"])
+        if len(enemies):
+            targets = np.where(has_target, enemies["id"][nearest], NO_TARGET)
+        else:
+            targets = np.full(len(field), NO_TARGET)
+        field["target"] = np.where(active, targets, field["target"])
+        field["attack_cooldown"] = np.where(attacked, 0.8, field["attack_cooldown"])
+
+        killed_count = len(enemies) - int(alive.sum())
+        if killed_count:
+            enemies.keep(alive)
+            for _ in range(killed_count):
+                self._reward_kill()
+
+        # Покемоны без цели идут вверх к вражеской базе
+        walking = moving & (np.abs(self.enemy_base_y - field["y"]) > 10)
+        field["y"] = np.where(walking, field["y"] - field["speed"] * delta_time * 30, field["y"])
+        arrived = walking & (field["y"] <= self.enemy_base_y)
+        if arrived.any():
+            field["y"] = np.where(arrived, float(self.enemy_base_y), field["y"])
+            field["reached_enemy_base"] = field["reached_enemy_base"] | arrived
+            field["is_moving"] = field["is_moving"] & ~arrived
+            field["base_damage_timer"] = np.where(arrived, 0.0, field["base_damage_timer"])
+            # Награда за достижение вражеской базы
+            arrived_count = int(arrived.sum())
+            self.score += 50 * arrived_count
+            self.poke_coins += 5 * arrived_count
+
+        # Удаляем погибших покемонов
+        if dead.any():
+            field.keep(~dead)
+
+    def _resolve_attacks(self, active: np.ndarray):
+        """
+        Цели и удары активных покемонов в порядке поля. Пока никто никого не добил,
+        все цели считаются разом по матрице расстояний P x E; урон по каждому врагу
+        накапливается в порядке атакующих. На первом смертельном ударе враг выбывает,
+        и покемоны после добившего выбирают цели заново из оставшихся - поэтому
+        проходов столько, сколько убитых за тик, плюс один.
+        Возвращает (индекс цели, есть цель, атаковал, враг жив).
+        """
+        field, enemies = self._field, self._enemies
+        count = len(field)
+        nearest = np.zeros(count, dtype=np.int64)
+        has_target = np.zeros(count, dtype=np.bool_)
+        attacked = np.zeros(count, dtype=np.bool_)
+        alive = np.ones(len(enemies), dtype=np.bool_)
+        if not len(enemies):
+            return nearest, has_target, attacked, alive
+
+        # Квадраты расстояний - то же сравнение, что и в EnemyGrid.nearest
+        dx = field["x"][:, None] - enemies["x"][None, :]
+        dy = field["y"][:, None] - enemies["y"][None, :]
+        distances = dx * dx + dy * dy
+        in_range = (distances < (field["attack_range"] * field["attack_range"])[:, None]) & active[:, None]
+        distances = np.where(in_range, distances, np.inf)
+        ready = field["attack_cooldown"] <= 0
+        health = enemies["current_health"]
+
+        start = 0
+        while start < count:
+            rows = np.where(alive[None, :], distances[start:], np.inf)
+            candidates = rows.argmin(axis=1)
+            found = np.isfinite(rows[np.arange(len(rows)), candidates])
+            nearest[start:] = candidates
+            has_target[start:] = found
+
+            hitters = np.flatnonzero(found & ready[start:]) + start
+            if not len(hitters):
+                break
+            victims = nearest[hitters]
+            damage = field["attack"][hitters] * TYPE_MULTIPLIERS[field["element"][hitters],
+                                                                 enemies["element"][victims]]
+            # Накопленный урон по цели каждого удара (удары по порядку атакующих)
+            per_enemy = np.zeros((len(hitters), len(enemies)))
+            per_enemy[np.arange(len(hitters)), victims] = damage
+            dealt = np.cumsum(per_enemy, axis=0)[np.arange(len(hitters)), victims]
+            lethal = np.flatnonzero(health[victims] - dealt <= 0)
+
+            # Удары до первого смертельного включительно - окончательные
+            last = lethal[0] + 1 if len(lethal) else len(hitters)
+            np.subtract.at(health, victims[:last], damage[:last])
+            attacked[hitters[:last]] = True
+            if not len(lethal):
+                break
+            alive[victims[lethal[0]]] = False
+            start = hitters[lethal[0]] + 1
+
+        return nearest, has_target, attacked, alive
+
+    def _reward_kill(self):
+        self.score += 15
+        self.player_exp += 2
+        self.poke_coins += 1
+
+        if self.player_exp >= self.player_max_exp:
+            self.player_level += 1
+            self.pokeballs += 2
+            self.player_exp = 0
+            self.player_max_exp = int(self.player_max_exp * 1.2)
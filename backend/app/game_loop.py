@@ -0,0 +1,160 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .game_logic import game_metrics
+
+
+class GameTickLoop:
+    """
+    Фоновый планировщик, который шагает все активные игры с фиксированным шагом.
+    Обработчики запросов только читают последний снимок или ставят действие в очередь.
+    """
+
+    def __init__(self, games: Dict[int, Any], tick_rate: float = 10.0, max_catchup_ticks: int = 5):
+        self.games = games
+        self.tick_rate = tick_rate
+        self.tick_interval = 1.0 / tick_rate
+        self.max_catchup_ticks = max(1, max_catchup_ticks)
+        self.tick = 0
+
+        # Очередь действий: user_id -> [(действие, future)]
+        self.pending: Dict[int, List[Tuple[Callable[[], Dict], asyncio.Future]]] = {}
+        # Последние снимки состояния после тика
+        self.snapshots: Dict[int, Dict] = {}
+        # Подписчики, ждущие следующего тика (WebSocket-соединения)
+        self._tick_waiters: List[asyncio.Future] = []
+
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запуск цикла в текущем event loop"""
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Остановка цикла (при выключении приложения)"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        next_tick = time.perf_counter()
+        while True:
+            now = time.perf_counter()
+            if now < next_tick:
+                await asyncio.sleep(next_tick - now)
+                continue
+
+            # Сколько тиков мы должны были выполнить к этому моменту
+            behind = int((now - next_tick) / self.tick_interval) + 1
+            steps = min(behind, self.max_catchup_ticks)
+
+            for _ in range(steps):
+                self.step()
+
+            if behind > steps:
+                # Слишком сильно отстали - не догоняем, а отбрасываем хвост
+                next_tick = time.perf_counter() + self.tick_interval
+            else:
+                next_tick += steps * self.tick_interval
+
+            # Даем event loop обслужить запросы между тиками
+            await asyncio.sleep(0)
+
+    def step(self):
+        """Один фиксированный тик для всех игр"""
+        started = time.perf_counter()
+        dt = self.tick_interval
+        snapshots = {}
+        # Игры общего мира (GAME_ENGINE=world) шагаются одним пакетным проходом
+        worlds: Dict[int, Tuple[Any, List[Tuple[int, Any]]]] = {}
+
+        for user_id, game in list(self.games.items()):
+            self._apply_pending(user_id)
+            world = getattr(game, "world", None)
+            if world is not None:
+                worlds.setdefault(id(world), (world, []))[1].append((user_id, game))
+                continue
+            game_started = time.perf_counter()
+            try:
+                snapshots[user_id] = game.update(dt)
+            except Exception as e:
+                print(f"⚠️ Tick error in game {user_id}: {e}")
+            game_metrics.observe_game_tick(time.perf_counter() - game_started)
+
+        for world, world_games in worlds.values():
+            world_started = time.perf_counter()
+            try:
+                world.step(dt, slots=[game.slot for _, game in world_games])
+            except Exception as e:
+                print(f"⚠️ Tick error in game world: {e}")
+            # Пакетный шаг делится поровну между играми мира
+            game_metrics.observe_game_tick((time.perf_counter() - world_started) / len(world_games),
+                                           len(world_games))
+            for user_id, game in world_games:
+                snapshots[user_id] = game.get_state()
+
+        # Игры уже нет в процессе (завершена или передана другому воркеру): ее копия
+        # больше не сохраняется, поэтому действие не применяем, а отклоняем
+        for user_id in list(self.pending):
+            self._reject_pending(user_id)
+
+        self.snapshots = snapshots
+        self.tick += 1
+        game_metrics.observe_loop_tick(time.perf_counter() - started)
+
+        waiters, self._tick_waiters = self._tick_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(self.tick)
+
+    def _apply_pending(self, user_id: int):
+        for action, future in self.pending.pop(user_id, []):
+            if future.done():
+                continue
+            try:
+                future.set_result(action())
+            except Exception as e:
+                future.set_exception(e)
+
+    def _reject_pending(self, user_id: int):
+        for _, future in self.pending.pop(user_id, []):
+            if not future.done():
+                future.set_result({"error": "Game not found"})
+
+    async def submit(self, user_id: int, action: Callable[[], Dict]) -> Dict:
+        """Ставит действие в очередь и ждет его применения на ближайшем тике"""
+        if not self.running:
+            # Цикл не запущен (например, в скриптах) - применяем сразу
+            return action()
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(user_id, []).append((action, future))
+        return await future
+
+    async def wait_for_tick(self) -> int:
+        """Ждет окончания следующего тика и возвращает его номер"""
+        if not self.running:
+            await asyncio.sleep(self.tick_interval)
+            return self.tick
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._tick_waiters.append(waiter)
+        return await waiter
+
+    def get_snapshot(self, user_id: int) -> Dict:
+        """Последний снимок состояния игры без запуска симуляции"""
+        snapshot = self.snapshots.get(user_id)
+        if snapshot is None:
+            # Игра создана после последнего тика
+            snapshot = self.games[user_id].get_state()
+        return snapshot
@@ -0,0 +1,203 @@
+"""
+Доступ обработчиков запросов к играм.
+
+LocalGameService симулирует игры в текущем процессе (хранилище active_games + GameTickLoop).
+ShardedGameService (GAME_HOSTS > 0) пересылает вызовы в процессы-хосты игр (см. game_hosts):
+каждый игрок закреплен за одним хостом, а HTTP-воркеры не шагают игры сами.
+"""
+from functools import partial
+from typing import Callable, Dict, List, Optional
+from fastapi import HTTPException
+from . import game_logic, schemas
+from .config import settings
+from .game_loop import GameTickLoop
+from .redis_client import redis_client
+from .replay import verified_result
+from .session_store import GameBusyError, GameSessionStore
+
+
+def game_result_of(game) -> Dict:
+    """Результат игры для начисления (при GAME_VERIFY_RESULTS - проверенный пересимуляцией)"""
+    if settings.GAME_VERIFY_RESULTS:
+        return verified_result(game)
+    return game.get_game_result()
+
+
+def build_action(game, action: schemas.GameAction) -> Callable[[], Dict]:
+    """Превращает запрос действия в вызов игровой логики"""
+    if action.action_type == "open_pokeball":
+        return game.open_pokeball
+    if action.action_type == "play_card":
+        if not action.data:
+            raise HTTPException(status_code=400, detail="Missing card data")
+        # ⭐ ИЗМЕНЕНИЕ: передаем только X координату
+        return partial(
+            game.play_card,
+            card_id=action.data.get("card_id"),
+            x=action.data.get("x")
+        )
+    raise HTTPException(status_code=400, detail="Unknown action type")
+
+
+def is_stale(game, client_tick: Optional[int]) -> bool:
+    """
+    Клиент видел версию слишком давно или версию не этой игры (версии новой игры
+    начинаются со времени ее создания). Без client_tick действие не проверяется.
+    """
+    if client_tick is None:
+        return False
+    return not game.state_version - settings.GAME_ACTION_MAX_LAG <= client_tick <= game.state_version
+
+
+class LocalGameService:
+    """Игры в памяти этого процесса"""
+
+    def __init__(self, games: GameSessionStore, tick_loop: GameTickLoop):
+        self.games = games
+        self.tick_loop = tick_loop
+
+    async def start(self):
+        # Общее хранилище игр и периодическая запись игр этого процесса
+        await self.games.client.connect()
+        self.games.start()
+        # Серверный цикл симуляции для всех активных игр
+        self.tick_loop.start()
+
+    async def stop(self):
+        await self.tick_loop.stop()
+        # Сохраняем игры процесса, чтобы их подхватили другие воркеры
+        await self.games.stop()
+        await self.games.client.disconnect()
+
+    async def _load(self, user_id: int):
+        try:
+            return await self.games.load(user_id)
+        except GameBusyError:
+            raise HTTPException(status_code=409, detail="Game is busy in another worker, retry")
+
+    async def _game(self, user_id: int):
+        game = await self._load(user_id)
+        if game is None:
+            raise HTTPException(status_code=404, detail="Game not found")
+        return game
+
+    async def start_game(self, user_id: int) -> Optional[Dict]:
+        """Начинает новую игру; возвращает результат прерванной старой игры (если была)"""
+        previous_result = None
+        previous = await self._load(user_id)
+        if previous is not None:
+            try:
+                previous_result = game_result_of(previous)
+            except Exception as e:
+                print(f"⚠️ Error ending previous game: {e}")
+            await self.games.remove(user_id)
+
+        game = game_logic.create_game(user_id, engine=settings.GAME_ENGINE)
+        # Сразу обновляем состояние, чтобы появились враги
+        game.update(0)
+        # Дальше игру шагает серверный цикл
+        try:
+            await self.games.put(user_id, game)
+        except GameBusyError:
+            raise HTTPException(status_code=409, detail="Game is busy in another worker, retry")
+        return previous_result
+
+    async def end_game(self, user_id: int) -> Dict:
+        """Завершает игру и возвращает ее результат"""
+        game = await self._game(user_id)
+        try:
+            return game_result_of(game)
+        finally:
+            # ⭐ ВАЖНО: даже при ошибке удаляем игру из памяти
+            await self.games.remove(user_id)
+
+    async def act(self, user_id: int, action: schemas.GameAction) -> Dict:
+        game = await self._game(user_id)
+        # ⭐ ВАЖНО: проверяем, не закончилась ли игра
+        if game.game_over:
+            return {"error": "Game is already over"}
+        # Действие применяется на ближайшем тике серверного цикла
+        return await self.tick_loop.submit(user_id, build_action(game, action))
+
+    async def act_batch(self, user_id: int, batch: schemas.GameActionBatch) -> Dict:
+        """
+        Пачка действий по порядку на одном тике серверного цикла.
+        Возвращает результат каждого действия и одно состояние после всей пачки
+        (дельту от batch.since, если она задана). Действие по устаревшей версии
+        клиента (client_tick) не применяется - см. is_stale.
+        """
+        game = await self._game(user_id)
+        # Неизвестное действие отклоняет всю пачку до применения
+        calls = [build_action(game, action) for action in batch.actions]
+
+        def apply() -> Dict:
+            results: List[Dict] = []
+            for action, call in zip(batch.actions, calls):
+                if game.game_over:
+                    results.append({"error": "Game is already over"})
+                elif is_stale(game, action.client_tick):
+                    results.append({"error": "Stale action"})
+                else:
+                    results.append(call())
+            state = game.get_state_delta(batch.since) if batch.since is not None else game.get_state()
+            return {"results": results, "state": state}
+
+        return await self.tick_loop.submit(user_id, apply)
+
+    async def get_state(self, user_id: int) -> Dict:
+        """Последний снимок состояния (симуляцию двигает серверный цикл)"""
+        await self._game(user_id)
+        return self.tick_loop.get_snapshot(user_id)
+
+    async def get_state_bytes(self, user_id: int, media_type: str) -> bytes:
+        """Последний снимок, закодированный в media_type (кэшируется в игре до следующей версии)"""
+        game = await self._game(user_id)
+        return game.encoded_state(media_type, self.tick_loop.snapshots.get(user_id))
+
+    async def get_state_delta(self, user_id: int, since: Optional[int]) -> Dict:
+        game = await self._game(user_id)
+        return game.get_state_delta(since)
+
+    async def wait_for_tick(self):
+        await self.tick_loop.wait_for_tick()
+
+    async def metrics(self, top: int = 10) -> Dict:
+        """Память и стоимость тика игр этого процесса"""
+        report = game_logic.game_metrics.report(self.games, top=top)
+        report["store"] = {
+            "resident_snapshot_bytes": self.games.resident_bytes,
+            "peak_resident_snapshot_bytes": self.games.peak_resident_bytes,
+            "evictions": self.games.evictions,
+            "rehydrations": self.games.rehydrations,
+            "handovers": self.games.handovers,
+        }
+        return report
+
+
+def create_local_service() -> LocalGameService:
+    # ⭐ ВАЖНО: активные игры - в памяти процесса и в общем хранилище (Redis),
+    # поэтому игрок может попасть в любой воркер
+    games = GameSessionStore(
+        redis_client,
+        max_local_games=settings.GAME_LOCAL_CACHE_SIZE,
+        max_resident_bytes=settings.GAME_MAX_RESIDENT_BYTES,
+        idle_ttl=settings.GAME_IDLE_TTL,
+        write_back_interval=settings.GAME_WRITE_BACK_INTERVAL,
+        owner_ttl=settings.GAME_OWNER_TTL,
+        handover_timeout=settings.GAME_HANDOVER_TIMEOUT
+    )
+    # Серверный цикл симуляции: двигает все игры с фиксированной частотой
+    tick_loop = GameTickLoop(
+        games,
+        tick_rate=settings.GAME_TICK_RATE,
+        max_catchup_ticks=settings.GAME_MAX_CATCHUP_TICKS
+    )
+    return LocalGameService(games, tick_loop)
+
+
+def create_game_service():
+    """Сервис игр для HTTP-воркера"""
+    if settings.GAME_HOSTS > 0:
+        from .game_hosts import ShardedGameService
+        return ShardedGameService.from_settings()
+    return create_local_service()
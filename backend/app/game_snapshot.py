@@ -0,0 +1,218 @@
+"""
+Компактный бинарный снимок всей игры (для переноса между воркерами и перезапусков).
+В отличие от state_codec здесь сохраняется все, что нужно для продолжения игры:
+ГСЧ, журналы для пересимуляции, колода и очередь волны.
+
+Формат (little-endian):
+    заголовок   "PGS" + версия схемы (u8) + движок (u8, индекс в ENGINES)
+    игра        см. _GAME
+    строки      таблица строк как в state_codec (имена и стихии)
+    deck, hand  u16 количество, затем записи CARD
+    field       u16 количество, затем записи CARD + FIELD
+    enemies     u16 количество, затем записи CARD + ENEMY
+    wave_data   u16 количество, затем записи CARD + ENEMY
+    tick_log    u32 количество, затем записи TICK
+    action_log  u32 количество, затем записи ACTION
+"""
+import math
+import struct
+from datetime import datetime
+from typing import Dict, List
+from .catalog import element_id
+from .game_logic import Card, Enemy, FieldPokemon, PokemonGameLogic, create_game
+from .spatial_index import EnemyGrid
+from .state_codec import StringTable, unpack_strings
+from .state_delta import StateTracker
+
+MAGIC = b"PGS"
+SCHEMA_VERSION = 1
+
+ENGINES = ("python", "numpy", "world", "shared")
+ACTIONS = ("open_pokeball", "play_card")
+
+_MASK64 = (1 << 64) - 1
+# Нет значения (card_id вне int64)
+_NO_CARD = -(1 << 63)
+
+_HEADER = struct.Struct("<3sBB")
+_COUNT = struct.Struct("<H")
+_LOG_COUNT = struct.Struct("<I")
+# user_id, seed, start_time, состояние ГСЧ, 8 x i32 (см. _INT_SCALARS), флаги,
+# state_version, next_uid, tick, enemy_spawn_timer, enemy_spawn_interval, player_base_y, enemy_base_y
+_GAME = struct.Struct("<qQdQ8iBqIIddii")
+# uid, id, имя, стихия, health, attack, speed
+_CARD = struct.Struct("<IiHHiid")
+# x, y, current_health, max_health, attack_cooldown, флаги, target, attack_range, base_damage_timer
+_FIELD = struct.Struct("<dddidBidd")
+# x, y, current_health
+_ENEMY = struct.Struct("<ddd")
+# delta_time, количество тиков подряд
+_TICK = struct.Struct("<dI")
+# тик, тип действия, card_id, x (NaN - нет значения)
+_ACTION = struct.Struct("<IBqd")
+
+_INT_SCALARS = ("player_health", "player_level", "player_exp", "player_max_exp",
+                "pokeballs", "score", "poke_coins", "wave")
+
+_FLAG_GAME_OVER = 1
+_FLAG_VICTORY = 2
+_FLAG_MOVING = 1
+_FLAG_REACHED_BASE = 2
+_FLAG_HAS_TARGET = 4
+
+
+def _card_id(value) -> int:
+    # Игровая логика сравнивает card_id с целыми id карт, поэтому любое
+    # нецелое значение ведет себя как отсутствующая карта
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and float(value).is_integer() \
+            and abs(value) < 2 ** 63:
+        return int(value)
+    return _NO_CARD
+
+
+def _coordinate(value) -> float:
+    # play_card не пишет в журнал нечисловые x (см. is_position), None - действие без x
+    return math.nan if value is None else float(value)
+
+
+def encode_game(game: PokemonGameLogic) -> bytes:
+    intern = StringTable()
+
+    def card(entity) -> bytes:
+        return _CARD.pack(entity.uid, entity.id, intern(entity.name), intern(entity.element),
+                          entity.health, entity.attack, entity.speed)
+
+    def enemy(entity: Enemy) -> bytes:
+        return card(entity) + _ENEMY.pack(entity.x, entity.y, entity.current_health)
+
+    def pokemon(entity: FieldPokemon) -> bytes:
+        flags = ((_FLAG_MOVING if entity.is_moving else 0)
+                 | (_FLAG_REACHED_BASE if entity.reached_enemy_base else 0)
+                 | (_FLAG_HAS_TARGET if entity.target is not None else 0))
+        return card(entity) + _FIELD.pack(
+            entity.x, entity.y, entity.current_health, entity.max_health, entity.attack_cooldown,
+            flags, entity.target or 0, entity.attack_range, entity.base_damage_timer)
+
+    lists = [
+        [card(entity) for entity in game.deck],
+        [card(entity) for entity in game.hand],
+        [pokemon(entity) for entity in game.field],
+        [enemy(entity) for entity in game.enemies],
+        [enemy(entity) for entity in game.wave_data],
+    ]
+
+    flags = (_FLAG_GAME_OVER if game.game_over else 0) | (_FLAG_VICTORY if game.victory else 0)
+    parts = [
+        _HEADER.pack(MAGIC, SCHEMA_VERSION, ENGINES.index(game.engine)),
+        _GAME.pack(game.user_id, game.seed & _MASK64, game.start_time.timestamp(), game.rng.getstate(),
+                   *(getattr(game, name) for name in _INT_SCALARS), flags,
+                   game.state_version, game.next_uid, game.tick, game.enemy_spawn_timer,
+                   game.enemy_spawn_interval, game.player_base_y, game.enemy_base_y),
+        intern.pack(),
+    ]
+    for records in lists:
+        parts.append(_COUNT.pack(len(records)))
+        parts.extend(records)
+
+    parts.append(_LOG_COUNT.pack(len(game.tick_log)))
+    parts.extend(_TICK.pack(delta_time, count) for delta_time, count in game.tick_log)
+    parts.append(_LOG_COUNT.pack(len(game.action_log)))
+    parts.extend(_ACTION.pack(tick, ACTIONS.index(action_type), _card_id(data.get("card_id")),
+                              _coordinate(data.get("x")))
+                 for tick, action_type, data in game.action_log)
+    return b"".join(parts)
+
+
+def decode_game(data: bytes) -> PokemonGameLogic:
+    magic, schema_version, engine = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or schema_version != SCHEMA_VERSION:
+        raise ValueError("Unsupported game snapshot")
+    offset = _HEADER.size
+
+    values = _GAME.unpack_from(data, offset)
+    offset += _GAME.size
+    user_id, seed, start_time, rng_state = values[:4]
+    ints = values[4:12]
+    (flags, state_version, next_uid, tick, spawn_timer, spawn_interval,
+     player_base_y, enemy_base_y) = values[12:]
+
+    strings, offset = unpack_strings(data, offset)
+    element_ids = [element_id(string) for string in strings]
+
+    def entities(cls, extra) -> List:
+        nonlocal offset
+        (count,) = _COUNT.unpack_from(data, offset)
+        offset += _COUNT.size
+        result = []
+        for _ in range(count):
+            entity = cls.__new__(cls)
+            (entity.uid, entity.id, name, element, entity.health, entity.attack,
+             entity.speed) = _CARD.unpack_from(data, offset)
+            entity.name, entity.element = strings[name], strings[element]
+            entity.element_index = element_ids[element]
+            offset += _CARD.size
+            if extra is _FIELD:
+                (entity.x, entity.y, entity.current_health, entity.max_health, entity.attack_cooldown,
+                 entity_flags, target, entity.attack_range,
+                 entity.base_damage_timer) = _FIELD.unpack_from(data, offset)
+                entity.is_moving = bool(entity_flags & _FLAG_MOVING)
+                entity.reached_enemy_base = bool(entity_flags & _FLAG_REACHED_BASE)
+                entity.target = target if entity_flags & _FLAG_HAS_TARGET else None
+            elif extra is _ENEMY:
+                entity.x, entity.y, entity.current_health = _ENEMY.unpack_from(data, offset)
+            if extra is not None:
+                offset += extra.size
+            result.append(entity)
+        return result
+
+    deck = entities(Card, None)
+    hand = entities(Card, None)
+    field = entities(FieldPokemon, _FIELD)
+    enemies = entities(Enemy, _ENEMY)
+    wave_data = entities(Enemy, _ENEMY)
+
+    (count,) = _LOG_COUNT.unpack_from(data, offset)
+    offset += _LOG_COUNT.size
+    tick_log = [list(entry) for entry in _TICK.iter_unpack(data[offset:offset + count * _TICK.size])]
+    offset += count * _TICK.size
+
+    (count,) = _LOG_COUNT.unpack_from(data, offset)
+    offset += _LOG_COUNT.size
+    action_log = []
+    for action_tick, action_type, card_id, x in _ACTION.iter_unpack(data[offset:offset + count * _ACTION.size]):
+        action_data: Dict = {}
+        if ACTIONS[action_type] == "play_card":
+            action_data = {"card_id": None if card_id == _NO_CARD else card_id,
+                           "x": None if math.isnan(x) else x}
+        action_log.append((action_tick, ACTIONS[action_type], action_data))
+
+    # Игра создается движком из снимка, затем ее состояние заменяется сохраненным
+    game = create_game(user_id, engine=ENGINES[engine], seed=seed)
+    game.start_time = datetime.fromtimestamp(start_time)
+    for name, value in zip(_INT_SCALARS, ints):
+        setattr(game, name, value)
+    game.game_over = bool(flags & _FLAG_GAME_OVER)
+    game.victory = bool(flags & _FLAG_VICTORY)
+    game.state_version = state_version
+    game.next_uid = next_uid
+    game.tick = tick
+    game.enemy_spawn_timer = spawn_timer
+    game.enemy_spawn_interval = spawn_interval
+    game.player_base_y = player_base_y
+    game.enemy_base_y = enemy_base_y
+    game.rng.setstate(rng_state)
+    game.tick_log = tick_log
+    game.action_log = action_log
+
+    game.deck = deck
+    game.hand = hand
+    game.field = field
+    game.enemies = enemies
+    game.wave_data = wave_data
+    game.enemy_grid = EnemyGrid()
+    for enemy in enemies:
+        game.enemy_grid.insert(enemy)
+
+    game.state_tracker = StateTracker(state_version)
+    game.snapshot_version = state_version
+    return game
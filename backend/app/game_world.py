@@ -0,0 +1,524 @@
+"""
+Мировой движок: сущности тысяч игр в общих колоночных буферах.
+Каждая игра занимает строку (слот) в массивах формы (игры x емкость),
+и один векторизованный проход за тик двигает все игры сразу.
+"""
+import weakref
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .game_logic import PokemonGameLogic, FieldPokemon, Enemy, is_position
+from .game_logic_numpy import TYPE_MULTIPLIERS, NO_TARGET
+
+PLAYER_BASE_Y = 450
+ENEMY_BASE_Y = 100
+ENEMY_SPAWN_INTERVAL = 1.5
+
+GAME_COLUMNS = {
+    "player_health": np.int64, "player_level": np.int64, "player_exp": np.int64,
+    "player_max_exp": np.int64, "pokeballs": np.int64, "score": np.int64,
+    "poke_coins": np.int64, "wave": np.int64, "enemy_spawn_timer": np.float64,
+    "game_over": np.bool_, "victory": np.bool_, "state_version": np.int64,
+}
+
+FIELD_COLUMNS = {
+    "alive": np.bool_, "seq": np.int64,
+    "x": np.float64, "y": np.float64, "speed": np.float64, "attack": np.int64,
+    "attack_range": np.float64, "attack_cooldown": np.float64,
+    "current_health": np.int64, "max_health": np.int64,
+    "base_damage_timer": np.float64, "reached_enemy_base": np.bool_,
+    "is_moving": np.bool_, "target": np.int64, "element": np.int64,
+}
+
+# Здоровье врага дробное: урон - attack * множитель стихии (как в PokemonGameLogic)
+ENEMY_COLUMNS = {
+    "alive": np.bool_, "seq": np.int64,
+    "id": np.int64, "x": np.float64, "y": np.float64, "speed": np.float64,
+    "current_health": np.float64, "element": np.int64,
+}
+
+# Колонки, которые не переносятся обратно в объекты сущностей
+_INTERNAL_COLUMNS = ("alive", "seq", "element")
+
+
+def _grow(arrays: Dict[str, np.ndarray], rows: int, cols: Optional[int] = None):
+    """Увеличивает буферы до rows строк (и cols столбцов), сохраняя данные"""
+    for name, array in arrays.items():
+        shape = (rows,) if array.ndim == 1 else (rows, cols)
+        grown = np.zeros(shape, dtype=array.dtype)
+        grown[tuple(slice(0, n) for n in array.shape)] = array
+        arrays[name] = grown
+
+
+class GameWorld:
+    """Общие колоночные буферы всех игр и пакетный шаг симуляции"""
+
+    def __init__(self, games_capacity: int = 64, field_capacity: int = 8, enemy_capacity: int = 8):
+        self.games_capacity = games_capacity
+        self.field_capacity = field_capacity
+        self.enemy_capacity = enemy_capacity
+
+        self.games = {name: np.zeros(games_capacity, dtype=dtype) for name, dtype in GAME_COLUMNS.items()}
+        self.field = {name: np.zeros((games_capacity, field_capacity), dtype=dtype)
+                      for name, dtype in FIELD_COLUMNS.items()}
+        self.enemies = {name: np.zeros((games_capacity, enemy_capacity), dtype=dtype)
+                        for name, dtype in ENEMY_COLUMNS.items()}
+
+        # Объекты сущностей (статические данные) по слотам: [игра][индекс]
+        self.field_objects: List[List[Optional[FieldPokemon]]] = [[None] * field_capacity
+                                                                  for _ in range(games_capacity)]
+        self.enemy_objects: List[List[Optional[Enemy]]] = [[None] * enemy_capacity
+                                                           for _ in range(games_capacity)]
+
+        self.views: List[Optional[weakref.ref]] = [None] * games_capacity
+        self.free_slots = list(range(games_capacity - 1, -1, -1))
+        self._seq = 0
+
+    def __len__(self):
+        return self.games_capacity - len(self.free_slots)
+
+    # --- Слоты игр ---
+
+    def create_game(self, user_id: int, seed: Optional[int] = None) -> "WorldGameView":
+        return WorldGameView(self, user_id, seed=seed)
+
+    def _allocate(self, view: "WorldGameView") -> int:
+        if not self.free_slots:
+            self._grow_games()
+        slot = self.free_slots.pop()
+        self.views[slot] = weakref.ref(view)
+        # Слот освобождается, когда представление игры собрано сборщиком мусора
+        weakref.finalize(view, self._release, slot)
+        return slot
+
+    def _release(self, slot: int):
+        self.clear_field(slot)
+        self.clear_enemies(slot)
+        self.games["game_over"][slot] = True
+        self.views[slot] = None
+        self.free_slots.append(slot)
+
+    def _grow_games(self):
+        old = self.games_capacity
+        self.games_capacity = old * 2
+        _grow(self.games, self.games_capacity)
+        _grow(self.field, self.games_capacity, self.field_capacity)
+        _grow(self.enemies, self.games_capacity, self.enemy_capacity)
+        self.field_objects += [[None] * self.field_capacity for _ in range(old)]
+        self.enemy_objects += [[None] * self.enemy_capacity for _ in range(old)]
+        self.views += [None] * old
+        self.free_slots = list(range(self.games_capacity - 1, old - 1, -1)) + self.free_slots
+
+    # --- Сущности ---
+
+    def _next_seq(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    def _free_index(self, columns: Dict[str, np.ndarray], slot: int) -> Optional[int]:
+        free = np.flatnonzero(~columns["alive"][slot])
+        return int(free[0]) if len(free) else None
+
+    def add_field_pokemon(self, slot: int, pokemon: FieldPokemon):
+        index = self._free_index(self.field, slot)
+        if index is None:
+            index = self.field_capacity
+            self.field_capacity *= 2
+            _grow(self.field, self.games_capacity, self.field_capacity)
+            for objects in self.field_objects:
+                objects.extend([None] * (self.field_capacity - len(objects)))
+
+        row = self.field
+        row["alive"][slot, index] = True
+        row["seq"][slot, index] = self._next_seq()
+        for name in FIELD_COLUMNS:
+            if name not in _INTERNAL_COLUMNS:
+                value = getattr(pokemon, name)
+                row[name][slot, index] = NO_TARGET if name == "target" and value is None else value
+        row["element"][slot, index] = pokemon.element_index
+        self.field_objects[slot][index] = pokemon
+
+    def add_enemy(self, slot: int, enemy: Enemy):
+        index = self._free_index(self.enemies, slot)
+        if index is None:
+            index = self.enemy_capacity
+            self.enemy_capacity *= 2
+            _grow(self.enemies, self.games_capacity, self.enemy_capacity)
+            for objects in self.enemy_objects:
+                objects.extend([None] * (self.enemy_capacity - len(objects)))
+
+        row = self.enemies
+        row["alive"][slot, index] = True
+        row["seq"][slot, index] = self._next_seq()
+        for name in ENEMY_COLUMNS:
+            if name not in _INTERNAL_COLUMNS:
+                row[name][slot, index] = getattr(enemy, name)
+        row["element"][slot, index] = enemy.element_index
+        self.enemy_objects[slot][index] = enemy
+
+    def clear_field(self, slot: int):
+        self.field["alive"][slot] = False
+        self.field_objects[slot] = [None] * self.field_capacity
+
+    def clear_enemies(self, slot: int):
+        self.enemies["alive"][slot] = False
+        self.enemy_objects[slot] = [None] * self.enemy_capacity
+
+    def _synced(self, columns: Dict[str, np.ndarray], objects: List, slot: int) -> List:
+        """Объекты живых сущностей игры в порядке появления с актуальными значениями"""
+        indices = np.flatnonzero(columns["alive"][slot])
+        indices = indices[np.argsort(columns["seq"][slot, indices], kind="stable")].tolist()
+        values = [(name, columns[name][slot].tolist()) for name in columns if name not in _INTERNAL_COLUMNS]
+        entities = []
+        for index in indices:
+            entity = objects[index]
+            for name, row in values:
+                setattr(entity, name, row[index])
+            entities.append(entity)
+        return entities
+
+    def field_of(self, slot: int) -> List[FieldPokemon]:
+        pokemons = self._synced(self.field, self.field_objects[slot], slot)
+        for pokemon in pokemons:
+            if pokemon.target == NO_TARGET:
+                pokemon.target = None
+        return pokemons
+
+    def enemies_of(self, slot: int) -> List[Enemy]:
+        return self._synced(self.enemies, self.enemy_objects[slot], slot)
+
+    # --- Пакетный шаг ---
+
+    def step(self, delta_time: float, slots: Optional[List[int]] = None):
+        """Один тик для всех игр мира (или только для перечисленных слотов)"""
+        games = self.games
+        if slots is None:
+            selected = np.array([ref is not None for ref in self.views])
+        else:
+            selected = np.zeros(self.games_capacity, dtype=np.bool_)
+            selected[slots] = True
+        running = selected & ~games["game_over"]
+        if not running.any():
+            return
+
+        games["state_version"] += running
+        # Журнал тиков каждой игры (нужен для пересимуляции)
+        for slot in np.flatnonzero(running).tolist():
+            view = self.views[slot]()
+            if view is not None:
+                view.log_tick(delta_time)
+        self._spawn(running, delta_time)
+        self._simulate(running, delta_time)
+
+    def _simulate(self, running: np.ndarray, delta_time: float):
+        """Чисто массивная часть тика: строки игр не зависят друг от друга"""
+        games = self.games
+        self._move_enemies(running, delta_time)
+        self._update_field(running, delta_time)
+
+        # Проверка победы (после 5 волн)
+        won = running & (games["wave"] > 5)
+        games["game_over"] |= won
+        games["victory"] |= won
+
+    def _spawn(self, running: np.ndarray, delta_time: float):
+        games = self.games
+        games["enemy_spawn_timer"] = np.where(running, games["enemy_spawn_timer"] + delta_time,
+                                              games["enemy_spawn_timer"])
+        due = running & (games["enemy_spawn_timer"] >= ENEMY_SPAWN_INTERVAL)
+
+        # Спавн редок (раз в 1.5 с на игру), поэтому здесь обычный цикл по играм
+        for slot in np.flatnonzero(due).tolist():
+            view = self.views[slot]()
+            if view is None or not view.wave_data:
+                continue
+            enemy = view.wave_data.pop(0)
+            enemy.x = view.rng.randint(50, 750)
+            enemy.y = 100
+            enemy.current_health = enemy.health
+            self.add_enemy(slot, enemy)
+            games["enemy_spawn_timer"][slot] = 0
+
+            if not view.wave_data:
+                games["wave"][slot] += 1
+                view.wave_data = view.generate_wave(int(games["wave"][slot]))
+
+    def _move_enemies(self, running: np.ndarray, delta_time: float):
+        enemies = self.enemies
+        games = self.games
+
+        moving = enemies["alive"] & running[:, None]
+        step = enemies["speed"] * delta_time
+        dy = PLAYER_BASE_Y - enemies["y"]
+        arrived = moving & (np.abs(dy) < step)
+        enemies["y"] = np.where(moving & ~arrived, enemies["y"] + np.where(dy > 0, step, -step), enemies["y"])
+        enemies["alive"] &= ~arrived
+
+        # Каждый дошедший враг наносит урон базе
+        hits = arrived.sum(axis=1)
+        games["player_health"] -= 20 * hits
+        games["game_over"] |= (hits > 0) & (games["player_health"] <= 0)
+
+    def _update_field(self, running: np.ndarray, delta_time: float):
+        field = self.field
+        enemies = self.enemies
+        games = self.games
+
+        present = field["alive"] & running[:, None]
+        field["attack_cooldown"] = np.where(present, np.maximum(0, field["attack_cooldown"] - delta_time),
+                                            field["attack_cooldown"])
+
+        # Покемоны на вражеской базе получают урон раз в секунду
+        on_base = present & field["reached_enemy_base"]
+        field["base_damage_timer"] = np.where(on_base, field["base_damage_timer"] + delta_time,
+                                              field["base_damage_timer"])
+        base_hit = on_base & (field["base_damage_timer"] >= 1.0)
+        field["current_health"] = np.where(base_hit, field["current_health"] - games["wave"][:, None],
+                                           field["current_health"])
+        field["base_damage_timer"] = np.where(base_hit, 0.0, field["base_damage_timer"])
+        dead = base_hit & (field["current_health"] <= 0)
+
+        # Ближайший враг в радиусе атаки и удары готовых покемонов всех игр
+        active = present & ~field["reached_enemy_base"]
+        nearest, has_target, attacked = self._resolve_attacks(active)
+
+        moving = active & ~has_target
+        field["is_moving"] = np.where(active, moving, field["is_moving"])
+        targets = np.where(has_target, np.take_along_axis(enemies["id"], nearest, axis=1), NO_TARGET)
+        field["target"] = np.where(active, targets, field["target"])
+        field["attack_cooldown"] = np.where(attacked, 0.8, field["attack_cooldown"])
+
+        killed = enemies["alive"] & (enemies["current_health"] <= 0)
+        if killed.any():
+            enemies["alive"] &= ~killed
+            kills = killed.sum(axis=1)
+            games["score"] += 15 * kills
+            games["poke_coins"] += kills
+            # Опыт и уровень - последовательная логика, только для игр с убийствами
+            for slot in np.flatnonzero(kills).tolist():
+                for _ in range(int(kills[slot])):
+                    self._add_exp(slot, 2)
+
+        # Покемоны без цели идут вверх к вражеской базе
+        walking = moving & (np.abs(ENEMY_BASE_Y - field["y"]) > 10)
+        field["y"] = np.where(walking, field["y"] - field["speed"] * delta_time * 30, field["y"])
+        arrived = walking & (field["y"] <= ENEMY_BASE_Y)
+        if arrived.any():
+            field["y"] = np.where(arrived, float(ENEMY_BASE_Y), field["y"])
+            field["reached_enemy_base"] |= arrived
+            field["is_moving"] &= ~arrived
+            field["base_damage_timer"] = np.where(arrived, 0.0, field["base_damage_timer"])
+            # Награда за достижение вражеской базы
+            reached = arrived.sum(axis=1)
+            games["score"] += 50 * reached
+            games["poke_coins"] += 5 * reached
+
+        # Удаляем погибших покемонов
+        field["alive"] &= ~dead
+
+    def _resolve_attacks(self, active: np.ndarray):
+        """
+        Цели и удары в каждой игре в порядке поля, как в PokemonGameLogic
+        (и VectorizedPokemonGameLogic._resolve_attacks, но для всех строк-игр сразу).
+        Покемоны и враги строки переставляются в порядок появления (seq). Урон по врагу
+        накапливается в порядке атакующих; в игре, где случился смертельный удар, враг
+        выбывает, и покемоны после добившего выбирают цели заново - проходов столько,
+        сколько убитых за тик в самой "урожайной" игре, плюс один.
+        Здоровье врагов обновляется на месте. Возвращает (индекс цели, есть цель, атаковал)
+        в исходных индексах колонок.
+        """
+        field, enemies = self.field, self.enemies
+        games_count, field_count = field["alive"].shape
+        positions = np.arange(field_count)
+        last = np.iinfo(np.int64).max
+
+        # Порядок появления: живые по seq, освобожденные индексы в конце
+        order = np.argsort(np.where(field["alive"], field["seq"], last), axis=1, kind="stable")
+        enemy_order = np.argsort(np.where(enemies["alive"], enemies["seq"], last), axis=1, kind="stable")
+
+        def ordered(columns, name, permutation):
+            return np.take_along_axis(columns[name], permutation, axis=1)
+
+        # Квадраты расстояний - то же сравнение, что и в EnemyGrid.nearest
+        dx = ordered(field, "x", order)[:, :, None] - ordered(enemies, "x", enemy_order)[:, None, :]
+        dy = ordered(field, "y", order)[:, :, None] - ordered(enemies, "y", enemy_order)[:, None, :]
+        distances = dx * dx + dy * dy
+        attack_range = ordered(field, "attack_range", order)
+        in_range = (distances < (attack_range * attack_range)[:, :, None]) & np.take_along_axis(
+            active, order, axis=1)[:, :, None]
+        distances = np.where(in_range, distances, np.inf)
+        ready = ordered(field, "attack_cooldown", order) <= 0
+        attack = ordered(field, "attack", order)
+        attacker_element = ordered(field, "element", order)
+        enemy_element = ordered(enemies, "element", enemy_order)
+        health = ordered(enemies, "current_health", enemy_order)
+        alive = ordered(enemies, "alive", enemy_order)
+
+        nearest = np.zeros((games_count, field_count), dtype=np.int64)
+        has_target = np.zeros((games_count, field_count), dtype=np.bool_)
+        attacked = np.zeros((games_count, field_count), dtype=np.bool_)
+        # Первая позиция в порядке поля, чьи цели еще не окончательны (по игре)
+        start = np.where(active.any(axis=1), 0, field_count)
+
+        while (start < field_count).any():
+            pending = positions[None, :] >= start[:, None]
+            candidates_distances = np.where(alive[:, None, :], distances, np.inf)
+            candidates = candidates_distances.argmin(axis=2)
+            found = np.isfinite(np.take_along_axis(candidates_distances, candidates[:, :, None], axis=2)[:, :, 0])
+            nearest = np.where(pending, candidates, nearest)
+            has_target = np.where(pending, found, has_target)
+
+            hitters = pending & found & ready
+            victims = np.where(hitters, candidates, 0)
+            damage = np.where(hitters, attack * TYPE_MULTIPLIERS[attacker_element,
+                                                                 np.take_along_axis(enemy_element, victims, axis=1)],
+                              0.0)
+            # Накопленный урон по цели каждого удара (удары по порядку атакующих)
+            per_enemy = np.zeros(distances.shape)
+            np.put_along_axis(per_enemy, victims[:, :, None], damage[:, :, None], axis=2)
+            dealt = np.take_along_axis(np.cumsum(per_enemy, axis=1), victims[:, :, None], axis=2)[:, :, 0]
+            lethal = hitters & (np.take_along_axis(health, victims, axis=1) - dealt <= 0)
+
+            # Удары до первого смертельного включительно - окончательные
+            has_lethal = lethal.any(axis=1)
+            first_lethal = np.where(has_lethal, lethal.argmax(axis=1), field_count)
+            final = hitters & (positions[None, :] <= first_lethal[:, None])
+            game_index, position = np.nonzero(final)
+            np.subtract.at(health, (game_index, victims[game_index, position]), damage[game_index, position])
+            attacked |= final
+
+            killers = np.flatnonzero(has_lethal)
+            alive[killers, victims[killers, first_lethal[killers]]] = False
+            start = np.where(has_lethal, first_lethal + 1, field_count)
+
+        # Обратно в исходные индексы колонок
+        enemies["current_health"] = self._unordered(health, enemy_order)
+        nearest = np.take_along_axis(enemy_order, nearest, axis=1)
+        return (self._unordered(nearest, order), self._unordered(has_target, order),
+                self._unordered(attacked, order))
+
+    @staticmethod
+    def _unordered(values: np.ndarray, order: np.ndarray) -> np.ndarray:
+        result = np.empty_like(values)
+        np.put_along_axis(result, order, values, axis=1)
+        return result
+
+    def _add_exp(self, slot: int, exp: int):
+        games = self.games
+        games["player_exp"][slot] += exp
+        if games["player_exp"][slot] >= games["player_max_exp"][slot]:
+            games["player_level"][slot] += 1
+            games["pokeballs"][slot] += 2
+            games["player_exp"][slot] = 0
+            games["player_max_exp"][slot] = int(games["player_max_exp"][slot] * 1.2)
+
+
+class _WorldScalar:
+    """Скалярное поле игры, хранящееся в колонке мира"""
+
+    def __init__(self, cast):
+        self.cast = cast
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        return self.cast(view.world.games[self.name][view.slot])
+
+    def __set__(self, view, value):
+        view.world.games[self.name][view.slot] = value
+
+
+class WorldGameView(PokemonGameLogic):
+    """
+    Представление одной игры в GameWorld.
+    Интерфейс тот же, что у PokemonGameLogic (get_state, get_game_result, действия),
+    но состояние лежит в общих буферах мира и шагается пакетно через world.step().
+    """
+
+    engine = "world"
+
+    player_health = _WorldScalar(int)
+    player_level = _WorldScalar(int)
+    player_exp = _WorldScalar(int)
+    player_max_exp = _WorldScalar(int)
+    pokeballs = _WorldScalar(int)
+    score = _WorldScalar(int)
+    poke_coins = _WorldScalar(int)
+    wave = _WorldScalar(int)
+    enemy_spawn_timer = _WorldScalar(float)
+    game_over = _WorldScalar(bool)
+    victory = _WorldScalar(bool)
+    state_version = _WorldScalar(int)
+
+    def __init__(self, world: GameWorld, user_id: int, seed: Optional[int] = None):
+        self.world = world
+        self.slot = world._allocate(self)
+        super().__init__(user_id, seed=seed)
+
+    @property
+    def field(self) -> List[FieldPokemon]:
+        return self.world.field_of(self.slot)
+
+    @field.setter
+    def field(self, pokemons: List[FieldPokemon]):
+        self.world.clear_field(self.slot)
+        for pokemon in pokemons:
+            self.world.add_field_pokemon(self.slot, pokemon)
+
+    @property
+    def enemies(self) -> List[Enemy]:
+        return self.world.enemies_of(self.slot)
+
+    @enemies.setter
+    def enemies(self, enemies: List[Enemy]):
+        self.world.clear_enemies(self.slot)
+        for enemy in enemies:
+            self.world.add_enemy(self.slot, enemy)
+
+    def play_card(self, card_id: int, x: int) -> Dict:
+        """Размещение покемона на базе игрока (фиксированная высота)"""
+        if not is_position(x):
+            return {"error": "Invalid position"}
+        self.log_action("play_card", card_id=card_id, x=x)
+        card_index = next((i for i, card in enumerate(self.hand) if card.id == card_id), None)
+
+        if card_index is None:
+            return {"error": "Card not found in hand"}
+
+        base_y = self.player_base_y - 50
+
+        if x < 50 or x > 750:
+            return {"error": "Position out of bounds"}
+
+        field = self.world.field
+        occupied = (field["alive"][self.slot]
+                    & (np.abs(field["x"][self.slot] - x) < 80)
+                    & (np.abs(field["y"][self.slot] - base_y) < 50))
+        if occupied.any():
+            return {"error": "Position already occupied by another Pokemon"}
+
+        card = self.hand.pop(card_index)
+        self.world.add_field_pokemon(self.slot, FieldPokemon(card, x=x, y=base_y, attack_range=120))
+        self.state_version += 1
+
+        return {"success": True, "field": [pokemon.to_dict() for pokemon in self.field]}
+
+    def memory_usage(self) -> Dict[str, int]:
+        # Объекты сущностей плюс строки игры в колонках мира
+        usage = super().memory_usage()
+        usage["field"] += sum(array[self.slot].nbytes for array in self.world.field.values())
+        usage["enemies"] += sum(array[self.slot].nbytes for array in self.world.enemies.values())
+        return usage
+
+    def update(self, delta_time: float = 0.1) -> Dict:
+        """Шаг только этой игры (для совместимости); обычно мир шагается целиком"""
+        self.world.step(delta_time, slots=[self.slot])
+        return self.get_state()
+
+
+# Общий мир процесса для GAME_ENGINE=world
+default_world = GameWorld()
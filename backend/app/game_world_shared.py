@@ -0,0 +1,238 @@
+"""
+Мировой движок в shared memory (GAME_ENGINE=shared).
+
+Колонки GameWorld лежат в блоках multiprocessing.shared_memory, а массивная часть тика
+(движение врагов, бой, победа) считается пулом процессов: каждый процесс шагает свою
+полосу строк-игр прямо в общих буферах. Спавн, журналы и объекты сущностей остаются
+в основном процессе, а get_state читает те же буферы без копирования через IPC.
+"""
+import atexit
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .game_world import GameWorld, WorldGameView
+
+# Описание колонок для процессов пула: имя -> (имя блока, форма, dtype)
+Layout = Dict[str, Tuple[str, Tuple[int, ...], str]]
+
+
+class InPlaceColumns(dict):
+    """
+    Колонки, присваивание которым пишет в существующий буфер, а не заменяет массив.
+    Так код GameWorld (field["x"] = np.where(...)) работает с общей памятью без изменений.
+    """
+
+    def __setitem__(self, name: str, value):
+        current = self.get(name)
+        if current is None or current.shape != np.shape(value):
+            raise ValueError(f"Column {name} can not be replaced in place")
+        np.copyto(current, value, casting="unsafe")
+
+
+class SharedColumns(InPlaceColumns):
+    """Колонки в shared memory; при росте емкости массив переезжает в новый блок"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        super().__init__()
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}
+        # Растет при каждом переезде - процессы пула переподключаются к новым блокам
+        self.generation = 0
+        self.closed = False
+        for name, array in arrays.items():
+            self._allocate(name, array)
+
+    def _allocate(self, name: str, value: np.ndarray):
+        value = np.asarray(value)
+        if self.closed:
+            dict.__setitem__(self, name, value.copy())
+            return
+        block = shared_memory.SharedMemory(create=True, size=max(1, value.nbytes))
+        array = np.ndarray(value.shape, dtype=value.dtype, buffer=block.buf)
+        array[...] = value
+        old = self.blocks.get(name)
+        self.blocks[name] = block
+        dict.__setitem__(self, name, array)
+        if old is not None:
+            old.close()
+            old.unlink()
+        self.generation += 1
+
+    def __setitem__(self, name: str, value):
+        current = self.get(name)
+        if current is not None and current.shape == np.shape(value):
+            np.copyto(current, value, casting="unsafe")
+        else:
+            self._allocate(name, np.asarray(value, dtype=current.dtype if current is not None else None))
+
+    def layout(self) -> Layout:
+        return {name: (self.blocks[name].name, array.shape, array.dtype.str) for name, array in self.items()}
+
+    def close(self):
+        # Данные переезжают в обычную память: живые представления игр остаются рабочими
+        for name, array in list(self.items()):
+            dict.__setitem__(self, name, array.copy())
+        self.closed = True
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+
+# --- Процесс пула ---
+
+def _attach(layout: Layout, blocks: List[shared_memory.SharedMemory]) -> Dict[str, np.ndarray]:
+    arrays = {}
+    for name, (block_name, shape, dtype) in layout.items():
+        # Процессы пула делят трекер ресурсов с основным, блоки удаляет только он
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return arrays
+
+
+def _pool_worker(connection):
+    """Шагает присланные полосы строк, пока основной процесс не закроет канал"""
+    generation = None
+    blocks: List[shared_memory.SharedMemory] = []
+    columns = {}
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        new_generation, layouts, start, stop, running, delta_time = message
+        if new_generation != generation:
+            columns = {}
+            for block in blocks:
+                block.close()
+            blocks = []
+            columns = {kind: _attach(layout, blocks) for kind, layout in layouts.items()}
+            generation = new_generation
+
+        # Полоса строк как отдельный мир: те же методы GameWorld, но на срезах общих массивов
+        part = GameWorld.__new__(GameWorld)
+        part.games, part.field, part.enemies = (
+            InPlaceColumns({name: array[start:stop] for name, array in columns[kind].items()})
+            for kind in ("games", "field", "enemies"))
+        part._simulate(running, delta_time)
+        connection.send(True)
+    for block in blocks:
+        block.close()
+
+
+# --- Основной процесс ---
+
+class SharedGameWorld(GameWorld):
+    """GameWorld, у которого массивная часть тика идет в пуле процессов"""
+
+    def __init__(self, workers: int = 0, games_capacity: int = 64, field_capacity: int = 8,
+                 enemy_capacity: int = 8, min_rows_per_worker: int = 16):
+        super().__init__(games_capacity, field_capacity, enemy_capacity)
+        self.games = SharedColumns(self.games)
+        self.field = SharedColumns(self.field)
+        self.enemies = SharedColumns(self.enemies)
+        # Полосы меньше этого шагаются без пула: пересылка дороже расчета
+        self.min_rows_per_worker = min_rows_per_worker
+
+        context = multiprocessing.get_context("spawn")
+        self.connections = []
+        self.processes = []
+        for index in range(workers or os.cpu_count() or 1):
+            parent, child = context.Pipe()
+            process = context.Process(target=_pool_worker, args=(child,), name=f"world-worker-{index}",
+                                      daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        self._sent_generation: List[Optional[int]] = [None] * len(self.connections)
+        atexit.register(self.close)
+
+    def create_game(self, user_id: int, seed: Optional[int] = None) -> "SharedWorldGameView":
+        return SharedWorldGameView(self, user_id, seed=seed)
+
+    @property
+    def generation(self) -> int:
+        return self.games.generation + self.field.generation + self.enemies.generation
+
+    def _simulate(self, running: np.ndarray, delta_time: float):
+        rows = np.flatnonzero(running)
+        if not len(rows) or not self.connections:
+            super()._simulate(running, delta_time)
+            return
+
+        # Полосы строк от первой до последней работающей игры, не мельче min_rows_per_worker
+        first, last = int(rows[0]), int(rows[-1]) + 1
+        stripes = min(len(self.connections), max(1, (last - first) // self.min_rows_per_worker))
+        bounds = np.linspace(first, last, stripes + 1).astype(int).tolist()
+        if stripes == 1:
+            super()._simulate(running, delta_time)
+            return
+
+        generation = self.generation
+        layouts = None
+        busy = []
+        for index, (start, stop) in enumerate(zip(bounds, bounds[1:])):
+            connection = self.connections[index]
+            if self._sent_generation[index] != generation:
+                if layouts is None:
+                    layouts = {"games": self.games.layout(), "field": self.field.layout(),
+                               "enemies": self.enemies.layout()}
+                # Схема блоков отправляется только после переезда колонок
+                message_layouts = layouts
+                self._sent_generation[index] = generation
+            else:
+                message_layouts = None
+            connection.send((generation, message_layouts, start, stop, running[start:stop], delta_time))
+            busy.append(connection)
+
+        for connection in busy:
+            connection.recv()
+
+    def close(self):
+        """Останавливает пул и освобождает общую память"""
+        for connection in self.connections:
+            try:
+                connection.send(None)
+                connection.close()
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(5)
+        self.connections = []
+        self.processes = []
+        for columns in (self.games, self.field, self.enemies):
+            if isinstance(columns, SharedColumns):
+                columns.close()
+
+
+class SharedWorldGameView(WorldGameView):
+    engine = "shared"
+
+
+_shared_world: Optional[SharedGameWorld] = None
+
+
+def default_pool_size(game_processes: int) -> int:
+    """
+    Процессов в пуле, если GAME_SHARED_WORKERS не задан: ядра делятся между всеми
+    процессами, которые шагают игры, - иначе каждый поднял бы пул на все ядра
+    """
+    return max(1, (os.cpu_count() or 1) // max(1, game_processes))
+
+
+def get_shared_world() -> SharedGameWorld:
+    """Общий мир процесса; пул запускается при первой игре"""
+    global _shared_world
+    if _shared_world is None:
+        from .config import settings
+        # Игры шагают хосты игр, а без них - каждый HTTP-воркер
+        workers = settings.GAME_SHARED_WORKERS or default_pool_size(settings.GAME_HOSTS or settings.WEB_CONCURRENCY)
+        _shared_world = SharedGameWorld(workers=workers)
+    return _shared_world
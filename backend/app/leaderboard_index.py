@@ -0,0 +1,105 @@
+"""
+Лидерборд в Redis: рекорды игроков в sorted set.
+
+Страница лидерборда и место игрока - O(log n) (ZREVRANGE / ZREVRANK) вместо
+ORDER BY high_score OFFSET ... по таблице leaderboard. Источник истины - SQL:
+после каждой записи результатов игр (crud_async.create_game_session, result_writer)
+в индекс попадают итоговые значения строк лидерборда, а rebuild() пересобирает его
+из таблицы целиком (при старте, если индекс пуст, и по запросу администратора).
+Если Redis недоступен, чтение падает обратно на SQL.
+
+Индекс включается только с настоящим Redis (REDIS_URL): замена в памяти процесса
+(LocalRedisClient) у каждого воркера была бы своя и видела бы только его записи.
+Без Redis ready остается False, и лидерборд всегда читается из SQL. Порядок при
+равных рекордах в обоих случаях один - по убыванию user_id.
+"""
+from typing import Iterable, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, schemas
+from .config import settings
+from .redis_client import LeaderboardRow, RedisClient, redis
+
+# Строка индекса из таблицы leaderboard (в старых базах счетчики могут быть NULL)
+_LEADERBOARD_COLUMNS = (
+    models.Leaderboard.user_id,
+    models.Leaderboard.username,
+    func.coalesce(models.Leaderboard.high_score, 0),
+    func.coalesce(models.Leaderboard.total_waves, 0),
+)
+
+
+class LeaderboardIndex:
+    def __init__(self, client: Optional[RedisClient]):
+        # None - индекс выключен (нет Redis)
+        self.client = client
+        # False - индекс выключен или не собран (Redis был недоступен при старте): читаем из SQL
+        self.ready = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.client is not None
+
+    async def start(self, db: AsyncSession):
+        if not self.enabled:
+            return
+        try:
+            await self.client.connect()
+            if await self.client.get_leaderboard_size() == 0:
+                count = await self.rebuild(db)
+                print(f"✓ Leaderboard index built: {count} players")
+            self.ready = True
+        except Exception as e:
+            print(f"⚠️ Leaderboard index is unavailable, using SQL: {e}")
+
+    async def stop(self):
+        if self.enabled:
+            await self.client.disconnect()
+
+    async def rebuild(self, db: AsyncSession) -> int:
+        """Пересобирает индекс из таблицы leaderboard; возвращает число игроков"""
+        result = await db.execute(select(*_LEADERBOARD_COLUMNS))
+        rows = [tuple(row) for row in result]
+        await self.client.replace_leaderboard(rows)
+        self.ready = True
+        return len(rows)
+
+    async def record(self, rows: Iterable[LeaderboardRow]):
+        """Итоговые строки лидерборда после записи в БД (ошибка Redis не ломает запись)"""
+        if not self.enabled:
+            return
+        try:
+            await self.client.update_leaderboard(rows)
+        except Exception as e:
+            print(f"⚠️ Failed to update leaderboard index: {e}")
+
+    async def page(self, skip: int, limit: int) -> List[schemas.LeaderboardEntry]:
+        rows = await self.client.get_leaderboard_page(skip, limit)
+        return [
+            schemas.LeaderboardEntry(username=username, high_score=score, total_waves=waves, rank=rank)
+            for rank, (_, username, score, waves) in enumerate(rows, start=skip + 1)
+        ]
+
+    async def user_rank(self, user_id: int) -> Optional[int]:
+        return await self.client.get_leaderboard_rank(user_id)
+
+    async def size(self) -> int:
+        return await self.client.get_leaderboard_size()
+
+
+async def leaderboard_rows(db: AsyncSession, user_ids: Iterable[int]) -> List[LeaderboardRow]:
+    """Текущие строки лидерборда игроков - для record() после записи результатов"""
+    result = await db.execute(
+        select(*_LEADERBOARD_COLUMNS).where(models.Leaderboard.user_id.in_(list(user_ids)))
+    )
+    return [tuple(row) for row in result]
+
+
+def create_leaderboard_index() -> LeaderboardIndex:
+    # Свое соединение: хранилище игр подключает redis_client только без хостов игр
+    if settings.REDIS_URL and redis is not None:
+        return LeaderboardIndex(RedisClient())
+    return LeaderboardIndex(None)
+
+
+leaderboard_index = create_leaderboard_index()
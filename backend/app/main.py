@@ -9,11 +9,17 @@ from .routers.auth import router as auth_router
 from .routers.users import router as users_router
 from .routers.game import router as game_router
 from .routers.leaderboard import router as leaderboard_router
+from .routers.game import game_service
+from .result_writer import result_writer
 from .config import settings
-from .database import engine, Base
+from .database import AsyncSessionLocal, async_engine, engine, Base, ensure_unique_index
+from .leaderboard_index import leaderboard_index
+from .models import Leaderboard
 
 # Создаем таблицы
 Base.metadata.create_all(bind=engine)
+# Upsert лидерборда опирается на уникальность user_id (в старых базах ее нет)
+ensure_unique_index(Leaderboard.__table__, "user_id")
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -21,6 +27,27 @@ app = FastAPI(
     openapi_url="/api/v1/openapi.json"
 )
 
+@app.on_event("startup")
+async def start_game_service():
+    # Хранилище игр и серверный цикл симуляции (или соединения с хостами игр)
+    await game_service.start()
+    # Индекс лидерборда в Redis (собирается из SQL, если пуст)
+    async with AsyncSessionLocal() as db:
+        await leaderboard_index.start(db)
+    # Отложенная запись результатов игр (подхватывает журналы упавших процессов)
+    await result_writer.start()
+
+
+@app.on_event("shutdown")
+async def stop_game_service():
+    await game_service.stop()
+    # Дописываем в БД накопленные результаты игр
+    await result_writer.stop()
+    await leaderboard_index.stop()
+    # Закрываем соединения асинхронного пула
+    await async_engine.dispose()
+
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -20,7 +20,9 @@ class User(Base):
     __table_args__ = (
         CheckConstraint('poke_coins >= 0', name='check_poke_coins_positive'),
         CheckConstraint('LENGTH(username) >= 3', name='check_username_length'),
-        CheckConstraint('email ~* \'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\\.[A-Z|a-z]{2,}$\'', name='check_email_format'),
+        # Регулярное выражение ~* есть только в PostgreSQL: в SQLite проверка не создается
+        CheckConstraint('email ~* \'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\\.[A-Z|a-z]{2,}$\'',
+                        name='check_email_format').ddl_if(dialect='postgresql'),
     )
 
     # Связи
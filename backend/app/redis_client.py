@@ -1,11 +1,89 @@
-import redis.asyncio as redis
+import bisect
+import os
+import time
+import uuid
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
 from .config import settings
-import json
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # Redis нужен только при нескольких воркерах (REDIS_URL)
+    redis = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: владение играми только в памяти процесса (один воркер)
+    fcntl = None
+
+GAME_TTL = 3600  # TTL 1 час
+
+# Запись игры, только если процесс все еще ее владелец (и продление владения)
+_WRITE_BACK_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+if ARGV[2] ~= '' then
+    redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+# Захват владения, только если владелец все еще тот, кого видел процесс ('' - владельца нет)
+_CLAIM_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '') ~= ARGV[2] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+return 1
+"""
+
+# Снятие владения, только если владелец - этот процесс
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _game_key(user_id: int) -> str:
+    return f"game:{user_id}"
+
+
+def _owner_key(user_id: int) -> str:
+    return f"game_owner:{user_id}"
+
+
+def _handover_key(owner: str) -> str:
+    return f"game_handover:{owner}"
+
+
+# Лидерборд: рекорды и сумма волн - sorted set'ы (значения только растут, пишутся через ZADD GT),
+# имена игроков - hash. Ключ - user_id с ведущими нулями (_leaderboard_member)
+LEADERBOARD_SCORES_KEY = "leaderboard:scores"
+LEADERBOARD_WAVES_KEY = "leaderboard:waves"
+LEADERBOARD_NAMES_KEY = "leaderboard:names"
+_LEADERBOARD_KEYS = (LEADERBOARD_SCORES_KEY, LEADERBOARD_WAVES_KEY, LEADERBOARD_NAMES_KEY)
+
+# (user_id, username, high_score, total_waves)
+LeaderboardRow = Tuple[int, str, int, int]
+
+
+def _leaderboard_member(user_id: int) -> str:
+    """
+    При равных рекордах ZREVRANGE упорядочивает игроков по ключу по убыванию как строки.
+    Ключ фиксированной ширины сравнивается так же, как число: порядок совпадает
+    с SQL (high_score DESC, user_id DESC, см. crud_async.get_leaderboard)
+    """
+    return f"{user_id:010d}"
 
 
 class RedisClient:
     def __init__(self):
         self.redis = None
+        # Снимки игр бинарные - для них соединение без декодирования ответов
+        self.binary = None
 
     async def connect(self):
         self.redis = await redis.from_url(
@@ -13,42 +91,399 @@ class RedisClient:
             encoding="utf-8",
             decode_responses=True
         )
+        self.binary = await redis.from_url(settings.REDIS_URL)
 
     async def disconnect(self):
         if self.redis:
             await self.redis.close()
+        if self.binary:
+            await self.binary.close()
 
     async def ping(self):
         return await self.redis.ping()
 
-    async def set_game(self, user_id: int, game_data: dict):
-        key = f"game:{user_id}"
-        await self.redis.setex(
+    async def set_game(self, user_id: int, snapshot: bytes):
+        """Сохраняет снимок игры (PokemonGameLogic.to_snapshot)"""
+        key = _game_key(user_id)
+        await self.binary.setex(
             key,
-            3600,  # TTL 1 час
-            json.dumps(game_data)
+            GAME_TTL,
+            snapshot
         )
 
-    async def get_game(self, user_id: int) -> dict:
-        key = f"game:{user_id}"
-        data = await self.redis.get(key)
-        return json.loads(data) if data else None
+    async def get_game(self, user_id: int) -> Optional[bytes]:
+        key = _game_key(user_id)
+        return await self.binary.get(key)
 
     async def delete_game(self, user_id: int):
-        key = f"game:{user_id}"
-        await self.redis.delete(key)
-
-    async def set_leaderboard_cache(self, data: dict):
-        await self.redis.setex(
-            "leaderboard:cache",
-            300,  # 5 минут кэша
-            json.dumps(data)
-        )
+        key = _game_key(user_id)
+        await self.binary.delete(key)
+
+    # --- Владение игрой: игру шагает и записывает только один процесс ---
+
+    async def get_game_owner(self, user_id: int) -> Optional[str]:
+        return await self.redis.get(_owner_key(user_id))
+
+    async def claim_game(self, user_id: int, owner: str, ttl: int, expected: Optional[str] = None) -> bool:
+        """Делает owner владельцем игры, если сейчас ее владелец expected (None - владельца нет)"""
+        claimed = await self.redis.eval(_CLAIM_SCRIPT, 1, _owner_key(user_id), owner, expected or "", ttl)
+        return bool(claimed)
+
+    async def request_handover(self, user_id: int, owner: str, ttl: int):
+        """Просит владельца owner записать игру и отдать владение (см. take_handover_requests)"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.rpush(_handover_key(owner), user_id)
+        # Очередь умершего владельца не копится вечно
+        pipe.expire(_handover_key(owner), ttl)
+        await pipe.execute()
+
+    async def take_handover_requests(self, owner: str) -> List[int]:
+        """Игры, которые другие процессы просят отдать владельцу owner (очередь очищается)"""
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lrange(_handover_key(owner), 0, -1)
+        pipe.delete(_handover_key(owner))
+        requested, _ = await pipe.execute()
+        return list(dict.fromkeys(int(user_id) for user_id in requested))
+
+    async def write_back_game(self, user_id: int, owner: str, snapshot: Optional[bytes], ttl: int) -> bool:
+        """Сохраняет снимок игры (если он есть) и продлевает владение; False - владение потеряно"""
+        written = await self.binary.eval(_WRITE_BACK_SCRIPT, 2, _owner_key(user_id), _game_key(user_id),
+                                         owner, snapshot or b"", GAME_TTL, ttl)
+        return bool(written)
+
+    async def release_game(self, user_id: int, owner: str):
+        await self.redis.eval(_RELEASE_SCRIPT, 1, _owner_key(user_id), owner)
+
+    async def expire_games(self):
+        """Удаление просроченных игр (Redis делает это сам по TTL)"""
+        pass
+
+    # --- Лидерборд ---
+
+    async def update_leaderboard(self, rows: Iterable[LeaderboardRow]):
+        """Записывает рекорды игроков; меньшие значения, чем уже записанные, не применяются"""
+        rows = list(rows)
+        if not rows:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zadd(LEADERBOARD_SCORES_KEY, {_leaderboard_member(uid): score for uid, _, score, _ in rows}, gt=True)
+        pipe.zadd(LEADERBOARD_WAVES_KEY, {_leaderboard_member(uid): waves for uid, _, _, waves in rows}, gt=True)
+        pipe.hset(LEADERBOARD_NAMES_KEY, mapping={_leaderboard_member(uid): name for uid, name, _, _ in rows})
+        await pipe.execute()
+
+    async def replace_leaderboard(self, rows: Iterable[LeaderboardRow], chunk_size: int = 1000):
+        """Пересобирает лидерборд во временных ключах и атомарно подменяет им текущий"""
+        suffix = f":rebuild:{uuid.uuid4().hex}"
+        temp_keys = [key + suffix for key in _LEADERBOARD_KEYS]
+        chunk: List[LeaderboardRow] = []
+
+        async def write(chunk):
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zadd(temp_keys[0], {_leaderboard_member(uid): score for uid, _, score, _ in chunk})
+            pipe.zadd(temp_keys[1], {_leaderboard_member(uid): waves for uid, _, _, waves in chunk})
+            pipe.hset(temp_keys[2], mapping={_leaderboard_member(uid): name for uid, name, _, _ in chunk})
+            await pipe.execute()
+
+        written = 0
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                await write(chunk)
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            await write(chunk)
+            written += len(chunk)
+
+        pipe = self.redis.pipeline(transaction=True)
+        if written:
+            for temp_key, key in zip(temp_keys, _LEADERBOARD_KEYS):
+                pipe.rename(temp_key, key)
+        else:
+            pipe.delete(*_LEADERBOARD_KEYS)
+        await pipe.execute()
+
+    async def get_leaderboard_page(self, skip: int, limit: int) -> List[LeaderboardRow]:
+        """Игроки с местами skip+1 .. skip+limit по убыванию рекорда"""
+        if limit <= 0:
+            return []
+        scored = await self.redis.zrevrange(LEADERBOARD_SCORES_KEY, skip, skip + limit - 1, withscores=True)
+        if not scored:
+            return []
+        members = [member for member, _ in scored]
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hmget(LEADERBOARD_NAMES_KEY, members)
+        pipe.zmscore(LEADERBOARD_WAVES_KEY, members)
+        names, waves = await pipe.execute()
+        return [(int(member), name or "", int(score), int(total or 0))
+                for (member, score), name, total in zip(scored, names, waves)]
+
+    async def get_leaderboard_rank(self, user_id: int) -> Optional[int]:
+        """Место игрока (с 1) или None, если его нет в лидерборде"""
+        rank = await self.redis.zrevrank(LEADERBOARD_SCORES_KEY, _leaderboard_member(user_id))
+        return None if rank is None else rank + 1
+
+    async def get_leaderboard_size(self) -> int:
+        return await self.redis.zcard(LEADERBOARD_SCORES_KEY)
+
+
+class LocalRedisClient(RedisClient):
+    """
+    Замена Redis в памяти процесса с тем же интерфейсом (для одного воркера и проверок).
+    Значения хранятся сериализованными, как в настоящем Redis.
+
+    Если задана games_dir, снимки игр лежат в файлах, а не в памяти, и папку могут делить
+    воркеры одной машины. Тогда владение игрой - эксклюзивный flock на game-<id>.owner
+    (в файле - имя владельца), а просьбы о передаче - файлы в handovers/. Блокировку
+    держит процесс-владелец, и она снимается сама, если процесс умер.
+    """
+
+    def __init__(self, games_dir: Optional[str] = None):
+        super().__init__()
+        self.values: Dict[str, Tuple[Union[str, bytes], Optional[float]]] = {}
+        self.handovers: Dict[str, List[int]] = {}
+        # Файлы владения игр этого процесса (открыты под flock, пока игра наша)
+        self.owner_files: Dict[int, BinaryIO] = {}
+        self.leaderboard_scores: Dict[int, int] = {}
+        # (-рекорд, -user_id) по возрастанию - тот же порядок, что у ZREVRANGE
+        self.leaderboard_ranked: List[Tuple[int, int]] = []
+        self.leaderboard_waves: Dict[int, int] = {}
+        self.leaderboard_names: Dict[int, str] = {}
+        self.games_dir = games_dir
+        self.shared = bool(games_dir) and fcntl is not None
+        if games_dir:
+            os.makedirs(games_dir, exist_ok=True)
+        if self.shared:
+            os.makedirs(self._handovers_dir, exist_ok=True)
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        for user_id in list(self.owner_files):
+            self._unlock_owner(user_id)
+
+    async def ping(self):
+        return True
+
+    def _get(self, key: str) -> Optional[Union[str, bytes]]:
+        item = self.values.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.values[key]
+            return None
+        return value
+
+    def _set(self, key: str, value: Union[str, bytes], ttl: Optional[float] = None):
+        self.values[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+
+    def _game_path(self, user_id: int) -> str:
+        return os.path.join(self.games_dir, f"game-{user_id}.bin")
+
+    def _owner_path(self, user_id: int) -> str:
+        return os.path.join(self.games_dir, f"game-{user_id}.owner")
+
+    @property
+    def _handovers_dir(self) -> str:
+        return os.path.join(self.games_dir, "handovers")
+
+    def _foreign_owner(self, user_id: int) -> Optional[str]:
+        """Владелец игры из другого процесса: имя из файла, пока файл под его flock"""
+        try:
+            file = open(self._owner_path(user_id), "rb")
+        except FileNotFoundError:
+            return None
+        with file:
+            try:
+                fcntl.flock(file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return file.read().decode() or None
+            # Блокировку никто не держит - владельца нет (или он умер)
+            return None
+
+    def _lock_owner(self, user_id: int, owner: str) -> bool:
+        file = self.owner_files.get(user_id)
+        if file is None:
+            file = os.fdopen(os.open(self._owner_path(user_id), os.O_RDWR | os.O_CREAT), "r+b")
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                file.close()
+                return False
+            self.owner_files[user_id] = file
+        file.seek(0)
+        file.truncate()
+        file.write(owner.encode())
+        file.flush()
+        return True
+
+    def _unlock_owner(self, user_id: int):
+        # Файл не удаляем: иначе другой процесс мог бы заблокировать уже удаленный файл
+        file = self.owner_files.pop(user_id, None)
+        if file is not None:
+            file.close()
+
+    def _store_game(self, user_id: int, snapshot: bytes):
+        if not self.games_dir:
+            self._set(_game_key(user_id), snapshot, GAME_TTL)
+            return
+        # Запись через временный файл, чтобы не прочитать наполовину записанный снимок
+        path = self._game_path(user_id)
+        with open(path + ".tmp", "wb") as f:
+            f.write(snapshot)
+        os.replace(path + ".tmp", path)
+
+    async def set_game(self, user_id: int, snapshot: bytes):
+        self._store_game(user_id, snapshot)
+
+    async def get_game(self, user_id: int) -> Optional[bytes]:
+        if not self.games_dir:
+            return self._get(_game_key(user_id))
+        path = self._game_path(user_id)
+        try:
+            if os.path.getmtime(path) + GAME_TTL <= time.time():
+                os.unlink(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    async def delete_game(self, user_id: int):
+        self.values.pop(_game_key(user_id), None)
+        if self.games_dir:
+            try:
+                os.unlink(self._game_path(user_id))
+            except FileNotFoundError:
+                pass
+
+    def _owner(self, user_id: int) -> Optional[str]:
+        owner = self._get(_owner_key(user_id))
+        if not self.shared:
+            return owner
+        if user_id in self.owner_files:
+            if owner is None:
+                # Владение истекло - отпускаем блокировку для других процессов
+                self._unlock_owner(user_id)
+            return owner
+        return self._foreign_owner(user_id)
+
+    async def get_game_owner(self, user_id: int) -> Optional[str]:
+        return self._owner(user_id)
+
+    async def claim_game(self, user_id: int, owner: str, ttl: int, expected: Optional[str] = None) -> bool:
+        if self._owner(user_id) != expected:
+            return False
+        # Владелец из другого процесса отпускает игру только вместе с блокировкой
+        if self.shared and not self._lock_owner(user_id, owner):
+            return False
+        self._set(_owner_key(user_id), owner, ttl)
+        return True
+
+    async def request_handover(self, user_id: int, owner: str, ttl: int):
+        if not self.shared:
+            self.handovers.setdefault(owner, []).append(user_id)
+            return
+        with open(os.path.join(self._handovers_dir, f"{owner}.{user_id}"), "wb"):
+            pass
+
+    async def take_handover_requests(self, owner: str) -> List[int]:
+        if not self.shared:
+            return list(dict.fromkeys(self.handovers.pop(owner, [])))
+        prefix = f"{owner}."
+        requested = []
+        with os.scandir(self._handovers_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith(prefix):
+                    requested.append(int(entry.name[len(prefix):]))
+                    try:
+                        os.unlink(entry.path)
+                    except FileNotFoundError:
+                        pass
+        return requested
+
+    async def write_back_game(self, user_id: int, owner: str, snapshot: Optional[bytes], ttl: int) -> bool:
+        if self._owner(user_id) != owner:
+            return False
+        if snapshot is not None:
+            self._store_game(user_id, snapshot)
+        self._set(_owner_key(user_id), owner, ttl)
+        return True
+
+    async def release_game(self, user_id: int, owner: str):
+        if self._get(_owner_key(user_id)) == owner:
+            del self.values[_owner_key(user_id)]
+            self._unlock_owner(user_id)
+
+    async def expire_games(self):
+        now = time.monotonic()
+        for key in [key for key, (_, expires_at) in self.values.items()
+                    if expires_at is not None and expires_at <= now]:
+            del self.values[key]
+        for user_id in list(self.owner_files):
+            if self._get(_owner_key(user_id)) is None:
+                self._unlock_owner(user_id)
+        if self.games_dir:
+            deadline = time.time() - GAME_TTL
+            with os.scandir(self.games_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".bin") and entry.stat().st_mtime <= deadline:
+                        os.unlink(entry.path)
+        if self.shared:
+            # Просьбы к умершим владельцам никто не заберет
+            with os.scandir(self._handovers_dir) as entries:
+                for entry in entries:
+                    if entry.stat().st_mtime <= deadline:
+                        os.unlink(entry.path)
+
+    # --- Лидерборд: рекорды в списке, упорядоченном по (-рекорд, -user_id) ---
+
+    def _leaderboard_set(self, user_id: int, username: str, score: int, waves: int):
+        previous = self.leaderboard_scores.get(user_id)
+        if previous is not None:
+            del self.leaderboard_ranked[bisect.bisect_left(self.leaderboard_ranked, (-previous, -user_id))]
+        self.leaderboard_scores[user_id] = score
+        bisect.insort(self.leaderboard_ranked, (-score, -user_id))
+        self.leaderboard_waves[user_id] = waves
+        self.leaderboard_names[user_id] = username
+
+    async def update_leaderboard(self, rows: Iterable[LeaderboardRow]):
+        for user_id, username, score, waves in rows:
+            score = max(score, self.leaderboard_scores.get(user_id, score))
+            waves = max(waves, self.leaderboard_waves.get(user_id, waves))
+            self._leaderboard_set(user_id, username, score, waves)
+
+    async def replace_leaderboard(self, rows: Iterable[LeaderboardRow], chunk_size: int = 1000):
+        self.leaderboard_scores, self.leaderboard_ranked = {}, []
+        self.leaderboard_waves, self.leaderboard_names = {}, {}
+        for user_id, username, score, waves in rows:
+            self._leaderboard_set(user_id, username, score, waves)
+
+    async def get_leaderboard_page(self, skip: int, limit: int) -> List[LeaderboardRow]:
+        return [(-negative_id, self.leaderboard_names[-negative_id], -negative_score,
+                 self.leaderboard_waves[-negative_id])
+                for negative_score, negative_id in self.leaderboard_ranked[skip:skip + max(0, limit)]]
+
+    async def get_leaderboard_rank(self, user_id: int) -> Optional[int]:
+        score = self.leaderboard_scores.get(user_id)
+        if score is None:
+            return None
+        return bisect.bisect_left(self.leaderboard_ranked, (-score, -user_id)) + 1
+
+    async def get_leaderboard_size(self) -> int:
+        return len(self.leaderboard_scores)
+
 
-    async def get_leaderboard_cache(self) -> dict:
-        data = await self.redis.get("leaderboard:cache")
-        return json.loads(data) if data else None
+def create_redis_client() -> RedisClient:
+    """Настоящий Redis при заданном REDIS_URL, иначе замена в процессе (игры - в GAME_SPILL_DIR, если задана)"""
+    if settings.REDIS_URL:
+        if redis is not None:
+            return RedisClient()
+        print("⚠️ REDIS_URL is set but the redis package is not installed, using in-process store")
+    return LocalRedisClient(settings.GAME_SPILL_DIR)
 
 
 # Создаем глобальный экземпляр
-redis_client = RedisClient()
\ No newline at end of file
+redis_client = create_redis_client()
@@ -0,0 +1,70 @@
+"""
+Пересимуляция завершенной игры по зерну, журналу тиков и журналу действий.
+Игра прогоняется без запросов и ожиданий, поэтому проверка результата в /end дешевая.
+"""
+from typing import Dict, List, Tuple
+from .game_logic import PokemonGameLogic
+
+# Поля результата, которые не зависят от симуляции
+UNVERIFIED_FIELDS = ("game_duration",)
+
+
+def new_game_like(game: PokemonGameLogic) -> PokemonGameLogic:
+    """Новая игра того же движка и с тем же зерном"""
+    if getattr(game, "world", None) is not None:
+        # Отдельный обычный мир, чтобы не шагать чужие игры (результат тика тот же)
+        from .game_world import GameWorld
+        return GameWorld().create_game(game.user_id, seed=game.seed)
+    return type(game)(game.user_id, seed=game.seed)
+
+
+def resimulate(game: PokemonGameLogic, tick_log: List[List], action_log: List[Tuple]) -> PokemonGameLogic:
+    """Воспроизводит игру: действия применяются перед тиком, на котором были записаны"""
+    replay = new_game_like(game)
+    actions = iter(action_log)
+    action = next(actions, None)
+
+    tick = 0
+    for delta_time, count in tick_log:
+        for _ in range(count):
+            while action is not None and action[0] <= tick:
+                _apply(replay, action)
+                action = next(actions, None)
+            replay.update(delta_time)
+            tick += 1
+
+    # Действия после последнего тика
+    while action is not None:
+        _apply(replay, action)
+        action = next(actions, None)
+    return replay
+
+
+def _apply(game: PokemonGameLogic, action: Tuple):
+    _, action_type, data = action
+    try:
+        if action_type == "open_pokeball":
+            game.open_pokeball()
+        elif action_type == "play_card":
+            game.play_card(**data)
+    except (TypeError, ValueError):
+        # Некорректные параметры: в живой игре действие тоже завершилось ошибкой
+        pass
+
+
+def verified_result(game: PokemonGameLogic) -> Dict:
+    """
+    Результат игры, подтвержденный пересимуляцией.
+    При расхождении возвращается результат пересимуляции - именно он начисляется игроку.
+    """
+    result = game.get_game_result()
+    replay = resimulate(game, game.tick_log, game.action_log)
+    expected = replay.get_game_result()
+
+    mismatched = [key for key in expected if key not in UNVERIFIED_FIELDS and expected[key] != result[key]]
+    if mismatched:
+        print(f"⚠️ Game result of user {game.user_id} does not match replay: {', '.join(mismatched)}")
+        for key in UNVERIFIED_FIELDS:
+            expected[key] = result[key]
+        return expected
+    return result
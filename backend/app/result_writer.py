@@ -0,0 +1,296 @@
+"""
+Отложенная запись результатов игр (write-behind).
+
+/game/end и /game/start не пишут результат в БД сами: GameResultWriter дописывает его
+в журнал на диске (с fsync) и в очередь в памяти - после этого результат не потеряется
+даже при падении процесса. Фоновая задача сбрасывает очередь в БД пачками: каждые
+flush_interval секунд или сразу, когда набралось batch_size результатов. Пачка - одна
+транзакция: bulk INSERT сессий и по одному executemany на монеты и лидерборд
+(по строке параметров на игрока, результаты игрока суммируются); после commit итоговые
+строки лидерборда уходят в leaderboard_index.
+
+Журнал - файлы results-*.jsonl в journal_dir, каждый под flock своего процесса.
+Сброс в БД начинает новый сегмент, а записанный удаляет после commit. При старте
+воркер забирает незаблокированные сегменты (остались от упавшего процесса) и
+дописывает их в БД; при остановке очередь сбрасывается. Если процесс упадет между
+commit и удалением сегмента, его результаты запишутся повторно (at-least-once).
+"""
+import asyncio
+import glob
+import json
+import os
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+from . import crud, models, schemas
+from .config import settings
+from .database import AsyncSessionLocal
+from .leaderboard_index import leaderboard_index, leaderboard_rows
+
+try:
+    import fcntl
+except ImportError:  # Windows: без блокировок, журнал читает только этот процесс
+    fcntl = None
+
+JOURNAL_PATTERN = "results-*.jsonl"
+
+# (user_id, поля GameResult)
+Entry = Tuple[int, Dict]
+
+
+class JournalSegment:
+    """Файл журнала под эксклюзивным flock этого процесса"""
+
+    def __init__(self, path: str, file):
+        self.path = path
+        self.file = file
+
+    @classmethod
+    def create(cls, journal_dir: str) -> "JournalSegment":
+        path = os.path.join(journal_dir, f"results-{uuid.uuid4().hex}.jsonl")
+        file = open(path, "ab")
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return cls(path, file)
+
+    @classmethod
+    def claim(cls, path: str) -> Optional["JournalSegment"]:
+        """Сегмент другого процесса, если тот его уже не держит (иначе None)"""
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        if fcntl is not None:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                file.close()
+                return None
+        # Владелец успел записать сегмент в БД и удалить его, пока мы ждали блокировку
+        if os.fstat(file.fileno()).st_nlink == 0:
+            file.close()
+            return None
+        return cls(path, file)
+
+    def append(self, lines: List[bytes]):
+        self.file.write(b"".join(lines))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def read_entries(self) -> List[Entry]:
+        entries = []
+        self.file.seek(0)
+        for line in self.file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Оборванная последняя строка: до fsync запрос не получил ответа
+                continue
+            entries.append((record["user_id"], record["result"]))
+        return entries
+
+    def close(self):
+        self.file.close()
+
+    def remove(self):
+        # Сначала удаляем, потом снимаем блокировку - чтобы сегмент не забрал другой процесс
+        os.unlink(self.path)
+        self.file.close()
+
+
+class GameResultWriter:
+    def __init__(self, session_factory: Callable = AsyncSessionLocal, journal_dir: Optional[str] = None,
+                 batch_size: int = 200, flush_interval: float = 0.5):
+        self.session_factory = session_factory
+        self.journal_dir = journal_dir
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+
+        # Результаты в журнале (или принятые без него), еще не записанные в БД
+        self.pending: List[Entry] = []
+        # Пачка, которая пишется в БД прямо сейчас
+        self.in_flight: List[Entry] = []
+        # Ждут общего fsync: submit() возвращается только после него
+        self.unsynced: List[Entry] = []
+        self.submitted = 0
+        self.synced = 0
+
+        # Текущий сегмент и закрытые сегменты, чьи записи еще в pending
+        self.segment: Optional[JournalSegment] = None
+        self.sealed: List[JournalSegment] = []
+
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self._lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self):
+        # Lock/Event создаются здесь: на Python 3.9 они привязываются к циклу событий
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        if self.journal_dir:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            await run_in_threadpool(self._recover)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            # Не отменяем задачу: она могла начать транзакцию - дожидаемся ее сброса
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        if self.pending:
+            await self.flush()
+        if self.pending:
+            print(f"⚠️ {len(self.pending)} game results left in the journal for the next start")
+        # Сегменты остаются на диске (если в них что-то есть) и снимают блокировку
+        for segment in self.sealed + ([self.segment] if self.segment else []):
+            segment.close()
+        self.sealed, self.segment = [], None
+
+    def _recover(self):
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, JOURNAL_PATTERN))):
+            segment = JournalSegment.claim(path)
+            if segment is None:
+                continue
+            entries = segment.read_entries()
+            if not entries:
+                segment.remove()
+                continue
+            self.pending.extend(entries)
+            self.sealed.append(segment)
+            print(f"✓ Recovered {len(entries)} game results from {path}")
+
+    async def submit(self, user_id: int, result: schemas.GameResult):
+        """Ставит результат в очередь; возвращается, когда он уже в журнале на диске"""
+        entry = (user_id, result.model_dump())
+        if not self.journal_dir:
+            self.pending.append(entry)
+        else:
+            self.submitted += 1
+            sequence = self.submitted
+            self.unsynced.append(entry)
+            async with self._lock:
+                # Пока ждали блокировку, наш результат мог уйти в журнал с чужим fsync
+                if self.synced < sequence:
+                    await self._sync_journal()
+        if len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _sync_journal(self):
+        """Один write + fsync на всех, кто успел встать в очередь (вызывается под _lock)"""
+        batch, self.unsynced = self.unsynced, []
+        last = self.submitted
+        lines = [json.dumps({"user_id": user_id, "result": result}).encode() + b"\n"
+                 for user_id, result in batch]
+        try:
+            if self.segment is None:
+                self.segment = await run_in_threadpool(JournalSegment.create, self.journal_dir)
+            await run_in_threadpool(self.segment.append, lines)
+        except OSError as e:
+            # Результаты не теряем: они останутся в памяти до записи в БД
+            print(f"⚠️ Game results journal write failed, keeping {len(batch)} results in memory: {e}")
+        self.synced = last
+        self.pending.extend(batch)
+
+    def pending_coins(self, user_id: int) -> int:
+        """
+        Монеты игрока из результатов, еще не записанных в БД этим процессом. Очередь
+        у каждого воркера своя: результат, принятый другим воркером, попадет в баланс
+        после его сброса в БД (через GAME_RESULTS_FLUSH_INTERVAL секунд)
+        """
+        return sum(result["poke_coins_earned"]
+                   for entries in (self.unsynced, self.pending, self.in_flight)
+                   for uid, result in entries if uid == user_id)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self.pending and not self._stopping:
+                await self.flush()
+
+    async def flush(self):
+        """Записывает все накопленные результаты в БД одной транзакцией"""
+        async with self._lock:
+            batch, self.pending = self.pending, []
+            segments = self.sealed + ([self.segment] if self.segment else [])
+            self.sealed, self.segment = [], None
+        if not batch:
+            self.sealed = segments + self.sealed
+            return
+
+        self.in_flight = batch
+        try:
+            await self._write(batch)
+        except Exception as e:
+            # Повторим на следующем сбросе: записи остаются в очереди и в журнале
+            self.failed_flushes += 1
+            self.pending = batch + self.pending
+            self.sealed = segments + self.sealed
+            print(f"⚠️ Failed to write {len(batch)} game results: {e}")
+            return
+        finally:
+            self.in_flight = []
+
+        self.written += len(batch)
+        self.flushes += 1
+        for segment in segments:
+            try:
+                segment.remove()
+            except OSError as e:
+                print(f"⚠️ Failed to remove game results journal {segment.path}: {e}")
+
+    async def _write(self, batch: List[Entry]):
+        rows = []
+        totals: Dict[int, Dict] = {}
+        for user_id, result in batch:
+            rows.append({"user_id": user_id, **result})
+            params = crud.game_result_params(schemas.GameResult(**result), user_id)
+            user_totals = totals.get(user_id)
+            if user_totals is None:
+                totals[user_id] = params
+            else:
+                user_totals["score"] = max(user_totals["score"], params["score"])
+                for key in ("coins", "waves", "pokemons", "enemies"):
+                    user_totals[key] += params[key]
+
+        async with self.session_factory() as db:
+            connection = await db.connection()
+            await connection.execute(insert(models.GameSession), rows)
+            for statement in crud.game_result_statements(connection.dialect.name):
+                await connection.execute(statement, list(totals.values()))
+            rows = await leaderboard_rows(db, totals.keys()) if leaderboard_index.enabled else []
+            await db.commit()
+        await leaderboard_index.record(rows)
+
+    def stats(self) -> Dict:
+        return {
+            "pending": len(self.pending) + len(self.unsynced),
+            "in_flight": len(self.in_flight),
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "journal_segments": len(self.sealed) + (1 if self.segment else 0),
+        }
+
+
+def create_result_writer() -> GameResultWriter:
+    return GameResultWriter(
+        AsyncSessionLocal,
+        journal_dir=settings.GAME_RESULTS_JOURNAL_DIR or None,
+        batch_size=settings.GAME_RESULTS_BATCH_SIZE,
+        flush_interval=settings.GAME_RESULTS_FLUSH_INTERVAL,
+    )
+
+
+# Один на процесс (HTTP-воркер); запускается и останавливается в main.py
+result_writer = create_result_writer()
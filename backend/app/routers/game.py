@@ -1,139 +1,185 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from .. import schemas, crud, game_logic
-from ..auth import get_current_user
-from ..database import get_db
+import asyncio
+from typing import Dict, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+from .. import schemas
+from ..auth import Principal, get_current_admin_user, get_current_user, get_principal
+from ..game_service import create_game_service
+from ..result_writer import result_writer
+from ..state_codec import JSON_MEDIA_TYPE, MEDIA_TYPE as BINARY_STATE_MEDIA_TYPE
 
 router = APIRouter(prefix="/api/v1/game", tags=["game"])
 
-# ⭐ ВАЖНО: храним активные игры в памяти
-active_games = {}
+# ⭐ ВАЖНО: игры живут в сервисе - в этом процессе или в пуле хостов игр (GAME_HOSTS)
+game_service = create_game_service()
 
 
 @router.post("/start")
-def start_game(
-        current_user: schemas.UserResponse = Depends(get_current_user),
-        db: Session = Depends(get_db)
+async def start_game(
+        current_user: Principal = Depends(get_current_user)
 ):
     """Начало новой игры"""
-    # Завершаем старую игру, если есть
-    if current_user.id in active_games:
+    # Завершаем старую игру, если есть, и создаем новую
+    previous_result = await game_service.start_game(current_user.id)
+    if previous_result is not None:
         try:
-            # Сохраняем результат старой игры
-            game = active_games[current_user.id]
-            result = game.get_game_result()
-            game_result = schemas.GameResult(**result)
-            crud.create_game_session(db, game_result, current_user.id)
-            del active_games[current_user.id]
+            # Сохраняем результат старой игры (в БД его запишет result_writer)
+            game_result = schemas.GameResult(**previous_result)
+            await result_writer.submit(current_user.id, game_result)
         except Exception as e:
             print(f"⚠️ Error ending previous game: {e}")
 
-    # Создаем новую игру
-    game = game_logic.PokemonGameLogic(current_user.id)
-    active_games[current_user.id] = game
-
-    # Сразу обновляем состояние, чтобы появились враги
-    game.update(0)
-
     return {"message": "Game started", "game_id": current_user.id}
 
 
 @router.post("/action")
-def game_action(
+async def game_action(
         action: schemas.GameAction,
-        current_user: schemas.UserResponse = Depends(get_current_user)
+        current_user: Principal = Depends(get_current_user)
 ):
     """Выполнение действия в игре"""
-    if current_user.id not in active_games:
-        raise HTTPException(status_code=404, detail="Game not found")
-
-    game = active_games[current_user.id]
-
-    # ⭐ ВАЖНО: проверяем, не закончилась ли игра
-    if game.game_over:
-        return {"error": "Game is already over"}
-
-    if action.action_type == "open_pokeball":
-        result = game.open_pokeball()
-    elif action.action_type == "play_card":
-        if not action.data:
-            raise HTTPException(status_code=400, detail="Missing card data")
-        # ⭐ ИЗМЕНЕНИЕ: передаем только X координату
-        result = game.play_card(
-            card_id=action.data.get("card_id"),
-            x=action.data.get("x")
-        )
-    else:
-        raise HTTPException(status_code=400, detail="Unknown action type")
+    return await game_service.act(current_user.id, action)
 
-    # Обновляем состояние игры после действия
-    game.update(0.1)
 
-    return result
+@router.post("/actions")
+async def game_actions(
+        batch: schemas.GameActionBatch,
+        current_user: Principal = Depends(get_current_user)
+):
+    """
+    Несколько действий за один запрос: применяются по порядку на одном тике,
+    в ответе - результаты действий и одно состояние (дельта от batch.since)
+    """
+    return await game_service.act_batch(current_user.id, batch)
+
+
+@router.websocket("/ws")
+async def game_socket(websocket: WebSocket):
+    """
+    Живой канал игры: первое сообщение {"type": "auth", "token": ...},
+    дальше сервер шлет кадры состояния каждый тик (дельтами),
+    а клиент шлет действия {"type": "action", "request_id": ..., "action_type": ..., "data": ...}.
+    """
+    await websocket.accept()
+
+    # Авторизация один раз на все соединение
+    try:
+        message = await asyncio.wait_for(websocket.receive_json(), timeout=10)
+        user = await get_principal(message.get("token"))
+        user_id = user.id
+    except (HTTPException, asyncio.TimeoutError, ValueError, AttributeError, WebSocketDisconnect):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    send_lock = asyncio.Lock()
+
+    async def send(frame: Dict):
+        async with send_lock:
+            await websocket.send_json(frame)
+
+    async def push_states():
+        version = None
+        while True:
+            try:
+                state = await game_service.get_state_delta(user_id, version)
+            except HTTPException:
+                # Игры нет (еще не начата или уже завершена)
+                version = None
+            else:
+                if state["version"] != version:
+                    version = state["version"]
+                    await send({"type": "state", "state": state})
+            await game_service.wait_for_tick()
+
+    pusher = asyncio.create_task(push_states())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            request_id = message.get("request_id")
+            try:
+                action = schemas.GameAction(action_type=message.get("action_type"), data=message.get("data"))
+                result = await game_service.act(user_id, action)
+            except HTTPException as e:
+                result = {"error": e.detail}
+            except ValidationError:
+                result = {"error": "Invalid action"}
+            await send({"type": "action_result", "request_id": request_id, "result": result})
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        pusher.cancel()
 
 
 @router.get("/state")
-def get_game_state(
-        current_user: schemas.UserResponse = Depends(get_current_user)
+async def get_game_state(
+        since: Optional[int] = None,
+        accept: Optional[str] = Header(None),
+        current_user: Principal = Depends(get_current_user)
 ):
-    """Получение текущего состояния игры"""
-    if current_user.id not in active_games:
-        raise HTTPException(status_code=404, detail="Game not found")
-
-    game = active_games[current_user.id]
-
-    # Обновляем состояние игры перед возвратом
-    state = game.update(0.1)  # небольшое обновление
-
-    return state
+    """
+    Получение текущего состояния игры.
+    since - последняя версия, известная клиенту: тогда вернутся только изменения
+    (или полный снимок с "delta": false, если эта версия уже недоступна).
+    Accept: application/x-poketd-state - полный снимок в компактном бинарном виде.
+    """
+    if since is not None:
+        return await game_service.get_state_delta(current_user.id, since)
+
+    # Симуляцию двигает серверный цикл - отдаем последний снимок, уже закодированный
+    # для этой версии (повторные чтения и вкладки не кодируют его заново)
+    media_type = BINARY_STATE_MEDIA_TYPE if accept and BINARY_STATE_MEDIA_TYPE in accept else JSON_MEDIA_TYPE
+    content = await game_service.get_state_bytes(current_user.id, media_type)
+    return Response(content=content, media_type=media_type)
 
 
 @router.post("/update")
-def update_game(
-        delta_time: float = 0.016,  # 60 FPS по умолчанию
-        current_user: schemas.UserResponse = Depends(get_current_user)
+async def update_game(
+        delta_time: float = 0.016,  # Игнорируется: шаг задает сервер
+        current_user: Principal = Depends(get_current_user)
 ):
-    """Обновление игрового состояния (для автоматических обновлений)"""
-    if current_user.id not in active_games:
-        raise HTTPException(status_code=404, detail="Game not found")
-
-    game = active_games[current_user.id]
-    state = game.update(delta_time)
-
-    return state
+    """Оставлено для совместимости: возвращает последний снимок без шага симуляции"""
+    content = await game_service.get_state_bytes(current_user.id, JSON_MEDIA_TYPE)
+    return Response(content=content, media_type=JSON_MEDIA_TYPE)
 
 
 @router.post("/end")
-def end_game(
-        current_user: schemas.UserResponse = Depends(get_current_user),
-        db: Session = Depends(get_db)
+async def end_game(
+        current_user: Principal = Depends(get_current_user)
 ):
-    """Завершение игры и сохранение результата"""
-    if current_user.id not in active_games:
-        raise HTTPException(status_code=404, detail="Game not found")
+    """
+    Завершение игры и сохранение результата. Ответ уходит, как только результат
+    записан в журнал result_writer; в БД он попадет со следующей пачкой, поэтому
+    id сессии еще нет и session_id в ответе всегда null
+    """
+    # Игра удаляется из активных сразу, даже если сохранить результат не удастся
+    result = await game_service.end_game(current_user.id)
 
     try:
-        game = active_games[current_user.id]
-        result = game.get_game_result()
-
         # ⭐ ВАЖНО: ВСЕГДА сохраняем результат
         game_result = schemas.GameResult(**result)
-        saved_session = crud.create_game_session(db, game_result, current_user.id)
+        await result_writer.submit(current_user.id, game_result)
 
         print(f"🎮 Game ended for user {current_user.id}. Coins earned: {result['poke_coins_earned']}")
 
-        # Удаляем игру из активных
-        del active_games[current_user.id]
-
         return {
             **result,
-            "session_id": saved_session.id,
+            "session_id": None,
             "message": "Game saved successfully"
         }
 
     except Exception as e:
         print(f"❌ Error saving game result: {e}")
-        # ⭐ ВАЖНО: даже при ошибке удаляем игру из памяти
-        if current_user.id in active_games:
-            del active_games[current_user.id]
-        raise HTTPException(status_code=500, detail=f"Failed to save game result: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to save game result: {str(e)}")
+
+
+@router.get("/admin/metrics")
+async def game_metrics(
+        top: int = 10,
+        current_user: Principal = Depends(get_current_admin_user)
+):
+    """
+    Живые игры, их приблизительный размер (hand/field/enemies/wave_data), максимумы
+    и гистограмма длительности тика. Без хостов игр (GAME_HOSTS=0) - только по
+    процессу воркера, обработавшего запрос (поле pid).
+    """
+    return await game_service.metrics(top=max(0, top))
@@ -1,23 +1,27 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from typing import List
+import math
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Импорты из текущего пакета
-from .. import schemas, crud
-from ..auth import get_current_user
-from ..database import get_db
+from .. import schemas, crud_async
+from ..auth import Principal, get_current_admin_user, get_current_user
+from ..database import get_async_db
+from ..leaderboard_index import leaderboard_index
+from ..result_writer import result_writer
 
 router = APIRouter(prefix="/api/v1/leaderboard", tags=["leaderboard"])
 
 
-@router.get("/", response_model=List[schemas.LeaderboardEntry])
-def get_leaderboard(
-        skip: int = Query(0, ge=0),
-        limit: int = Query(100, ge=1, le=1000),
-        db: Session = Depends(get_db)
-):
-    """Получение лидерборда"""
-    leaderboard = crud.get_leaderboard(db, skip=skip, limit=limit)
+async def _leaderboard_page(db: AsyncSession, skip: int, limit: int) -> List[schemas.LeaderboardEntry]:
+    """Страница из индекса в Redis; без него - ORDER BY по таблице"""
+    if leaderboard_index.ready:
+        try:
+            return await leaderboard_index.page(skip, limit)
+        except Exception as e:
+            print(f"⚠️ Leaderboard index read failed, using SQL: {e}")
+
+    leaderboard = await crud_async.get_leaderboard(db, skip=skip, limit=limit)
 
     # Добавляем ранги
     result = []
@@ -29,14 +33,73 @@ def get_leaderboard(
             "rank": i
         }
         result.append(schemas.LeaderboardEntry(**entry_data))
-
     return result
 
 
+async def _user_rank(db: AsyncSession, user_id: int) -> Optional[int]:
+    if leaderboard_index.ready:
+        try:
+            return await leaderboard_index.user_rank(user_id)
+        except Exception as e:
+            print(f"⚠️ Leaderboard index read failed, using SQL: {e}")
+    return await crud_async.get_user_rank(db, user_id)
+
+
+async def _players_count(db: AsyncSession) -> int:
+    if leaderboard_index.ready:
+        try:
+            return await leaderboard_index.size()
+        except Exception as e:
+            print(f"⚠️ Leaderboard index read failed, using SQL: {e}")
+    return await crud_async.get_leaderboard_size(db)
+
+
+@router.get("/", response_model=List[schemas.LeaderboardEntry])
+async def get_leaderboard(
+        skip: int = Query(0, ge=0),
+        limit: int = Query(100, ge=1, le=1000),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """Получение лидерборда"""
+    return await _leaderboard_page(db, skip, limit)
+
+
+@router.get("/page", response_model=schemas.LeaderboardResponse)
+async def get_leaderboard_page(
+        page: int = Query(1, ge=1),
+        page_size: int = Query(20, ge=1, le=100),
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """Страница лидерборда с местом текущего пользователя"""
+    entries = await _leaderboard_page(db, (page - 1) * page_size, page_size)
+    players = await _players_count(db)
+    return schemas.LeaderboardResponse(
+        entries=entries,
+        user_rank=await _user_rank(db, current_user.id),
+        total_pages=max(1, math.ceil(players / page_size)),
+        current_page=page,
+    )
+
+
+@router.post("/rebuild")
+async def rebuild_leaderboard(
+        current_user: Principal = Depends(get_current_admin_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """Пересборка индекса лидерборда в Redis из таблицы leaderboard"""
+    if not leaderboard_index.enabled:
+        raise HTTPException(status_code=409, detail="Leaderboard index needs REDIS_URL")
+    return {"players": await leaderboard_index.rebuild(db)}
+
+
 @router.get("/my-stats")
-def get_my_stats(
-        current_user: schemas.UserResponse = Depends(get_current_user),
-        db: Session = Depends(get_db)
+async def get_my_stats(
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
 ):
     """Получение статистики текущего пользователя"""
-    return crud.get_user_stats(db, current_user.id)
\ No newline at end of file
+    stats = await crud_async.get_user_stats(db, current_user.id)
+    stats["poke_coins"] += result_writer.pending_coins(current_user.id)
+    stats["user_rank"] = await _user_rank(db, current_user.id)
+    return stats
@@ -1,45 +1,72 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Импорты из текущего пакета
-from .. import schemas, crud
-from ..auth import get_current_user
-from ..database import get_db
+from .. import schemas, crud_async
+from ..auth import Principal, get_current_admin_user, get_current_user
+from ..database import get_async_db
+from ..result_writer import result_writer
 
 router = APIRouter(prefix="/api/v1/users", tags=["users"])
 
 
 @router.get("/me", response_model=schemas.UserResponse)
-def read_users_me(
-        current_user: schemas.UserResponse = Depends(get_current_user),
-        db: Session = Depends(get_db)
+async def read_users_me(
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
 ):
-    # ⭐ НОВОЕ: получаем актуальные монеты из БД
-    user = crud.get_user(db, current_user.id)
-    if user:
-        # Обновляем объект текущего пользователя
-        current_user.poke_coins = user.poke_coins
-    return current_user
+    # ⭐ НОВОЕ: профиль с актуальными монетами из БД (current_user - только id и имя из кэша токенов)
+    user = await crud_async.get_user(db, current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    # Плюс монеты игр, которые этот воркер еще не записал в БД (ORM-объект не меняем)
+    profile = schemas.UserResponse.model_validate(user)
+    profile.poke_coins += result_writer.pending_coins(user.id)
+    return profile
 
 
 @router.get("/coins")
-def get_user_coins(
-        current_user: schemas.UserResponse = Depends(get_current_user),
-        db: Session = Depends(get_db)
+async def get_user_coins(
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
 ):
     """Получение баланса монет пользователя"""
-    user = crud.get_user(db, current_user.id)
+    user = await crud_async.get_user(db, current_user.id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return {"poke_coins": user.poke_coins}
+    return {"poke_coins": user.poke_coins + result_writer.pending_coins(user.id)}
+
+
+@router.put("/me", response_model=schemas.UserResponse)
+async def update_user_profile(
+        user_update: schemas.UserUpdate,
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """Смена имени и email; после смены имени нужен новый токен (вход заново)"""
+    existing = await crud_async.get_user_by_username(db, username=user_update.username)
+    if existing and existing.id != current_user.id:
+        raise HTTPException(status_code=400, detail="Username already registered")
+    existing = await crud_async.get_user_by_email(db, email=user_update.email)
+    if existing and existing.id != current_user.id:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    user = await crud_async.update_user(db, current_user.id, user_update)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
 
-@router.put("/me")
-def update_user_profile(
-        user_update: schemas.UserBase,
-        current_user: schemas.UserResponse = Depends(get_current_user),
-        db: Session = Depends(get_db)
+@router.put("/{user_id}/active", response_model=schemas.UserResponse)
+async def set_user_active(
+        user_id: int,
+        is_active: bool,
+        current_user: Principal = Depends(get_current_admin_user),
+        db: AsyncSession = Depends(get_async_db)
 ):
-    # Реализация обновления профиля
-    return {"message": "Profile update not implemented yet"}
\ No newline at end of file
+    """Блокировка и разблокировка пользователя (только админ)"""
+    user = await crud_async.set_user_active(db, user_id, is_active)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
@@ -3,6 +3,8 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime
 import re
 
+MAX_BATCH_ACTIONS = 32
+
 
 # User schemas
 class UserBase(BaseModel):
@@ -10,17 +12,7 @@ class UserBase(BaseModel):
     email: str
 
 
-class UserCreate(UserBase):
-    password: str = Field(..., min_length=6)
-
-    @validator('password')
-    def validate_password(cls, v):
-        byte_length = len(v.encode('utf-8'))
-        if byte_length > 72:
-            truncated = v.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-            return truncated
-        return v
-
+class UserUpdate(UserBase):
     @validator('username')
     def validate_username(cls, v):
         if len(v) < 3:
@@ -38,6 +30,18 @@ class UserCreate(UserBase):
         return v.lower()
 
 
+class UserCreate(UserUpdate):
+    password: str = Field(..., min_length=6)
+
+    @validator('password')
+    def validate_password(cls, v):
+        byte_length = len(v.encode('utf-8'))
+        if byte_length > 72:
+            truncated = v.encode('utf-8')[:72].decode('utf-8', errors='ignore')
+            return truncated
+        return v
+
+
 class UserLogin(BaseModel):
     username: str
     password: str
@@ -100,6 +104,26 @@ class GameAction(BaseModel):
         return v
 
 
+class TimedGameAction(GameAction):
+    # Версия состояния, которую видел клиент в момент действия (слишком старые отклоняются)
+    client_tick: Optional[int] = None
+
+
+class GameActionBatch(BaseModel):
+    actions: List[TimedGameAction]
+    # Последняя известная клиенту версия: тогда в ответе будет дельта, а не полный снимок
+    since: Optional[int] = None
+
+    @validator('actions')
+    def validate_actions(cls, v):
+        if not 1 <= len(v) <= MAX_BATCH_ACTIONS:
+            raise ValueError(f'Batch must contain from 1 to {MAX_BATCH_ACTIONS} actions')
+        ticks = [action.client_tick for action in v if action.client_tick is not None]
+        if ticks != sorted(ticks):
+            raise ValueError('Actions must be ordered by client_tick')
+        return v
+
+
 class GameResult(BaseModel):
     victory: bool
     score: int = Field(..., ge=0)
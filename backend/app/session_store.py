@@ -0,0 +1,333 @@
+"""
+Хранилище активных игр для нескольких воркеров.
+
+Каждый воркер держит горячие игры в локальном LRU и шагает только те игры, владельцем
+которых он является. Владение и сами игры лежат в Redis (redis_client). Запрос игрока,
+пришедший в другой воркер, не забирает игру сразу: он просит владельца о передаче и ждет,
+пока тот запишет свежий снимок и отпустит игру (владелец разбирает просьбы каждые
+handover_poll_interval секунд). Владение захватывается только через compare-and-set
+от увиденного владельца; если владелец не ответил за handover_timeout (например, процесс
+умер), игра забирается у него с последним записанным снимком. Перед каждым запросом
+к локальной игре воркер сверяет владельца и, если игру забрали, выбрасывает свою копию.
+
+Память воркера ограничена: игры без запросов дольше idle_ttl и игры сверх лимита
+(количество или суммарный размер снимков) выгружаются - последний снимок остается
+в общем хранилище, и игра восстанавливается при следующем запросе игрока.
+
+Перед выгрузкой или передачей игра отцепляется от цикла тиков (уходит из Mapping):
+ее больше не шагают, а действия в очереди цикл отклоняет. Иначе действие, примененное
+во время записи, получило бы "ok", но не попало бы в снимок. Запросы к игре в этом
+воркере ждут конца записи.
+"""
+import asyncio
+import os
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional
+from .game_logic import PokemonGameLogic
+from .redis_client import RedisClient
+
+
+class GameBusyError(RuntimeError):
+    """Игру держит другой воркер и не отдал ее (параллельные запросы игрока в разные воркеры)"""
+
+
+class GameSessionStore(Mapping):
+    """
+    Активные игры: локальный LRU воркера поверх общего хранилища.
+    Как Mapping отдает только игры этого воркера (их шагает GameTickLoop);
+    обработчики запросов получают игру через await load().
+    """
+
+    def __init__(self, client: RedisClient, max_local_games: int = 1000,
+                 write_back_interval: float = 1.0, owner_ttl: int = 30,
+                 max_resident_bytes: Optional[int] = None, idle_ttl: Optional[float] = None,
+                 handover_timeout: float = 2.0, handover_poll_interval: float = 0.05):
+        self.client = client
+        self.max_local_games = max(1, max_local_games)
+        self.max_resident_bytes = max_resident_bytes
+        self.idle_ttl = idle_ttl
+        self.write_back_interval = write_back_interval
+        self.owner_ttl = owner_ttl
+        self.handover_timeout = handover_timeout
+        self.handover_poll_interval = handover_poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        # Порядок - от давно не использованных игр к недавним
+        self.local: "OrderedDict[int, PokemonGameLogic]" = OrderedDict()
+        self.last_access: Dict[int, float] = {}
+        # Размер последнего снимка игры - оценка занимаемой памяти
+        self.sizes: Dict[int, int] = {}
+        self.resident_bytes = 0
+        self.peak_resident_bytes = 0
+        self.evictions = 0
+        self.rehydrations = 0
+        self.handovers = 0
+        # Игры, которые сейчас пишутся в общее хранилище перед выгрузкой (см. _unload)
+        self.unloading: Dict[int, asyncio.Event] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # --- Mapping: локальные игры ---
+
+    def __getitem__(self, user_id: int) -> PokemonGameLogic:
+        return self.local[user_id]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.local)
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    # --- Доступ из обработчиков запросов ---
+
+    async def load(self, user_id: int) -> Optional[PokemonGameLogic]:
+        """Игра игрока: из локального кэша или из общего хранилища (с переходом владения)"""
+        while True:
+            await self._unloaded(user_id)
+            game = self.local.get(user_id)
+            if game is None:
+                break
+            # Дешевая сверка владельца: игру мог забрать другой воркер
+            owner = await self.client.get_game_owner(user_id)
+            if owner is None:
+                # Владение истекло, но игру никто не забрал - наша копия самая свежая
+                owned = await self.client.claim_game(user_id, self.owner, self.owner_ttl)
+            else:
+                owned = owner == self.owner
+            if self.local.get(user_id) is not game:
+                # Пока сверяли, игру начали выгружать или заменили - смотрим заново
+                continue
+            if owned:
+                self._touch(user_id)
+                return game
+            self._drop(user_id)
+            break
+
+        await self._acquire(user_id)
+        snapshot = await self.client.get_game(user_id)
+        if snapshot is None:
+            await self.client.release_game(user_id, self.owner)
+            return None
+
+        # Пока ждали Redis, игру мог загрузить параллельный запрос
+        game = self.local.get(user_id)
+        if game is None:
+            game = PokemonGameLogic.from_snapshot(snapshot)
+            self.rehydrations += 1
+            await self._keep(user_id, game, len(snapshot))
+        else:
+            self._touch(user_id)
+        return game
+
+    async def put(self, user_id: int, game: PokemonGameLogic):
+        """Новая игра: этот воркер становится владельцем"""
+        await self._unloaded(user_id)
+        await self._acquire(user_id)
+        version = game.state_version
+        snapshot = game.to_snapshot()
+        await self.client.set_game(user_id, snapshot)
+        game.mark_clean(version)
+        await self._keep(user_id, game, len(snapshot))
+
+    async def _acquire(self, user_id: int):
+        """
+        Делает этот воркер владельцем игры. Чужого владельца сначала просим записать
+        игру и отпустить ее; захват - compare-and-set от увиденного владельца, чтобы
+        не перебить параллельный захват. Не отпустил за handover_timeout - забираем сами.
+        """
+        deadline = time.monotonic() + self.handover_timeout
+        requested = None
+        while True:
+            owner = await self.client.get_game_owner(user_id)
+            foreign = owner is not None and owner != self.owner
+            expired = time.monotonic() >= deadline
+            if foreign and not expired:
+                if owner != requested:
+                    await self.client.request_handover(user_id, owner, self.owner_ttl)
+                    requested = owner
+                await asyncio.sleep(self.handover_poll_interval)
+                continue
+            if await self.client.claim_game(user_id, self.owner, self.owner_ttl, expected=owner):
+                if foreign:
+                    print(f"⚠️ Owner {owner} did not hand over game {user_id}, taking it over")
+                return
+            if expired:
+                raise GameBusyError(f"Game {user_id} is held by another worker")
+
+    async def remove(self, user_id: int):
+        await self._unloaded(user_id)
+        self._drop(user_id)
+        await self.client.delete_game(user_id)
+        await self.client.release_game(user_id, self.owner)
+
+    async def _keep(self, user_id: int, game: PokemonGameLogic, size: int):
+        self._drop(user_id)
+        self.local[user_id] = game
+        self.last_access[user_id] = time.monotonic()
+        self._set_size(user_id, size)
+        await self._enforce_limits()
+
+    def _touch(self, user_id: int):
+        self.local.move_to_end(user_id)
+        self.last_access[user_id] = time.monotonic()
+
+    def _set_size(self, user_id: int, size: int):
+        self.resident_bytes += size - self.sizes.get(user_id, 0)
+        self.sizes[user_id] = size
+        self.peak_resident_bytes = max(self.peak_resident_bytes, self.resident_bytes)
+
+    def _drop(self, user_id: int):
+        self.local.pop(user_id, None)
+        self.last_access.pop(user_id, None)
+        self.resident_bytes -= self.sizes.pop(user_id, 0)
+
+    # --- Выгрузка из памяти воркера ---
+
+    def _over_budget(self) -> bool:
+        if len(self.local) > self.max_local_games:
+            return True
+        return self.max_resident_bytes is not None and self.resident_bytes > self.max_resident_bytes
+
+    async def _enforce_limits(self):
+        """Выгружает простаивающие игры и давно не использованные игры сверх лимитов"""
+        now = time.monotonic()
+        while self.local:
+            user_id = next(iter(self.local))
+            idle = self.idle_ttl is not None and now - self.last_access[user_id] > self.idle_ttl
+            # Последнюю (только что запрошенную) игру не выгружаем
+            if not idle and (len(self.local) == 1 or not self._over_budget()):
+                break
+            if not await self.evict(user_id):
+                break
+
+    async def evict(self, user_id: int) -> bool:
+        """Сохраняет игру в общее хранилище и освобождает память воркера"""
+        try:
+            await self._unload(user_id)
+        except Exception as e:
+            # Без записи выгружать нельзя - игра бы откатилась; попробуем позже
+            print(f"⚠️ Eviction of game {user_id} failed: {e}")
+            return False
+        self.evictions += 1
+        return True
+
+    async def _unload(self, user_id: int):
+        """
+        Отцепляет игру от цикла тиков, записывает ее и отпускает владение.
+        Снимок берется после отцепления: все примененные к игре действия в нем есть,
+        а действия из очереди цикл тиков отклонит ("Game not found").
+        Если запись не удалась, игра возвращается в цикл, а ошибка пробрасывается.
+        """
+        game = self.local.pop(user_id, None)
+        if game is None:
+            return
+        unloading = self.unloading[user_id] = asyncio.Event()
+        try:
+            version = game.state_version
+            snapshot = game.to_snapshot() if game.dirty else None
+            # Не записалось - игру уже забрал другой воркер, его копия главнее
+            if await self.client.write_back_game(user_id, self.owner, snapshot, self.owner_ttl):
+                game.mark_clean(version)
+                await self.client.release_game(user_id, self.owner)
+        except Exception:
+            self.local[user_id] = game
+            raise
+        else:
+            self._drop(user_id)
+        finally:
+            # Ждущие запросы продолжают, когда владение уже отпущено
+            del self.unloading[user_id]
+            unloading.set()
+
+    async def _unloaded(self, user_id: int):
+        """Ждет, пока игра пишется в общее хранилище перед выгрузкой"""
+        while user_id in self.unloading:
+            await self.unloading[user_id].wait()
+
+    # --- Передача игр другим воркерам ---
+
+    async def hand_over(self):
+        """Записывает и отпускает игры, которые просят другие воркеры"""
+        for user_id in await self.client.take_handover_requests(self.owner):
+            if user_id not in self.local:
+                # Копии в памяти нет - отпускаем сразу (если ее не выгружают прямо сейчас)
+                if user_id not in self.unloading:
+                    await self.client.release_game(user_id, self.owner)
+                continue
+            try:
+                await self._unload(user_id)
+            except Exception as e:
+                # Не отпускаем несохраненную игру: запросивший заберет ее сам по таймауту
+                print(f"⚠️ Handover of game {user_id} failed: {e}")
+                continue
+            self.handovers += 1
+
+    # --- Запись обратно в общее хранилище ---
+
+    async def _write_back(self, user_id: int):
+        game = self.local.get(user_id)
+        if game is None:
+            return
+        # Неизмененная игра не пишется заново - только продлевается владение
+        version = game.state_version
+        snapshot = game.to_snapshot() if game.dirty else None
+        if await self.client.write_back_game(user_id, self.owner, snapshot, self.owner_ttl):
+            game.mark_clean(version)
+            if snapshot is not None and self.local.get(user_id) is game:
+                self._set_size(user_id, len(snapshot))
+        elif self.local.get(user_id) is game:
+            # Игру забрал другой воркер - его копия главнее
+            self._drop(user_id)
+
+    async def flush(self):
+        """Записывает измененные игры, продлевает владение остальными и выгружает лишние"""
+        for user_id in list(self.local):
+            try:
+                await self._write_back(user_id)
+            except Exception as e:
+                print(f"⚠️ Write-back failed for game {user_id}: {e}")
+        await self._enforce_limits()
+        await self.client.expire_games()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запуск периодической записи в текущем event loop"""
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Последняя запись и отказ от владения (при выключении воркера)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for user_id in list(self.local):
+            try:
+                await self._write_back(user_id)
+            except Exception as e:
+                print(f"⚠️ Write-back failed for game {user_id}: {e}")
+            await self.client.release_game(user_id, self.owner)
+            self._drop(user_id)
+
+    async def _run(self):
+        # Просьбы о передаче разбираются чаще периодической записи: их ждет запрос игрока
+        next_flush = time.monotonic() + self.write_back_interval
+        while True:
+            await asyncio.sleep(min(self.handover_poll_interval, self.write_back_interval))
+            try:
+                await self.hand_over()
+            except Exception as e:
+                print(f"⚠️ Game handover failed: {e}")
+            if time.monotonic() >= next_flush:
+                await self.flush()
+                next_flush = time.monotonic() + self.write_back_interval
@@ -0,0 +1,77 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+Cell = Tuple[int, int]
+
+
+class EnemyGrid:
+    """
+    Равномерная сетка по игровому полю для поиска врагов в радиусе атаки.
+    Запрос в радиусе R проверяет только ячейки, пересекающие квадрат 2R x 2R.
+    """
+
+    def __init__(self, width: int = 800, height: int = 600, cell_size: int = 120):
+        self.cell_size = cell_size
+        self.max_col = width // cell_size
+        self.max_row = height // cell_size
+        self.cells: Dict[Cell, List[Any]] = {}
+        # id(враг) -> ячейка, в которой он сейчас лежит
+        self._cell_of: Dict[int, Cell] = {}
+
+    def __len__(self):
+        return len(self._cell_of)
+
+    def _cell(self, x: float, y: float) -> Cell:
+        col = min(max(int(x // self.cell_size), 0), self.max_col)
+        row = min(max(int(y // self.cell_size), 0), self.max_row)
+        return col, row
+
+    def insert(self, enemy):
+        cell = self._cell(enemy.x, enemy.y)
+        self.cells.setdefault(cell, []).append(enemy)
+        self._cell_of[id(enemy)] = cell
+
+    def remove(self, enemy):
+        cell = self._cell_of.pop(id(enemy), None)
+        if cell is None:
+            return
+        bucket = self.cells[cell]
+        bucket.remove(enemy)
+        if not bucket:
+            del self.cells[cell]
+
+    def move(self, enemy):
+        """Переносит врага в новую ячейку, если он пересек границу"""
+        old_cell = self._cell_of.get(id(enemy))
+        new_cell = self._cell(enemy.x, enemy.y)
+        if old_cell == new_cell:
+            return
+        if old_cell is not None:
+            self.remove(enemy)
+        self.cells.setdefault(new_cell, []).append(enemy)
+        self._cell_of[id(enemy)] = new_cell
+
+    def clear(self):
+        self.cells.clear()
+        self._cell_of.clear()
+
+    def nearest(self, x: float, y: float, radius: float) -> Tuple[Optional[Any], float]:
+        """Ближайший враг строго ближе radius и расстояние до него"""
+        min_col, min_row = self._cell(x - radius, y - radius)
+        max_col, max_row = self._cell(x + radius, y + radius)
+
+        nearest_enemy = None
+        nearest_sq = radius * radius
+
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                for enemy in self.cells.get((col, row), ()):
+                    dx = x - enemy.x
+                    dy = y - enemy.y
+                    distance_sq = dx * dx + dy * dy
+                    if distance_sq < nearest_sq:
+                        nearest_enemy = enemy
+                        nearest_sq = distance_sq
+
+        if nearest_enemy is None:
+            return None, float('inf')
+        return nearest_enemy, nearest_sq ** 0.5
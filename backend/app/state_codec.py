@@ -0,0 +1,164 @@
+"""
+Компактное бинарное кодирование состояния игры (application/x-poketd-state).
+
+Формат (little-endian):
+    заголовок   "PTD" + версия формата (u8)
+    строки      u16 количество, затем u8 длина + utf-8 байты
+                (имена покемонов и стихии, на них ссылаются индексы u16)
+    скаляры     version f64, 10 x i32 (см. SCALARS), флаги u8 (game_over, victory)
+    hand        u16 количество, затем записи CARD
+    field       u16 количество, затем записи CARD + FIELD
+    enemies     u16 количество, затем записи CARD + ENEMY
+
+Декодер для браузера - decodeBinaryState в frontend/static/js/game.js.
+"""
+import json
+import struct
+from typing import Callable, Dict, List, Tuple
+
+MEDIA_TYPE = "application/x-poketd-state"
+JSON_MEDIA_TYPE = "application/json"
+MAGIC = b"PTD"
+FORMAT_VERSION = 1
+
+SCALARS = ("player_health", "player_level", "player_exp", "player_max_exp", "pokeballs",
+           "poke_coins", "wave", "score", "player_base_y", "enemy_base_y")
+
+_HEADER = struct.Struct("<3sB")
+_COUNT = struct.Struct("<H")
+_SCALARS = struct.Struct("<d10iB")
+# uid, id, имя, стихия, health, attack, speed
+_CARD = struct.Struct("<IiHHiif")
+# x, y, current_health, max_health, attack_cooldown, флаги, target, attack_range, base_damage_timer
+_FIELD = struct.Struct("<fffifBiff")
+# x, y, current_health
+_ENEMY = struct.Struct("<fff")
+
+_FLAG_MOVING = 1
+_FLAG_REACHED_BASE = 2
+_FLAG_HAS_TARGET = 4
+
+
+class StringTable:
+    """Таблица строк: каждая строка пишется один раз, дальше на нее ссылается индекс u16"""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+
+    def __call__(self, value: str) -> int:
+        index = self.index.get(value)
+        if index is None:
+            index = self.index[value] = len(self.index)
+        return index
+
+    def pack(self) -> bytes:
+        parts = [_COUNT.pack(len(self.index))]
+        for value in self.index:
+            encoded = value.encode("utf-8")
+            parts.append(bytes([len(encoded)]) + encoded)
+        return b"".join(parts)
+
+
+def unpack_strings(data: bytes, offset: int) -> Tuple[List[str], int]:
+    """Читает таблицу строк, возвращает строки и смещение после нее"""
+    (count,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    strings: List[str] = []
+    for _ in range(count):
+        length = data[offset]
+        strings.append(data[offset + 1:offset + 1 + length].decode("utf-8"))
+        offset += 1 + length
+    return strings, offset
+
+
+def encode_state(state: Dict) -> bytes:
+    """Кодирует результат get_state() в бинарный формат"""
+    intern = StringTable()
+
+    def card(entity: Dict) -> bytes:
+        return _CARD.pack(entity["uid"], entity["id"], intern(entity["name"]), intern(entity["element"]),
+                          int(entity["health"]), int(entity["attack"]), entity["speed"])
+
+    hand = [card(entity) for entity in state["hand"]]
+
+    field = []
+    for pokemon in state["field"]:
+        flags = ((_FLAG_MOVING if pokemon["is_moving"] else 0)
+                 | (_FLAG_REACHED_BASE if pokemon["reached_enemy_base"] else 0)
+                 | (_FLAG_HAS_TARGET if pokemon["target"] is not None else 0))
+        field.append(card(pokemon) + _FIELD.pack(
+            pokemon["x"], pokemon["y"], pokemon["current_health"], int(pokemon["max_health"]),
+            pokemon["attack_cooldown"], flags, pokemon["target"] or 0,
+            pokemon["attack_range"], pokemon["base_damage_timer"]))
+
+    enemies = [card(enemy) + _ENEMY.pack(enemy["x"], enemy["y"], enemy["current_health"])
+               for enemy in state["enemies"]]
+
+    flags = (1 if state["game_over"] else 0) | (2 if state["victory"] else 0)
+    parts = [
+        _HEADER.pack(MAGIC, FORMAT_VERSION),
+        intern.pack(),
+        _SCALARS.pack(float(state.get("version", 0)), *(int(state[name]) for name in SCALARS), flags),
+    ]
+    for records in (hand, field, enemies):
+        parts.append(_COUNT.pack(len(records)))
+        parts.extend(records)
+    return b"".join(parts)
+
+
+def encode_state_json(state: Dict) -> bytes:
+    """JSON тех же байтов, что отдал бы JSONResponse FastAPI"""
+    return json.dumps(state, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+# Кодировщики ответа /state по media type
+STATE_ENCODERS: Dict[str, Callable[[Dict], bytes]] = {
+    JSON_MEDIA_TYPE: encode_state_json,
+    MEDIA_TYPE: encode_state,
+}
+
+
+def decode_state(data: bytes) -> Dict:
+    """Обратное преобразование (для проверок и бенчмарков)"""
+    magic, format_version = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        raise ValueError("Unsupported state encoding")
+    strings, offset = unpack_strings(data, _HEADER.size)
+
+    values = _SCALARS.unpack_from(data, offset)
+    offset += _SCALARS.size
+    state = {"version": int(values[0])}
+    state.update(zip(SCALARS, values[1:-1]))
+    state["game_over"] = bool(values[-1] & 1)
+    state["victory"] = bool(values[-1] & 2)
+
+    def card(offset: int) -> Dict:
+        uid, id, name, element, health, attack, speed = _CARD.unpack_from(data, offset)
+        return {"uid": uid, "id": id, "name": strings[name], "element": strings[element],
+                "health": health, "attack": attack, "speed": speed}
+
+    for name, extra in (("hand", None), ("field", _FIELD), ("enemies", _ENEMY)):
+        (count,) = _COUNT.unpack_from(data, offset)
+        offset += _COUNT.size
+        entities = []
+        for _ in range(count):
+            entity = card(offset)
+            offset += _CARD.size
+            if extra is _FIELD:
+                (x, y, current_health, max_health, cooldown, flags, target,
+                 attack_range, timer) = _FIELD.unpack_from(data, offset)
+                entity.update({
+                    "x": x, "y": y, "current_health": current_health, "max_health": max_health,
+                    "attack_cooldown": cooldown, "is_moving": bool(flags & _FLAG_MOVING),
+                    "reached_enemy_base": bool(flags & _FLAG_REACHED_BASE),
+                    "target": target if flags & _FLAG_HAS_TARGET else None,
+                    "attack_range": attack_range, "base_damage_timer": timer,
+                })
+            elif extra is _ENEMY:
+                x, y, current_health = _ENEMY.unpack_from(data, offset)
+                entity.update({"x": x, "y": y, "current_health": current_health})
+            if extra is not None:
+                offset += extra.size
+            entities.append(entity)
+        state[name] = entities
+    return state
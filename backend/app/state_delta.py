@@ -0,0 +1,73 @@
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+# Списки сущностей в состоянии игры; сущности различаются по "uid"
+ENTITY_LISTS = ("hand", "field", "enemies")
+
+
+class StateTracker:
+    """
+    Запоминает, в какой версии менялась каждая сущность и каждое скалярное поле,
+    чтобы по последней версии клиента отдать только изменения.
+    Хранит по одному последнему dict на сущность, а не историю снимков.
+    """
+
+    def __init__(self, version: int, removal_log_size: int = 512):
+        self.version = version
+        # Версии старше oldest уже не восстановить - клиенту нужен полный снимок
+        self.oldest = version
+        self.scalars: Dict[str, Tuple[Any, int]] = {}
+        self.entities: Dict[str, Dict[int, Tuple[Dict, int]]] = {name: {} for name in ENTITY_LISTS}
+        self.removed: Deque[Tuple[int, str, int]] = deque()
+        self.removal_log_size = removal_log_size
+
+    def record(self, state: Dict):
+        """Учитывает новый полный снимок состояния (с ключом "version")"""
+        version = state["version"]
+        if version == self.version and self.scalars:
+            return
+        self.version = version
+
+        for key, value in state.items():
+            if key in ENTITY_LISTS:
+                self._record_entities(key, value, version)
+            else:
+                previous = self.scalars.get(key)
+                if previous is None or previous[0] != value:
+                    self.scalars[key] = (value, version)
+
+        # Журнал удалений ограничен: старые версии становятся недоступны для дельт
+        while len(self.removed) > self.removal_log_size:
+            self.oldest = self.removed.popleft()[0]
+
+    def _record_entities(self, name: str, entities, version: int):
+        known = self.entities[name]
+        seen = set()
+        for entity in entities:
+            uid = entity["uid"]
+            seen.add(uid)
+            previous = known.get(uid)
+            if previous is None or previous[0] != entity:
+                known[uid] = (entity, version)
+
+        for uid in [uid for uid in known if uid not in seen]:
+            del known[uid]
+            self.removed.append((version, name, uid))
+
+    def delta(self, since: int) -> Optional[Dict]:
+        """Изменения после версии since или None, если нужен полный снимок"""
+        if since < self.oldest or since > self.version:
+            return None
+
+        delta = {key: value for key, (value, changed) in self.scalars.items() if changed > since}
+        for name in ENTITY_LISTS:
+            delta[name] = {
+                "changed": [entity for entity, changed in self.entities[name].values() if changed > since],
+                "removed": [],
+            }
+        for version, name, uid in self.removed:
+            if version > since:
+                delta[name]["removed"].append(uid)
+
+        delta.update({"version": self.version, "since": since, "delta": True})
+        return delta
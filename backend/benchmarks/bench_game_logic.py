@@ -0,0 +1,154 @@
+"""
+Headless-бенчмарк игровой логики: update, get_state и generate_wave
+на синтетических играх от текущих размеров до сотен покемонов и врагов.
+
+Запуск из папки backend:
+    python benchmarks/bench_game_logic.py --engines python numpy --output bench.json
+    python benchmarks/bench_game_logic.py --compare bench.json
+
+Для каждого движка и размера печатает тики в секунду, мкс на вызов update/get_state,
+пиковые байты и прирост блоков памяти за тик; результаты пишет в JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Добавляем папку backend в путь Python
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.game_logic import create_game, Card, FieldPokemon, Enemy  # noqa: E402
+
+DEFAULT_SIZES = ["2x5", "5x10", "10x10", "50x50", "100x100", "200x200", "500x500"]
+DELTA_TIME = 0.1
+
+
+def build_game(engine: str, field_count: int, enemy_count: int, seed: int = 0):
+    """Игра со стабильной нагрузкой: враги почти не двигаются и не умирают, спавн выключен"""
+    rng = random.Random(seed)
+    game = create_game(user_id=0, engine=engine)
+
+    field = []
+    for i in range(field_count):
+        card = Card(id=1000 + i, name="Pikachu", element="electric", health=10 ** 6, attack=18, speed=2.5,
+                    uid=game.new_uid())
+        field.append(FieldPokemon(card, x=rng.uniform(50, 750), y=rng.uniform(150, 400)))
+
+    enemies = []
+    for i in range(enemy_count):
+        enemy = Enemy(id=i, name="Geodude", element="rock", health=10 ** 9, attack=15, speed=0.5,
+                      uid=game.new_uid())
+        enemy.x, enemy.y = rng.uniform(50, 750), rng.uniform(100, 300)
+        enemies.append(enemy)
+
+    game.field = field
+    game.enemies = enemies
+    game.enemy_grid.clear()
+    for enemy in enemies:
+        game.enemy_grid.insert(enemy)
+    game.wave_data = []
+    return game
+
+
+def time_calls(function, calls: int) -> float:
+    """Среднее время вызова в секундах"""
+    started = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - started) / calls
+
+
+def measure_allocations(game, ticks: int):
+    tracemalloc.start()
+    peaks = []
+    before = tracemalloc.take_snapshot()
+    for _ in range(ticks):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        game.update(DELTA_TIME)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    net_blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return sum(peaks) / ticks, net_blocks / ticks
+
+
+def bench_case(engine: str, field_count: int, enemy_count: int, ticks: int) -> dict:
+    game = build_game(engine, field_count, enemy_count)
+    game.update(DELTA_TIME)  # прогрев
+
+    update_seconds = time_calls(lambda: game.update(DELTA_TIME), ticks)
+    state_seconds = time_calls(game.get_state, ticks)
+    wave_seconds = time_calls(lambda: game.generate_wave(5), ticks)
+
+    peak_bytes, net_blocks = measure_allocations(
+        build_game(engine, field_count, enemy_count), min(ticks, 50))
+
+    return {
+        "engine": engine,
+        "field": field_count,
+        "enemies": enemy_count,
+        "ticks_per_second": 1 / update_seconds,
+        "update_us": update_seconds * 1e6,
+        "get_state_us": state_seconds * 1e6,
+        "generate_wave_us": wave_seconds * 1e6,
+        "alloc_peak_bytes_per_tick": peak_bytes,
+        "alloc_net_blocks_per_tick": net_blocks,
+    }
+
+
+def print_results(results, baseline=None):
+    baseline_by_key = {(r["engine"], r["field"], r["enemies"]): r for r in (baseline or [])}
+    print(f"{'engine':8s} {'size':>9s} {'ticks/s':>10s} {'update us':>10s} {'state us':>10s} "
+          f"{'wave us':>8s} {'peak B':>9s} {'blocks':>7s}")
+    for r in results:
+        size = f"{r['field']}x{r['enemies']}"
+        line = (f"{r['engine']:8s} {size:>9s} {r['ticks_per_second']:10.0f} {r['update_us']:10.1f} "
+                f"{r['get_state_us']:10.1f} {r['generate_wave_us']:8.1f} "
+                f"{r['alloc_peak_bytes_per_tick']:9.0f} {r['alloc_net_blocks_per_tick']:7.1f}")
+        previous = baseline_by_key.get((r["engine"], r["field"], r["enemies"]))
+        if previous:
+            line += f"   update x{r['update_us'] / previous['update_us']:.2f} vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", default=["python"], help="python, numpy, world")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="ПОЛЕxВРАГИ, например 10x10")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    results = []
+    for engine in args.engines:
+        for size in args.sizes:
+            field_count, enemy_count = (int(n) for n in size.lower().split("x"))
+            results.append(bench_case(engine, field_count, enemy_count, args.ticks))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "ticks": args.ticks,
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Масштабирование мирового движка по ядрам: обычный GameWorld в одном процессе
+против SharedGameWorld (GAME_ENGINE=shared) с пулом из 1..N процессов.
+
+Запуск из папки backend:
+    python benchmarks/bench_shared_world.py --games 2000 --size 10x10 --workers 1 2 4 8
+    python benchmarks/bench_shared_world.py --output scaling.json
+
+Для каждого варианта печатает тики в секунду, мс на тик и ускорение относительно
+обычного GameWorld; результаты пишет в JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+# Добавляем папку backend в путь Python
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.game_logic import Card, FieldPokemon, Enemy  # noqa: E402
+from app.game_world import GameWorld  # noqa: E402
+from app.game_world_shared import SharedGameWorld  # noqa: E402
+
+DELTA_TIME = 0.1
+
+
+def populate(world: GameWorld, games: int, field_count: int, enemy_count: int, seed: int = 0):
+    """Игры со стабильной нагрузкой, как в bench_game_logic: враги живучие, спавн выключен"""
+    rng = random.Random(seed)
+    views = []
+    for user_id in range(games):
+        game = world.create_game(user_id, seed=user_id)
+        field = []
+        for i in range(field_count):
+            card = Card(id=1000 + i, name="Pikachu", element="electric", health=10 ** 6, attack=18, speed=2.5,
+                        uid=game.new_uid())
+            field.append(FieldPokemon(card, x=rng.uniform(50, 750), y=rng.uniform(150, 400)))
+        enemies = []
+        for i in range(enemy_count):
+            enemy = Enemy(id=i, name="Geodude", element="rock", health=10 ** 9, attack=15, speed=0.5,
+                          uid=game.new_uid())
+            enemy.x, enemy.y = rng.uniform(50, 750), rng.uniform(100, 300)
+            enemies.append(enemy)
+        game.field = field
+        game.enemies = enemies
+        game.wave_data = []
+        views.append(game)
+    # Представления нужно держать: иначе слоты игр освободятся
+    return views
+
+
+def time_ticks(world: GameWorld, ticks: int) -> float:
+    """Среднее время тика мира в секундах"""
+    world.step(DELTA_TIME)  # прогрев (и подключение пула к общей памяти)
+    started = time.perf_counter()
+    for _ in range(ticks):
+        world.step(DELTA_TIME)
+    return (time.perf_counter() - started) / ticks
+
+
+def bench_case(label: str, world: GameWorld, games: int, field_count: int, enemy_count: int,
+               ticks: int) -> dict:
+    views = populate(world, games, field_count, enemy_count)
+    seconds = time_ticks(world, ticks)
+    del views
+    return {
+        "engine": label,
+        "games": games,
+        "field": field_count,
+        "enemies": enemy_count,
+        "ticks_per_second": 1 / seconds,
+        "tick_ms": seconds * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--size", default="10x10", help="ПОЛЕxВРАГИ на игру")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}), help="Размеры пула")
+    parser.add_argument("--ticks", type=int, default=50)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    field_count, enemy_count = (int(n) for n in args.size.lower().split("x"))
+    results = [bench_case("world", GameWorld(), args.games, field_count, enemy_count, args.ticks)]
+    for workers in args.workers:
+        world = SharedGameWorld(workers=workers, min_rows_per_worker=1)
+        try:
+            results.append(bench_case(f"shared/{workers}", world, args.games, field_count, enemy_count,
+                                      args.ticks))
+        finally:
+            world.close()
+
+    baseline = results[0]["tick_ms"]
+    print(f"{'engine':10s} {'games':>7s} {'size':>7s} {'ticks/s':>9s} {'tick ms':>9s} {'speedup':>8s}")
+    for r in results:
+        size = f"{r['field']}x{r['enemies']}"
+        print(f"{r['engine']:10s} {r['games']:7d} {size:>7s} {r['ticks_per_second']:9.1f} "
+              f"{r['tick_ms']:9.2f} {baseline / r['tick_ms']:7.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "ticks": args.ticks,
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
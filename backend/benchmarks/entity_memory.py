@@ -0,0 +1,93 @@
+"""
+Сравнение памяти: сущности на __slots__ против прежних dict на каждую сущность.
+
+Запуск из папки backend:
+    python benchmarks/entity_memory.py --games 1000 --field 10 --enemies 10
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+# Добавляем папку backend в путь Python
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.game_logic import PokemonGameLogic, Card, FieldPokemon  # noqa: E402
+
+
+def build_game(field_count: int, enemy_count: int) -> PokemonGameLogic:
+    game = PokemonGameLogic(user_id=0)
+    for i in range(field_count):
+        card = Card(id=1000 + i, name="Pikachu", element="electric", health=45, attack=18, speed=2.5)
+        game.field.append(FieldPokemon(card, x=50 + i * 70, y=400))
+    for i in range(enemy_count):
+        enemy = game.generate_wave(5)[0]
+        enemy.x, enemy.y = 50 + i * 70, 100 + i
+        game.enemies.append(enemy)
+    return game
+
+
+def as_dicts(game: PokemonGameLogic) -> dict:
+    """Прежнее представление: по dict на каждую сущность"""
+    return {
+        "hand": [card.to_dict() for card in game.hand],
+        "field": [pokemon.to_dict() for pokemon in game.field],
+        "enemies": [enemy.to_dict() for enemy in game.enemies],
+        "wave_data": [enemy.to_dict() for enemy in game.wave_data],
+    }
+
+
+def as_slots(game: PokemonGameLogic) -> dict:
+    """Текущее представление: объекты с __slots__ (копии тех же сущностей)"""
+    def copy_card(card):
+        return Card(card.id, card.name, card.element, card.health, card.attack, card.speed)
+
+    def copy_pokemon(pokemon):
+        clone = FieldPokemon(copy_card(pokemon), pokemon.x, pokemon.y, pokemon.attack_range)
+        clone.current_health = pokemon.current_health
+        return clone
+
+    def copy_enemy(enemy):
+        clone = type(enemy)(enemy.id, enemy.name, enemy.element, enemy.health, enemy.attack, enemy.speed)
+        clone.x, clone.y = enemy.x, enemy.y
+        return clone
+
+    return {
+        "hand": [copy_card(card) for card in game.hand],
+        "field": [copy_pokemon(pokemon) for pokemon in game.field],
+        "enemies": [copy_enemy(enemy) for enemy in game.enemies],
+        "wave_data": [copy_enemy(enemy) for enemy in game.wave_data],
+    }
+
+
+def measure(build, games) -> int:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [build(game) for game in games]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del kept
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--field", type=int, default=10)
+    parser.add_argument("--enemies", type=int, default=10)
+    args = parser.parse_args()
+
+    games = [build_game(args.field, args.enemies) for _ in range(args.games)]
+
+    dict_bytes = measure(as_dicts, games)
+    slots_bytes = measure(as_slots, games)
+
+    print(f"Games: {args.games}, field: {args.field}, enemies: {args.enemies}")
+    print(f"  dict entities:  {dict_bytes / args.games:10.0f} bytes/game")
+    print(f"  slots entities: {slots_bytes / args.games:10.0f} bytes/game")
+    print(f"  saving:         {100 * (1 - slots_bytes / dict_bytes):9.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Нагрузочный и soak-тест всего стека без сети: приложение запускается в этом же
+процессе, запросы идут через httpx.ASGITransport.
+
+Сначала регистрируется пул пользователей, затем --players игроков одновременно
+повторяют путь браузера (lobby.js + game.js без WebSocket):
+    логин -> лобби (/users/me, /leaderboard/my-stats x2, /leaderboard/) -> /game/start
+    -> бинарный /game/state -> опрос /game/state?since=... раз в секунду и действия
+    игрока -> /game/end -> /users/coins -> снова лобби
+
+Запуск из папки backend (на отдельной базе - тест пишет пользователей и игры):
+    DATABASE_URL=sqlite:///./load.db python benchmarks/load_test.py --players 1000 --duration 300
+    python benchmarks/load_test.py --players 50 --duration 30 --single-actions --output load.json
+
+Печатает по каждому маршруту число запросов, запросы в секунду, p50/p95/p99 и долю
+ошибок, а также RSS процесса и число живых игр во времени; все пишет в JSON.
+Хосты игр (GAME_HOSTS > 0) этот тест не запускает - при них нужен запущенный gunicorn.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import resource
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+# Добавляем папку backend в путь Python
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.game_logic import game_metrics  # noqa: E402
+from app.main import app  # noqa: E402
+from app.state_codec import MEDIA_TYPE as BINARY_STATE_MEDIA_TYPE, decode_state  # noqa: E402
+
+API = "/api/v1"
+PASSWORD = "load-test-password"
+# Сколько исключений печатать (дальше только считаются)
+MAX_PRINTED_ERRORS = 20
+
+
+def rss_bytes() -> int:
+    """Текущий RSS процесса (на Linux), иначе пиковый"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Ближайший ранг
+    index = min(len(sorted_values), max(1, math.ceil(fraction * len(sorted_values)))) - 1
+    return sorted_values[index]
+
+
+class Stats:
+    """Задержки и ошибки по маршрутам"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, route: str, seconds: float, status: Optional[int]):
+        self.latencies[route].append(seconds)
+        if status is None or status >= 400:
+            self.errors[route] += 1
+        self.statuses[route][status or 0] += 1
+
+    def report(self, elapsed: float) -> List[Dict]:
+        rows = []
+        for route in sorted(self.latencies):
+            values = sorted(self.latencies[route])
+            rows.append({
+                "route": route,
+                "requests": len(values),
+                "rps": len(values) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(values, 0.50) * 1e3,
+                "p95_ms": percentile(values, 0.95) * 1e3,
+                "p99_ms": percentile(values, 0.99) * 1e3,
+                "errors": self.errors[route],
+                "error_rate": self.errors[route] / len(values),
+                "statuses": dict(self.statuses[route]),
+            })
+        return rows
+
+
+class Player:
+    """Один игрок: логин, лобби и игры подряд до конца теста"""
+
+    def __init__(self, client: httpx.AsyncClient, stats: Stats, username: str, args, rng: random.Random):
+        self.client = client
+        self.stats = stats
+        self.username = username
+        self.args = args
+        self.rng = rng
+        self.headers: Dict[str, str] = {}
+        self.state: Dict = {}
+        self.hand: Dict[int, Dict] = {}
+        self.version: Optional[int] = None
+
+    async def request(self, route: str, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        kwargs.setdefault("headers", self.headers)
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, API + path, **kwargs)
+        except Exception as e:
+            self.stats.record(route, time.perf_counter() - started, None)
+            if sum(self.stats.errors.values()) <= MAX_PRINTED_ERRORS:
+                print(f"⚠️ {route}: {e}")
+            return None
+        self.stats.record(route, time.perf_counter() - started, response.status_code)
+        return response
+
+    async def login(self) -> bool:
+        response = await self.request("POST /auth/login", "POST", "/auth/login",
+                                      data={"username": self.username, "password": PASSWORD})
+        if response is None or response.status_code != 200:
+            return False
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return True
+
+    async def lobby(self):
+        await self.request("GET /users/me", "GET", "/users/me")
+        # loadStats и loadRecentGames читают одну и ту же статистику
+        await self.request("GET /leaderboard/my-stats", "GET", "/leaderboard/my-stats")
+        await self.request("GET /leaderboard/my-stats", "GET", "/leaderboard/my-stats")
+        await self.request("GET /leaderboard/", "GET", "/leaderboard/")
+
+    def apply_state(self, state: Dict):
+        if not state.get("delta"):
+            self.state = state
+            self.hand = {card["uid"]: card for card in state.get("hand", [])}
+            self.version = state.get("version")
+            return
+        if state.get("since") != self.version:
+            self.version = None
+            return
+        for key, value in state.items():
+            if key == "hand":
+                for uid in value["removed"]:
+                    self.hand.pop(uid, None)
+                for card in value["changed"]:
+                    self.hand[card["uid"]] = card
+            elif key not in ("field", "enemies", "delta", "since"):
+                self.state[key] = value
+        self.version = state["version"]
+
+    async def load_state(self):
+        if self.version is None:
+            response = await self.request("GET /game/state (binary)", "GET", "/game/state",
+                                          headers={**self.headers, "Accept": BINARY_STATE_MEDIA_TYPE})
+            if response is not None and response.status_code == 200:
+                self.apply_state(decode_state(response.content))
+        else:
+            response = await self.request("GET /game/state?since", "GET", "/game/state",
+                                          params={"since": self.version})
+            if response is not None and response.status_code == 200:
+                self.apply_state(response.json())
+
+    def choose_actions(self) -> List[Dict]:
+        actions = []
+        pokeballs = self.state.get("pokeballs", 0)
+        hand = list(self.hand.values())
+        # Всплеск действий, как при быстрых кликах: открыть покебол и выставить карты
+        for _ in range(self.rng.randint(1, self.args.max_burst)):
+            if pokeballs > 0 and (not hand or self.rng.random() < 0.5):
+                actions.append({"action_type": "open_pokeball", "client_tick": self.version})
+                pokeballs -= 1
+            elif hand:
+                card = hand.pop(self.rng.randrange(len(hand)))
+                actions.append({"action_type": "play_card", "client_tick": self.version,
+                                "data": {"card_id": card["id"], "x": self.rng.randint(50, 750)}})
+        return actions
+
+    async def act(self):
+        actions = self.choose_actions()
+        if not actions:
+            return
+        if self.args.single_actions:
+            for action in actions:
+                action.pop("client_tick")
+                await self.request("POST /game/action", "POST", "/game/action", json=action)
+            return
+        response = await self.request("POST /game/actions", "POST", "/game/actions",
+                                      json={"actions": actions, "since": self.version})
+        if response is not None and response.status_code == 200:
+            self.apply_state(response.json()["state"])
+
+    async def play(self, deadline: float):
+        response = await self.request("POST /game/start", "POST", "/game/start", json={})
+        if response is None or response.status_code != 200:
+            return
+        self.state, self.hand, self.version = {}, {}, None
+        game_ends = time.monotonic() + self.rng.expovariate(1 / self.args.game_seconds)
+
+        next_poll = time.monotonic()
+        next_action = next_poll + self.rng.expovariate(1 / self.args.action_interval)
+        while time.monotonic() < min(game_ends, deadline) and not self.state.get("game_over"):
+            now = time.monotonic()
+            if now >= next_poll:
+                await self.load_state()
+                next_poll = now + self.args.poll_interval
+            if now >= next_action:
+                await self.act()
+                next_action = now + self.rng.expovariate(1 / self.args.action_interval)
+            await asyncio.sleep(max(0.0, min(next_poll, next_action) - time.monotonic()))
+
+        await self.request("POST /game/end", "POST", "/game/end", json={})
+        await self.request("GET /users/coins", "GET", "/users/coins")
+
+    async def run(self, start_delay: float, deadline: float):
+        await asyncio.sleep(start_delay)
+        if not await self.login():
+            return
+        while time.monotonic() < deadline:
+            await self.lobby()
+            await self.play(deadline)
+
+
+async def register_users(client: httpx.AsyncClient, usernames: List[str], concurrency: int):
+    """Регистрирует недостающих пользователей (повторный прогон их переиспользует)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def register(username: str):
+        nonlocal failures
+        async with semaphore:
+            response = await client.post(f"{API}/auth/register", json={
+                "username": username, "email": f"{username}@loadtest.example.com", "password": PASSWORD})
+            if response.status_code != 200 and "already" not in response.text:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(register(username) for username in usernames))
+    print(f"Registered {len(usernames)} users in {time.perf_counter() - started:.1f}s ({failures} failed)")
+
+
+async def sample_memory(samples: List[Dict], started: float, interval: float):
+    while True:
+        samples.append({
+            "t": round(time.monotonic() - started, 1),
+            "rss_mb": rss_bytes() / 2 ** 20,
+            "live_games": len(game_metrics.games),
+        })
+        await asyncio.sleep(interval)
+
+
+async def run(args) -> Dict:
+    rng = random.Random(args.seed)
+    usernames = [f"{args.prefix}{i}" for i in range(max(args.users, args.players))]
+
+    await app.router.startup()
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest",
+                                     timeout=args.timeout) as client:
+            await register_users(client, usernames, args.register_concurrency)
+
+            stats = Stats()
+            samples: List[Dict] = []
+            started = time.monotonic()
+            deadline = started + args.ramp_up + args.duration
+            sampler = asyncio.create_task(sample_memory(samples, started, args.sample_interval))
+            players = [Player(client, stats, usernames[i % len(usernames)], args, random.Random(rng.random()))
+                       for i in range(args.players)]
+            await asyncio.gather(*(player.run(args.ramp_up * i / args.players, deadline)
+                                   for i, player in enumerate(players)))
+            elapsed = time.monotonic() - started
+            sampler.cancel()
+    finally:
+        await app.router.shutdown()
+
+    routes = stats.report(elapsed)
+    total = sum(row["requests"] for row in routes)
+    errors = sum(row["errors"] for row in routes)
+    return {
+        "elapsed": elapsed,
+        "requests": total,
+        "rps": total / elapsed,
+        "error_rate": errors / total if total else 0.0,
+        "peak_live_games": game_metrics.peak_games,
+        "routes": routes,
+        "memory": samples,
+    }
+
+
+def print_report(report: Dict):
+    print(f"{'route':28s} {'requests':>9s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} "
+          f"{'errors':>7s}")
+    for r in report["routes"]:
+        print(f"{r['route']:28s} {r['requests']:9d} {r['rps']:8.1f} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} "
+              f"{r['p99_ms']:8.1f} {r['error_rate'] * 100:6.2f}%")
+    print(f"\nTotal: {report['requests']} requests in {report['elapsed']:.1f}s "
+          f"({report['rps']:.1f} req/s), errors {report['error_rate'] * 100:.2f}%, "
+          f"peak live games {report['peak_live_games']}")
+
+    memory = report["memory"]
+    if memory:
+        step = max(1, len(memory) // 10)
+        print("\n     t   RSS MB   games")
+        for sample in memory[::step] + ([memory[-1]] if (len(memory) - 1) % step else []):
+            print(f"{sample['t']:6.0f} {sample['rss_mb']:8.1f} {sample['live_games']:7d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=100, help="Одновременных игроков")
+    parser.add_argument("--users", type=int, default=0, help="Размер пула пользователей (не меньше --players)")
+    parser.add_argument("--prefix", default="loadtest_", help="Префикс имен пользователей")
+    parser.add_argument("--duration", type=float, default=60, help="Длительность после разгона, секунды")
+    parser.add_argument("--ramp-up", type=float, default=10, help="За сколько секунд подключаются все игроки")
+    parser.add_argument("--game-seconds", type=float, default=60, help="Средняя длина игры")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Опрос состояния (как game.js)")
+    parser.add_argument("--action-interval", type=float, default=3.0, help="Среднее время между действиями")
+    parser.add_argument("--max-burst", type=int, default=3, help="Действий за один всплеск")
+    parser.add_argument("--single-actions", action="store_true",
+                        help="Каждое действие отдельным /game/action (старый клиент)")
+    parser.add_argument("--register-concurrency", type=int, default=8)
+    parser.add_argument("--sample-interval", type=float, default=5.0, help="Период замера памяти")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "args": vars(args),
+                **report,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
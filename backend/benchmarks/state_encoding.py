@@ -0,0 +1,60 @@
+"""
+Размер и время кодирования полного состояния: JSON против бинарного формата.
+
+Запуск из папки backend:
+    python benchmarks/state_encoding.py --field 10 --enemies 10
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+# Добавляем папку backend в путь Python
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.game_logic import PokemonGameLogic, Card, FieldPokemon  # noqa: E402
+from app.state_codec import encode_state  # noqa: E402
+
+
+def full_wave_state(field_count: int, enemy_count: int) -> dict:
+    game = PokemonGameLogic(user_id=0)
+    for i in range(4):
+        game.open_pokeball()
+    for i in range(field_count):
+        card = Card(id=1000 + i, name="Pikachu", element="electric", health=45, attack=18, speed=2.5,
+                    uid=game.new_uid())
+        game.field.append(FieldPokemon(card, x=50 + i * 70, y=400.0 - i * 3.7))
+    wave = game.generate_wave(5)
+    for i in range(enemy_count):
+        enemy = wave[i % len(wave)]
+        enemy = type(enemy)(enemy.id, enemy.name, enemy.element, enemy.health, enemy.attack, enemy.speed,
+                            uid=game.new_uid())
+        enemy.x, enemy.y, enemy.current_health = 50 + i * 35.5, 100 + i * 12.25, enemy.health * 0.75
+        game.enemies.append(enemy)
+    return game.get_state()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--field", type=int, default=10)
+    parser.add_argument("--enemies", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    state = full_wave_state(args.field, args.enemies)
+
+    encoders = {
+        "json": lambda: json.dumps(state).encode("utf-8"),
+        "binary": lambda: encode_state(state),
+    }
+
+    print(f"Field: {args.field}, enemies: {args.enemies}")
+    for name, encode in encoders.items():
+        size = len(encode())
+        seconds = min(timeit.repeat(encode, number=args.repeat, repeat=3)) / args.repeat
+        print(f"  {name:7s} {size:7d} bytes  {seconds * 1e6:8.1f} us/encode")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+
+import pytest
+
+# Тесты импортируют пакет app из каталога backend (как run.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# До импорта app: своя база вместо game.db4, результаты и игры без файлов на диске, без Redis
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="poketd-tests-"), "app.db")
+os.environ["GAME_RESULTS_JOURNAL_DIR"] = ""
+os.environ["GAME_SPILL_DIR"] = ""
+os.environ.pop("REDIS_URL", None)
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app import models  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.redis_client import LocalRedisClient, RedisClient  # noqa: E402
+
+
+class FakeRedisClient(RedisClient):
+    """RedisClient на fakeredis: проверяет команды и Lua-скрипты настоящего клиента"""
+
+    async def connect(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        server = fakeredis.FakeServer()
+        self.redis = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        self.binary = fakeredis.aioredis.FakeRedis(server=server)
+
+
+@pytest.fixture(params=["local", "files", "fakeredis"])
+def redis_client(request, tmp_path):
+    """Общее хранилище: замена в памяти процесса (игры в памяти или в файлах) и fakeredis"""
+    if request.param == "fakeredis":
+        client = FakeRedisClient()
+    else:
+        client = LocalRedisClient(str(tmp_path / "games") if request.param == "files" else None)
+    asyncio.run(client.connect())
+    return client
+
+
+@pytest.fixture
+def database(tmp_path):
+    """
+    Открывает свежую базу SQLite и отдает фабрику асинхронных сессий (внутри asyncio.run).
+    in_memory=True - база в памяти на одном соединении, иначе - файл в tmp_path.
+    """
+
+    @asynccontextmanager
+    async def open_database(in_memory: bool = False):
+        if in_memory:
+            engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        else:
+            engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            yield async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+        finally:
+            await engine.dispose()
+
+    return open_database
+
+
+async def _add_user(session_factory, username: str, poke_coins: int = 100, leaderboard: bool = True) -> int:
+    """Пользователь (и его строка лидерборда) в тестовой базе; возвращает id"""
+    async with session_factory() as db:
+        user = models.User(username=username, email=f"{username}@example.com", hashed_password="-",
+                           poke_coins=poke_coins)
+        db.add(user)
+        await db.flush()
+        if leaderboard:
+            db.add(models.Leaderboard(user_id=user.id, username=username))
+        await db.commit()
+        return user.id
+
+
+@pytest.fixture
+def add_user():
+    return _add_user
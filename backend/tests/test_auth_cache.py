@@ -0,0 +1,57 @@
+"""Кэш токенов: инвалидация пользователя и согласованность индекса по пользователям"""
+import asyncio
+
+from app import auth, crud_async, schemas
+from app.auth import Principal, PrincipalCache
+
+
+def _fill(cache, tokens):
+    for token, user_id in tokens:
+        cache.put(token, {"sub": f"user{user_id}"}, Principal(user_id, f"user{user_id}", True))
+
+
+def test_invalidate_user_drops_only_their_tokens():
+    cache = PrincipalCache(max_entries=10, ttl=60)
+    _fill(cache, [("a1", 1), ("a2", 1), ("b1", 2)])
+
+    cache.invalidate_user(1)
+    assert cache.get("a1") is None and cache.get("a2") is None
+    assert cache.get("b1")[1].id == 2
+    assert set(cache.by_user) == {2}
+
+
+def test_lru_eviction_keeps_user_index():
+    cache = PrincipalCache(max_entries=2, ttl=60)
+    _fill(cache, [("a1", 1), ("b1", 2)])
+    cache.get("a1")
+    _fill(cache, [("c1", 3)])
+
+    assert cache.get("b1") is None
+    assert {user_id: len(keys) for user_id, keys in cache.by_user.items()} == {1: 1, 3: 1}
+    # Тот же токен с новым пользователем переезжает в его индекс
+    _fill(cache, [("a1", 3)])
+    assert {user_id: len(keys) for user_id, keys in cache.by_user.items()} == {3: 2}
+
+
+def test_user_updates_invalidate_cached_tokens(database, add_user):
+    async def scenario():
+        async with database() as session_factory:
+            user_id = await add_user(session_factory, "player")
+            auth.principal_cache.clear()
+            _fill(auth.principal_cache, [("token", user_id), ("other", user_id + 1)])
+
+            async with session_factory() as db:
+                user = await crud_async.set_user_active(db, user_id, False)
+            assert not user.is_active
+            assert auth.principal_cache.get("token") is None
+
+            _fill(auth.principal_cache, [("token", user_id)])
+            async with session_factory() as db:
+                user = await crud_async.update_user(
+                    db, user_id, schemas.UserUpdate(username="renamed", email="Renamed@example.com"))
+            assert (user.username, user.email) == ("renamed", "renamed@example.com")
+            assert auth.principal_cache.get("token") is None
+            assert auth.principal_cache.get("other") is not None
+            auth.principal_cache.clear()
+
+    asyncio.run(scenario())
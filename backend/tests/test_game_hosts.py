@@ -0,0 +1,57 @@
+"""Супервизор хостов игр перезапускает упавший хост на том же сокете"""
+import os
+import signal
+import time
+
+from app.config import settings
+from app.game_hosts import GameHostSupervisor, host_socket_path
+
+
+def _idle_host(path: str):
+    # Вместо настоящего хоста (ему нужны база и хранилище игр) - процесс, который просто живет
+    # и отмечает, на каком сокете его запустили
+    with open(path + ".started", "a") as f:
+        f.write(f"{os.getpid()}\n")
+    time.sleep(60)
+
+
+def _started_pids(path: str):
+    try:
+        with open(path + ".started") as f:
+            return f.read().split()
+    except FileNotFoundError:
+        return []
+
+
+def _wait_for(condition, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_dead_host_is_restarted_on_same_socket(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "GAME_HOST_SOCKET_DIR", str(tmp_path))
+    supervisor = GameHostSupervisor(2, check_interval=0.05, target=_idle_host)
+    supervisor.start()
+    try:
+        first, second = supervisor.processes
+        assert first.is_alive() and second.is_alive()
+
+        os.kill(first.pid, signal.SIGKILL)
+        assert _wait_for(lambda: supervisor.processes[0] is not first and supervisor.processes[0].is_alive())
+        assert supervisor.processes[0].name == "game-host-0"
+        restarted_pid = str(supervisor.processes[0].pid)
+        assert _wait_for(lambda: restarted_pid in _started_pids(host_socket_path(0)))
+
+        # Как в мастере gunicorn: статус умершего хоста забрал чужой waitpid
+        host = supervisor.processes[1]
+        os.kill(host.pid, signal.SIGKILL)
+        os.waitpid(host.pid, 0)
+        assert _wait_for(lambda: supervisor.processes[1] is not host and supervisor.processes[1].is_alive())
+        assert supervisor.restarts == 2
+    finally:
+        supervisor.stop(timeout=5)
+    assert not any(process.is_alive() for process in supervisor.processes)
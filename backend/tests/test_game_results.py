@@ -0,0 +1,51 @@
+"""Запись результата игры: сессия, монеты и лидерборд одной транзакцией"""
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from app import crud_async, models, schemas
+
+PLAYERS_RESULTS = 20
+
+
+def _results():
+    return [
+        schemas.GameResult(victory=i % 3 == 0, score=15 * i, poke_coins_earned=i % 7, waves_completed=i % 5,
+                           pokemons_caught=i % 4, enemies_defeated=i, game_duration=30.0 + i)
+        for i in range(PLAYERS_RESULTS)
+    ]
+
+
+@pytest.mark.parametrize("has_leaderboard_row", [True, False], ids=["update", "insert-race"])
+def test_concurrent_results_add_up(database, add_user, has_leaderboard_row):
+    """
+    N параллельных create_game_session одного игрока: итог не зависит от чередования.
+    Без строки лидерборда все транзакции сначала идут по ветке INSERT и сходятся в ON CONFLICT.
+    """
+    results = _results()
+
+    async def scenario():
+        async with database() as session_factory:
+            user_id = await add_user(session_factory, "racer", poke_coins=100, leaderboard=has_leaderboard_row)
+
+            async def save(result):
+                async with session_factory() as db:
+                    await crud_async.create_game_session(db, result, user_id)
+
+            await asyncio.gather(*(save(result) for result in results))
+
+            async with session_factory() as db:
+                user = await crud_async.get_user(db, user_id)
+                entry = await db.scalar(select(models.Leaderboard).where(models.Leaderboard.user_id == user_id))
+                sessions = await db.scalar(select(func.count()).select_from(models.GameSession)
+                                           .where(models.GameSession.user_id == user_id))
+                return user.poke_coins, entry, sessions
+
+    poke_coins, entry, sessions = asyncio.run(scenario())
+    assert sessions == len(results)
+    assert poke_coins == 100 + sum(result.poke_coins_earned for result in results)
+    assert entry.high_score == max(result.score for result in results)
+    assert entry.total_waves == sum(result.waves_completed for result in results)
+    assert entry.total_pokemons == sum(result.pokemons_caught for result in results)
+    assert entry.total_enemies == sum(result.enemies_defeated for result in results)
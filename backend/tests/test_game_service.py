@@ -0,0 +1,37 @@
+"""Пачка действий /actions: порядок и отказ действий по устаревшей версии клиента"""
+import asyncio
+
+from app import schemas
+from app.config import settings
+from app.game_loop import GameTickLoop
+from app.game_service import LocalGameService
+from app.redis_client import LocalRedisClient
+from app.session_store import GameSessionStore
+
+
+def test_stale_batched_actions_are_rejected():
+    async def scenario():
+        games = GameSessionStore(LocalRedisClient())
+        service = LocalGameService(games, GameTickLoop(games, tick_rate=100))
+        await service.start()
+        try:
+            await service.start_game(1)
+            game = await games.load(1)
+            version = game.state_version
+            batch = schemas.GameActionBatch(actions=[
+                {"action_type": "open_pokeball", "client_tick": version - settings.GAME_ACTION_MAX_LAG - 1},
+                {"action_type": "open_pokeball", "client_tick": version},
+                {"action_type": "open_pokeball"},
+                # Версия, которой у игры еще не было (клиент видел другую игру)
+                {"action_type": "open_pokeball", "client_tick": version + 10 ** 6},
+            ])
+            response = await service.act_batch(1, batch)
+        finally:
+            await service.stop()
+
+        results = response["results"]
+        assert results[0] == results[3] == {"error": "Stale action"}
+        assert results[1]["success"] and results[2]["success"]
+        assert game.pokeballs == 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,103 @@
+"""Индекс лидерборда в Redis: места и страницы совпадают с SQL"""
+import asyncio
+
+from sqlalchemy import delete, update
+
+from app import crud_async, models
+from app.leaderboard_index import LeaderboardIndex, create_leaderboard_index, leaderboard_rows
+
+PLAYERS = 12
+
+
+async def _seed(session_factory, add_user):
+    """Игроки с равными рекордами; id 9 и 10+ проверяют порядок ключей при равенстве"""
+    user_ids = [await add_user(session_factory, f"player{i}") for i in range(PLAYERS)]
+    async with session_factory() as db:
+        for i, user_id in enumerate(user_ids):
+            await db.execute(update(models.Leaderboard).where(models.Leaderboard.user_id == user_id)
+                             .values(high_score=(i % 3) * 100, total_waves=i))
+        await db.commit()
+    return user_ids
+
+
+async def _set_score(session_factory, user_id, high_score):
+    async with session_factory() as db:
+        await db.execute(update(models.Leaderboard).where(models.Leaderboard.user_id == user_id)
+                         .values(high_score=high_score))
+        await db.commit()
+
+
+async def _assert_parity(session_factory, index, user_ids):
+    async with session_factory() as db:
+        expected = [(entry.username, entry.high_score, entry.total_waves)
+                    for entry in await crud_async.get_leaderboard(db, limit=PLAYERS)]
+        assert [(entry.username, entry.high_score, entry.total_waves, entry.rank)
+                for entry in await index.page(0, PLAYERS)] == [row + (rank,) for rank, row in
+                                                               enumerate(expected, start=1)]
+        for skip, limit in ((0, 5), (5, 5), (10, 5), (PLAYERS, 5)):
+            page = await index.page(skip, limit)
+            assert [entry.username for entry in page] == [row[0] for row in expected[skip:skip + limit]]
+            assert [entry.rank for entry in page] == list(range(skip + 1, skip + 1 + len(page)))
+        for user_id in user_ids:
+            assert await index.user_rank(user_id) == await crud_async.get_user_rank(db, user_id)
+        assert await index.size() == await crud_async.get_leaderboard_size(db)
+
+
+def test_index_matches_sql_order(database, add_user, redis_client):
+    async def scenario():
+        async with database() as session_factory:
+            user_ids = await _seed(session_factory, add_user)
+            index = LeaderboardIndex(redis_client)
+            async with session_factory() as db:
+                await index.start(db)
+            assert index.ready
+            await _assert_parity(session_factory, index, user_ids)
+
+            # Новый рекорд попадает в индекс строками из БД после записи
+            for user_id, high_score in ((user_ids[0], 200), (user_ids[4], 500)):
+                await _set_score(session_factory, user_id, high_score)
+                async with session_factory() as db:
+                    await index.record(await leaderboard_rows(db, [user_id]))
+            await _assert_parity(session_factory, index, user_ids)
+
+    asyncio.run(scenario())
+
+
+def test_rebuild_restores_parity(database, add_user, redis_client):
+    async def scenario():
+        async with database() as session_factory:
+            user_ids = await _seed(session_factory, add_user)
+            index = LeaderboardIndex(redis_client)
+            async with session_factory() as db:
+                await index.start(db)
+
+            # Таблица изменилась в обход индекса (в том числе рекорд уменьшился)
+            await _set_score(session_factory, user_ids[2], 0)
+            await _set_score(session_factory, user_ids[3], 300)
+            async with session_factory() as db:
+                assert await index.rebuild(db) == PLAYERS
+            await _assert_parity(session_factory, index, user_ids)
+
+            async with session_factory() as db:
+                await db.execute(delete(models.Leaderboard))
+                await db.commit()
+                assert await index.rebuild(db) == 0
+            assert await index.size() == 0
+            assert await index.page(0, 10) == []
+            assert await index.user_rank(user_ids[0]) is None
+
+    asyncio.run(scenario())
+
+
+def test_index_is_disabled_without_redis(database):
+    async def scenario():
+        index = create_leaderboard_index()
+        assert not index.enabled
+        async with database() as session_factory:
+            async with session_factory() as db:
+                await index.start(db)
+        assert not index.ready
+        await index.record([(1, "player", 100, 1)])
+        await index.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,122 @@
+"""GameResultWriter: журнал на диске и запись результатов в БД пачками"""
+import asyncio
+import glob
+import json
+import os
+
+from sqlalchemy import func, select
+
+from app import models, schemas
+from app.result_writer import JOURNAL_PATTERN, GameResultWriter
+
+
+def _result(score=30, coins=5, waves=2):
+    return schemas.GameResult(victory=False, score=score, poke_coins_earned=coins, waves_completed=waves,
+                              pokemons_caught=1, enemies_defeated=score // 15, game_duration=12.5)
+
+
+def _writer(session_factory, journal_dir):
+    # Фоновый сброс не мешает: тесты вызывают flush() сами
+    return GameResultWriter(session_factory, journal_dir=str(journal_dir), batch_size=1000, flush_interval=3600)
+
+
+def _segments(journal_dir):
+    return glob.glob(os.path.join(str(journal_dir), JOURNAL_PATTERN))
+
+
+async def _totals(session_factory, user_id):
+    async with session_factory() as db:
+        user = await db.get(models.User, user_id)
+        entry = await db.scalar(select(models.Leaderboard).where(models.Leaderboard.user_id == user_id))
+        sessions = await db.scalar(select(func.count()).select_from(models.GameSession)
+                                   .where(models.GameSession.user_id == user_id))
+        return user.poke_coins, entry.high_score, entry.total_waves, sessions
+
+
+def test_results_are_aggregated_per_user_in_one_batch(database, add_user, tmp_path):
+    async def scenario():
+        async with database(in_memory=True) as session_factory:
+            alice = await add_user(session_factory, "alice")
+            bob = await add_user(session_factory, "bob", leaderboard=False)
+            writer = _writer(session_factory, tmp_path)
+            await writer.start()
+            for score, coins, waves in [(30, 5, 2), (90, 7, 4), (60, 1, 3)]:
+                await writer.submit(alice, _result(score, coins, waves))
+            await writer.submit(bob, _result(45, 3, 1))
+            assert writer.pending_coins(alice) == 13
+
+            await writer.flush()
+            assert writer.flushes == 1 and writer.written == 4
+            assert writer.pending_coins(alice) == 0
+            assert _segments(tmp_path) == []
+            totals = await _totals(session_factory, alice), await _totals(session_factory, bob)
+            await writer.stop()
+            return totals
+
+    alice, bob = asyncio.run(scenario())
+    assert alice == (100 + 13, 90, 9, 3)
+    assert bob == (100 + 3, 45, 1, 1)
+
+
+def test_failed_flush_is_retried(database, add_user, tmp_path):
+    async def scenario():
+        async with database(in_memory=True) as session_factory:
+            user_id = await add_user(session_factory, "retry")
+            calls = {"n": 0}
+
+            def flaky_factory():
+                calls["n"] += 1
+                if calls["n"] == 1:
+                    raise ConnectionError("database is down")
+                return session_factory()
+
+            writer = _writer(flaky_factory, tmp_path)
+            await writer.start()
+            await writer.submit(user_id, _result(coins=5))
+
+            await writer.flush()
+            # Результат остался в очереди и в журнале, монеты по-прежнему видны
+            assert writer.failed_flushes == 1 and writer.written == 0
+            assert writer.pending_coins(user_id) == 5
+            assert len(_segments(tmp_path)) == 1
+
+            await writer.submit(user_id, _result(coins=2))
+            await writer.flush()
+            assert writer.written == 2 and writer.pending_coins(user_id) == 0
+            assert _segments(tmp_path) == []
+            totals = await _totals(session_factory, user_id)
+            await writer.stop()
+            return totals
+
+    assert asyncio.run(scenario())[0] == 100 + 5 + 2
+
+
+def test_segment_of_crashed_process_is_recovered(database, add_user, tmp_path):
+    async def scenario():
+        async with database(in_memory=True) as session_factory:
+            user_id = await add_user(session_factory, "crashed")
+            # Сегмент упавшего процесса: никто не держит блокировку, последняя строка оборвана
+            lines = [json.dumps({"user_id": user_id, "result": _result(score, 4).model_dump()})
+                     for score in (15, 75)]
+            with open(tmp_path / "results-crashed.jsonl", "w") as f:
+                f.write("\n".join(lines) + "\n" + lines[0][:20])
+
+            # Первый запущенный процесс забирает сегмент упавшего (без оборванной строки)
+            alive = _writer(session_factory, tmp_path)
+            await alive.start()
+            await alive.submit(user_id, _result(30, 1))
+            assert alive.pending_coins(user_id) == 4 + 4 + 1
+
+            # Сегменты живого процесса под его flock: второй процесс их не трогает
+            writer = _writer(session_factory, tmp_path)
+            await writer.start()
+            assert writer.pending_coins(user_id) == 0
+
+            await alive.flush()
+            assert _segments(tmp_path) == []
+            totals = await _totals(session_factory, user_id)
+            await writer.stop()
+            await alive.stop()
+            return totals
+
+    assert asyncio.run(scenario()) == (100 + 9, 75, 6, 3)
@@ -0,0 +1,206 @@
+"""GameSessionStore поверх общего хранилища: два хранилища - два воркера"""
+import asyncio
+
+import pytest
+
+from app.game_logic import PokemonGameLogic
+from app.game_loop import GameTickLoop
+from app.redis_client import LocalRedisClient
+from app.session_store import GameBusyError, GameSessionStore
+
+
+def _store(client, **kwargs):
+    kwargs.setdefault("handover_timeout", 1.0)
+    kwargs.setdefault("handover_poll_interval", 0.01)
+    return GameSessionStore(client, write_back_interval=0.05, **kwargs)
+
+
+def _new_game(user_id):
+    game = PokemonGameLogic(user_id, seed=user_id)
+    game.update(0)
+    return game
+
+
+def _advance(game, ticks=5):
+    for _ in range(ticks):
+        game.update(0.1)
+
+
+def test_write_back_saves_changed_games(redis_client):
+    async def scenario():
+        store = _store(redis_client)
+        game = _new_game(1)
+        await store.put(1, game)
+        _advance(game)
+        assert game.dirty
+
+        await store.flush()
+        assert not game.dirty
+        restored = PokemonGameLogic.from_snapshot(await redis_client.get_game(1))
+        assert restored.get_state() == game.get_state()
+
+    asyncio.run(scenario())
+
+
+def test_evicted_game_is_rehydrated(redis_client):
+    async def scenario():
+        store = _store(redis_client, max_local_games=1)
+        first = _new_game(1)
+        await store.put(1, first)
+        _advance(first)
+        expected = first.get_state()
+
+        await store.put(2, _new_game(2))
+        assert 1 not in store and store.evictions == 1
+
+        loaded = await store.load(1)
+        assert loaded is not first
+        assert loaded.get_state() == expected
+        assert store.rehydrations == 1
+
+    asyncio.run(scenario())
+
+
+def test_handover_moves_latest_state(redis_client):
+    async def scenario():
+        old, new = _store(redis_client), _store(redis_client)
+        game = _new_game(1)
+        await old.put(1, game)
+        old.start()
+        # Изменения после последней записи: их должен получить новый владелец
+        _advance(game)
+        expected = game.get_state()
+
+        loaded = await new.load(1)
+        await old.stop()
+
+        assert loaded.get_state() == expected
+        assert 1 not in old and old.handovers == 1
+        assert await redis_client.get_game_owner(1) == new.owner
+
+    asyncio.run(scenario())
+
+
+def test_handover_rejects_actions_during_write(redis_client):
+    async def scenario():
+        old, new = _store(redis_client), _store(redis_client)
+        game = _new_game(1)
+        await old.put(1, game)
+        tick_loop = GameTickLoop(old, tick_rate=100)
+        tick_loop.start()
+
+        # Запись снимка идет несколько тиков; цикл тиков в это время работает
+        writing = asyncio.Event()
+        write_back = redis_client.write_back_game
+
+        async def slow_write_back(*args):
+            writing.set()
+            await asyncio.sleep(0.05)
+            return await write_back(*args)
+
+        redis_client.write_back_game = slow_write_back
+        await redis_client.request_handover(1, old.owner, 30)
+        handover = asyncio.ensure_future(old.hand_over())
+        await writing.wait()
+        # Действие во время записи не должно получить "ok" и пропасть вместе с копией
+        result = await tick_loop.submit(1, game.open_pokeball)
+        await handover
+        await tick_loop.stop()
+        redis_client.write_back_game = write_back
+
+        assert result == {"error": "Game not found"}
+        loaded = await new.load(1)
+        assert loaded.get_state() == game.get_state()
+
+    asyncio.run(scenario())
+
+
+def test_spill_dir_is_shared_between_processes(tmp_path):
+    pytest.importorskip("fcntl")
+
+    async def scenario():
+        # Два клиента на одной папке - два воркера: flock разных открытий файла конфликтует
+        games_dir = str(tmp_path / "games")
+        old_client, new_client = LocalRedisClient(games_dir), LocalRedisClient(games_dir)
+        old, new = _store(old_client), _store(new_client)
+        game = _new_game(1)
+        await old.put(1, game)
+        assert await new_client.get_game_owner(1) == old.owner
+        assert not await new_client.claim_game(1, new.owner, 30)
+
+        old.start()
+        _advance(game)
+        expected = game.get_state()
+        loaded = await new.load(1)
+        await old.stop()
+        assert loaded.get_state() == expected
+        assert 1 not in old and old.handovers == 1
+        assert await old_client.get_game_owner(1) == new.owner
+
+        # Блокировка снимается вместе с процессом-владельцем
+        await new_client.disconnect()
+        assert await old_client.get_game_owner(1) is None
+
+    asyncio.run(scenario())
+
+
+def test_lost_ownership_drops_local_copy(redis_client):
+    async def scenario():
+        old, new = _store(redis_client), _store(redis_client, handover_timeout=0.05)
+        game = _new_game(1)
+        await old.put(1, game)
+
+        # Прежний владелец не отвечает: новый забирает игру по таймауту
+        taken = await new.load(1)
+        assert taken is not None
+        assert await redis_client.get_game_owner(1) == new.owner
+
+        # Запись прежнего владельца не проходит, и он выбрасывает свою копию
+        _advance(game)
+        await old.flush()
+        assert 1 not in old
+        assert PokemonGameLogic.from_snapshot(await redis_client.get_game(1)).get_state() == taken.get_state()
+
+    asyncio.run(scenario())
+
+
+def test_load_checks_owner_of_local_game(redis_client):
+    async def scenario():
+        old, new = _store(redis_client, handover_timeout=0.05), _store(redis_client, handover_timeout=0.05)
+        game = _new_game(1)
+        await old.put(1, game)
+        await new.load(1)
+
+        # Локальная копия прежнего владельца устарела: load не отдает ее
+        loaded = await old.load(1)
+        assert loaded is not game
+        assert await redis_client.get_game_owner(1) == old.owner
+
+    asyncio.run(scenario())
+
+
+def test_claim_does_not_override_concurrent_owner(redis_client):
+    async def scenario():
+        store = _store(redis_client)
+        assert await redis_client.claim_game(1, "other", 30)
+        assert not await redis_client.claim_game(1, store.owner, 30)
+        assert not await redis_client.claim_game(1, store.owner, 30, expected="someone-else")
+        assert await redis_client.claim_game(1, store.owner, 30, expected="other")
+
+        # Владелец жив, но не отдает игру - захват по таймауту тоже compare-and-set
+        await redis_client.release_game(1, store.owner)
+        await redis_client.claim_game(1, "stuck", 30)
+        busy = _store(redis_client, handover_timeout=0.05)
+        client_claim = redis_client.claim_game
+
+        async def racing_claim(user_id, owner, ttl, expected=None):
+            # Пока мы решали забрать игру, ее захватил кто-то третий
+            await client_claim(user_id, "third", ttl, expected=expected)
+            return await client_claim(user_id, owner, ttl, expected=expected)
+
+        redis_client.claim_game = racing_claim
+        with pytest.raises(GameBusyError):
+            await busy._acquire(1)
+        assert await redis_client.get_game_owner(1) == "third"
+
+    asyncio.run(scenario())
@@ -1,9 +1,94 @@
+const BINARY_STATE_MEDIA_TYPE = 'application/x-poketd-state';
+const MAX_BATCH_ACTIONS = 32; // Как schemas.MAX_BATCH_ACTIONS на сервере
+
+// Декодер компактного бинарного состояния (формат см. backend/app/state_codec.py)
+function decodeBinaryState(buffer) {
+    const view = new DataView(buffer);
+    const decoder = new TextDecoder();
+    let offset = 0;
+
+    const u8 = () => view.getUint8(offset++);
+    const u16 = () => { const v = view.getUint16(offset, true); offset += 2; return v; };
+    const u32 = () => { const v = view.getUint32(offset, true); offset += 4; return v; };
+    const i32 = () => { const v = view.getInt32(offset, true); offset += 4; return v; };
+    const f32 = () => { const v = view.getFloat32(offset, true); offset += 4; return v; };
+    const f64 = () => { const v = view.getFloat64(offset, true); offset += 8; return v; };
+
+    const magic = decoder.decode(new Uint8Array(buffer, 0, 3));
+    offset = 3;
+    if (magic !== 'PTD' || u8() !== 1) {
+        throw new Error('Unsupported state encoding');
+    }
+
+    const strings = [];
+    for (let count = u16(); count > 0; count--) {
+        const length = u8();
+        strings.push(decoder.decode(new Uint8Array(buffer, offset, length)));
+        offset += length;
+    }
+
+    const state = { version: f64() };
+    for (const name of ['player_health', 'player_level', 'player_exp', 'player_max_exp', 'pokeballs',
+                        'poke_coins', 'wave', 'score', 'player_base_y', 'enemy_base_y']) {
+        state[name] = i32();
+    }
+    const flags = u8();
+    state.game_over = Boolean(flags & 1);
+    state.victory = Boolean(flags & 2);
+
+    const card = () => ({
+        uid: u32(), id: i32(), name: strings[u16()], element: strings[u16()],
+        health: i32(), attack: i32(), speed: f32()
+    });
+
+    state.hand = [];
+    for (let count = u16(); count > 0; count--) {
+        state.hand.push(card());
+    }
+
+    state.field = [];
+    for (let count = u16(); count > 0; count--) {
+        const pokemon = card();
+        pokemon.x = f32();
+        pokemon.y = f32();
+        pokemon.current_health = f32();
+        pokemon.max_health = i32();
+        pokemon.attack_cooldown = f32();
+        const pokemonFlags = u8();
+        const target = i32();
+        pokemon.is_moving = Boolean(pokemonFlags & 1);
+        pokemon.reached_enemy_base = Boolean(pokemonFlags & 2);
+        pokemon.target = (pokemonFlags & 4) ? target : null;
+        pokemon.attack_range = f32();
+        pokemon.base_damage_timer = f32();
+        state.field.push(pokemon);
+    }
+
+    state.enemies = [];
+    for (let count = u16(); count > 0; count--) {
+        const enemy = card();
+        enemy.x = f32();
+        enemy.y = f32();
+        enemy.current_health = f32();
+        state.enemies.push(enemy);
+    }
+
+    return state;
+}
+
 // Игровой клиент
 class GameClient {
     constructor() {
         this.canvas = document.getElementById('gameCanvas');
         this.ctx = this.canvas.getContext('2d');
         this.gameState = null;
+        this.stateVersion = null; // Последняя версия состояния для дельт
+        this.socket = null; // WebSocket-канал; при недоступности - HTTP-опрос
+        this.socketRequests = new Map();
+        this.socketRequestId = 0;
+        this.actionQueue = []; // Действия для следующего пакетного запроса /game/actions
+        this.actionsInFlight = false;
+        this.updateInterval = null;
         this.isRunning = true;
         this.lastTime = 0;
         this.selectedCard = null;
@@ -37,12 +122,9 @@ class GameClient {
         this.loadGameState();
         this.loadImages();
 
-        // Обновляем состояние каждую секунду
-        this.updateInterval = setInterval(() => {
-            if (this.isRunning) {
-                this.loadGameState();
-            }
-        }, 1000);
+        // Живые обновления через WebSocket, опрос раз в секунду - запасной вариант
+        this.startPolling();
+        this.connectSocket();
 
         // Предварительная загрузка игрового состояния
         this.preloadGameState();
@@ -213,7 +295,7 @@ class GameClient {
 
         if (returnToLobbyBtn) {
             returnToLobbyBtn.addEventListener('click', () => {
-                clearInterval(this.updateInterval);
+                this.stopUpdates();
                 window.location.href = '/lobby';
             });
         }
@@ -351,16 +433,150 @@ class GameClient {
         this.render();
     }
 
-    async loadGameState() {
-        try {
-            const state = await ApiClient.get('/game/state');
-            if (state) {
-                this.gameState = state;
-                this.updateUI();
+    startPolling() {
+        if (this.updateInterval) return;
+        this.updateInterval = setInterval(() => {
+            if (this.isRunning) {
+                this.loadGameState();
+            }
+        }, 1000);
+    }
+
+    stopPolling() {
+        clearInterval(this.updateInterval);
+        this.updateInterval = null;
+    }
+
+    socketReady() {
+        return this.socket && this.socket.readyState === WebSocket.OPEN && this.socket.authenticated;
+    }
+
+    connectSocket() {
+        const token = localStorage.getItem('token');
+        if (!window.WebSocket || !token || this.updatesStopped) return;
+
+        const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        const socket = new WebSocket(`${protocol}://${window.location.host}${API_BASE}/game/ws`);
+        this.socket = socket;
+
+        socket.onopen = () => {
+            // Авторизуемся один раз на все соединение
+            socket.send(JSON.stringify({ type: 'auth', token }));
+        };
 
-                if (state.game_over) {
-                    this.showEndGameModal(state.victory);
+        socket.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'state') {
+                if (!socket.authenticated) {
+                    socket.authenticated = true;
+                    this.stopPolling();
                 }
+                if (this.isRunning) {
+                    this.handleStateResponse(message.state);
+                }
+            } else if (message.type === 'action_result') {
+                const request = this.socketRequests.get(message.request_id);
+                if (request) {
+                    this.socketRequests.delete(message.request_id);
+                    request.resolve(message.result);
+                }
+            }
+        };
+
+        socket.onclose = () => {
+            this.socket = null;
+            for (const request of this.socketRequests.values()) {
+                request.reject(new Error('Socket closed'));
+            }
+            this.socketRequests.clear();
+
+            // Возвращаемся к HTTP-опросу и пробуем переподключиться позже
+            if (!this.updatesStopped) {
+                this.stateVersion = null;
+                this.startPolling();
+                setTimeout(() => this.connectSocket(), 5000);
+            }
+        };
+    }
+
+    stopUpdates() {
+        this.updatesStopped = true;
+        this.stopPolling();
+        if (this.socket) {
+            this.socket.close();
+        }
+    }
+
+    resumeUpdates() {
+        this.updatesStopped = false;
+        this.startPolling();
+        if (!this.socket) {
+            this.connectSocket();
+        }
+    }
+
+    async sendAction(action) {
+        if (!this.socketReady()) {
+            return new Promise((resolve, reject) => {
+                this.actionQueue.push({ action: { ...action, client_tick: this.stateVersion }, resolve, reject });
+                this.flushActions();
+            });
+        }
+
+        return new Promise((resolve, reject) => {
+            const requestId = ++this.socketRequestId;
+            this.socketRequests.set(requestId, { resolve, reject });
+            this.socket.send(JSON.stringify({ type: 'action', request_id: requestId, ...action }));
+        });
+    }
+
+    async flushActions() {
+        // Пока запрос в пути, новые действия копятся и уходят следующей пачкой
+        if (this.actionsInFlight || this.actionQueue.length === 0) return;
+
+        const queued = this.actionQueue.splice(0, MAX_BATCH_ACTIONS);
+        this.actionsInFlight = true;
+        try {
+            const response = await ApiClient.post('/game/actions', {
+                actions: queued.map(item => item.action),
+                since: this.stateVersion,
+            });
+            this.handleStateResponse(response.state);
+            queued.forEach((item, i) => item.resolve(response.results[i]));
+        } catch (error) {
+            queued.forEach(item => item.reject(error));
+        } finally {
+            this.actionsInFlight = false;
+            this.flushActions();
+        }
+    }
+
+    handleStateResponse(response) {
+        const state = this.applyStateResponse(response);
+        if (state) {
+            this.gameState = state;
+            this.updateUI();
+
+            if (state.game_over) {
+                this.showEndGameModal(state.victory);
+            }
+        }
+    }
+
+    async loadGameState() {
+        if (this.socketReady()) {
+            // Состояние и так приходит по WebSocket каждый тик
+            return;
+        }
+
+        try {
+            // Если версия известна - сервер вернет только изменения (JSON),
+            // иначе берем полный снимок в компактном бинарном виде
+            const response = this.stateVersion !== null
+                ? await ApiClient.get(`/game/state?since=${this.stateVersion}`)
+                : await this.loadBinaryState();
+            if (response) {
+                this.handleStateResponse(response);
             }
         } catch (error) {
             if (error.message && error.message.includes('404')) {
@@ -371,6 +587,53 @@ class GameClient {
         }
     }
 
+    async loadBinaryState() {
+        const buffer = await ApiClient.getBinary('/game/state', BINARY_STATE_MEDIA_TYPE);
+        return buffer ? decodeBinaryState(buffer) : null;
+    }
+
+    applyStateResponse(response) {
+        if (!response.delta) {
+            this.stateVersion = response.version ?? null;
+            return response;
+        }
+
+        if (!this.gameState || response.since !== this.stateVersion) {
+            // Дельта не к нашей версии - запросим полный снимок в следующий раз
+            this.stateVersion = null;
+            return null;
+        }
+
+        const state = { ...this.gameState };
+        for (const [key, value] of Object.entries(response)) {
+            if (key === 'hand' || key === 'field' || key === 'enemies') {
+                state[key] = this.mergeEntities(state[key] || [], value);
+            } else if (key !== 'delta' && key !== 'since') {
+                state[key] = value;
+            }
+        }
+        this.stateVersion = response.version;
+        return state;
+    }
+
+    mergeEntities(entities, changes) {
+        const removed = new Set(changes.removed);
+        const changed = new Map(changes.changed.map(entity => [entity.uid, entity]));
+
+        const merged = [];
+        for (const entity of entities) {
+            if (removed.has(entity.uid)) continue;
+            if (changed.has(entity.uid)) {
+                merged.push(changed.get(entity.uid));
+                changed.delete(entity.uid);
+            } else {
+                merged.push(entity);
+            }
+        }
+        // Новые сущности - в конец, как и на сервере
+        return merged.concat([...changed.values()]);
+    }
+
     async openPokeball() {
         if (!this.gameState || this.gameState.pokeballs <= 0) {
             showNotification('No pokeballs left!', 'error');
@@ -378,13 +641,12 @@ class GameClient {
         }
 
         try {
-            const result = await ApiClient.post('/game/action', {
+            const result = await this.sendAction({
                 action_type: 'open_pokeball'
             });
 
             if (result.success) {
                 showNotification(`🎉 Got ${result.pokemon.name}!`, 'success');
-                await this.loadGameState();
             } else {
                 showNotification(result.error || 'Failed to open pokeball', 'error');
             }
@@ -396,7 +658,7 @@ class GameClient {
 
     async playCard(cardId, x) {
         try {
-            const result = await ApiClient.post('/game/action', {
+            const result = await this.sendAction({
                 action_type: 'play_card',
                 data: {
                     card_id: cardId,
@@ -406,7 +668,6 @@ class GameClient {
 
             if (result.success) {
                 showNotification('✅ Pokemon placed on field!', 'success');
-                await this.loadGameState();
 
                 if (this.selectedCard && this.selectedCard.element) {
                     this.selectedCard.element.classList.remove('selected');
@@ -454,7 +715,7 @@ class GameClient {
     async quitGame() {
         if (confirm('Are you sure you want to surrender? You will earn coins based on your progress.')) {
             try {
-                clearInterval(this.updateInterval);
+                this.stopUpdates();
                 const result = await ApiClient.post('/game/end', {});
 
                 if (result && result.poke_coins_earned) {
@@ -479,6 +740,8 @@ class GameClient {
 
         ApiClient.post('/game/start', {})
             .then(() => {
+                this.stateVersion = null;
+                this.resumeUpdates();
                 this.loadGameState();
                 this.isRunning = true;
                 this.startGameLoop();
@@ -964,7 +1227,7 @@ class GameClient {
         if (this.animationId) {
             cancelAnimationFrame(this.animationId);
         }
-        clearInterval(this.updateInterval);
+        this.stopUpdates();
 
         title.textContent = victory ? '🎉 Victory! 🎉' : '💀 Game Over 💀';
         title.style.color = victory ? '#28a745' : '#dc3545';
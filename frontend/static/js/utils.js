@@ -32,6 +32,9 @@ class ApiClient {
                 throw new Error(error.detail || `HTTP error! status: ${response.status}`);
             }
 
+            if (options.binary) {
+                return await response.arrayBuffer();
+            }
             return await response.json();
         } catch (error) {
             console.error('API request failed:', error);
@@ -51,6 +54,14 @@ class ApiClient {
             method: 'GET',
         });
     }
+
+    static async getBinary(endpoint, mediaType) {
+        return this.request(endpoint, {
+            method: 'GET',
+            headers: { 'Accept': mediaType },
+            binary: true,
+        });
+    }
 }
 
 // Вспомогательные функции
@@ -1,5 +1,32 @@
 import multiprocessing
+import os
 
 bind = "0.0.0.0:10000"
 workers = multiprocessing.cpu_count() * 2 + 1
 worker_class = "uvicorn.workers.UvicornWorker"
+
+# Процессы-хосты игр (GAME_HOSTS > 0): запускаются мастером до воркеров, он же их перезапускает
+game_hosts = None
+
+
+def on_starting(server):
+    # Воркеры наследуют окружение мастера: по числу воркеров делятся ядра (GAME_SHARED_WORKERS)
+    os.environ["WEB_CONCURRENCY"] = str(server.cfg.workers)
+    # Неизменяемый справочник игры загружается в мастере: воркеры делят его через copy-on-write
+    import backend.app.catalog  # noqa: F401
+    from backend.app.config import settings
+    if server.cfg.workers > 1 and not settings.REDIS_URL and settings.GAME_HOSTS == 0 \
+            and not settings.GAME_SPILL_DIR:
+        # Без Redis, хостов игр и общей папки игр у каждого воркера свои игры
+        print(f"⚠️ {server.cfg.workers} workers without REDIS_URL and GAME_SPILL_DIR: games live in "
+              f"per-worker memory and a player's requests to different workers see different games")
+    if settings.GAME_HOSTS > 0:
+        global game_hosts
+        from backend.app.game_hosts import GameHostSupervisor
+        game_hosts = GameHostSupervisor(settings.GAME_HOSTS)
+        game_hosts.start()
+
+
+def on_exit(server):
+    if game_hosts is not None:
+        game_hosts.stop()